@@ -0,0 +1,69 @@
+"""
+Top-k retrieval over champion lists, for early termination.
+
+An index built with champion lists stores, for every term, the postings with the highest normalised term weights
+(termWeight / vectorDocLength) as a separate high tier, and the highest normalised term weight left out of it (the tail max score).
+Scoring only the high tiers gives every document seen a partial score, and an upper bound on its full score:
+the partial score plus, for every term whose high tier it is missing from, the query weight times the tail max score of that term.
+
+In exact mode, the top k is returned only when it is provably the same as that of the full postings lists: the top k documents
+have complete scores (they are in the high tier of every term that has a tail), and no other document's upper bound reaches the k-th score.
+Otherwise None is returned, and the caller falls back to the full postings. In approximate mode, the top k by partial score is always returned.
+"""
+from MaxScore import SLACK, contribution
+
+
+def championsTopK(queryWeights, indexHandle, k=10, approximate=False):
+    """
+    Given the normalised query weights {term : weight, ...} (in query term order), returns up to k (score, docIndex) pairs
+    of the highest scoring documents with score > 0, best first, computed from champion lists only.
+    In exact mode, returns None if that ranking cannot be proven to be the same as that of the full postings lists.
+    """
+    dictionary = indexHandle.getDictionary()
+    vectorLengths = indexHandle.getVectorLengths()
+
+    contributions = {}  # {docIndex : {query order : contribution, ...}, ...}
+    tailBounds = {}  # {query order : upper bound of the contribution of the term to a document outside its high tier, ...}
+    for order, (term, queryWeight) in enumerate(queryWeights.items()):
+        if queryWeight > 0:
+            docIndices, termWeights = indexHandle.getChampions(term)
+            for docIndex, termWeight in zip(docIndices, termWeights):
+                contributions.setdefault(docIndex, {})[order] = contribution(queryWeight, termWeight, vectorLengths[docIndex])
+
+            tailMaxScore = dictionary.getTermTailMaxScore(term)
+            if tailMaxScore > 0:
+                tailBounds[order] = queryWeight * tailMaxScore * SLACK
+
+    scores = {}  # {docIndex : partial score, ...}, summed in query term order (the full score if the document is complete)
+    for docIndex, docContributions in contributions.items():
+        score = 0
+        for order in sorted(docContributions):
+            score += docContributions[order]
+        scores[docIndex] = score
+
+    ranking = sorted((docIndex for docIndex in scores if scores[docIndex] > 0), key=lambda docIndex: (-scores[docIndex], docIndex))[:k]
+    topK = [(scores[docIndex], docIndex) for docIndex in ranking]
+
+    if approximate:
+        return topK
+
+    # every document in the top k must have its full score
+    for docIndex in ranking:
+        for order in tailBounds:
+            if order not in contributions[docIndex]:
+                return None
+
+    # no other document may reach the k-th score (or have a positive score at all, if fewer than k documents were found)
+    threshold = topK[-1][0] if len(topK) == k else 0
+    inTopK = set(ranking)
+    unseenBound = sum(tailBounds.values())  # bound for a document in no high tier
+    if unseenBound > 0 and unseenBound >= threshold:
+        return None
+
+    for docIndex, docContributions in contributions.items():
+        if docIndex not in inTopK:
+            upperBound = scores[docIndex] * SLACK + sum(bound for order, bound in tailBounds.items() if order not in docContributions)
+            if upperBound > 0 and upperBound >= threshold:
+                return None
+
+    return topK
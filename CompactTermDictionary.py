@@ -0,0 +1,302 @@
+import sys
+import fnmatch
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+import PostingsCodec
+import Tokenizers
+
+class CompactTermDictionary(object):
+    """
+    CompactTermDictionary is a read-only alternative to TermDictionary, stored in a compact binary file that loads
+    without rebuilding a Python dict of every term. It answers the same lookups as TermDictionary.
+
+    Terms are sorted and split into blocks of BLOCK_SIZE terms. Within a block, each term after the first is front-coded
+    (stored as the length of the prefix it shares with the previous term, and the rest of it). Only the first term of each block
+    is held as a string, so a term is found by bisecting these first terms and decoding a single block.
+    The information of the i-th term (docFreq, pointer, and max score and champion list columns if the index has them)
+    is held in packed arrays at position i, and the pointer to the document table is stored in the header rather than as a term.
+
+    File layout: MAGIC, a version byte, then length-prefixed records (see PostingsCodec.writeRecord):
+        header: varint(number of terms) varint(BLOCK_SIZE) varint(column flags) varint(pointer to the document table + 1, or 0)
+                [varint(length) tokenizer backend name (utf8), absent in files written before backends could be chosen]
+        docFreqs (uint32 * number of terms), pointers (int64 * number of terms),
+        [max scores (float64 * number of terms)], [champions pointers (int64 *...), tail max scores (float64 *...)],
+        block offsets (int64 * number of blocks), blocks
+    with all arrays little-endian.
+    """
+
+    MAGIC = b'HW4D'
+    VERSION = 1
+    BLOCK_SIZE = 16  # terms per front-coded block
+    MAX_CACHED_LOOKUPS = 4096  # positions of recently looked up terms, as search looks up each query term several times
+
+    HAS_MAXSCORES = 1
+    HAS_CHAMPIONS = 2
+
+    def __init__(self, storageLocation):
+        self.storageLocation = storageLocation
+        self.numberOfTerms = 0
+        self.blockSize = self.BLOCK_SIZE
+        self.docFrequencies = array('I')
+        self.pointers = array('q')
+        self.maxScores = None
+        self.championsPointers = None
+        self.tailMaxScores = None
+        self.blockOffsets = array('q')
+        self.blocks = b''
+        self.firstTerms = []  # first term of each block
+        self.pointerToDocLengths = None
+        self.tokenizer = Tokenizers.DEFAULT_BACKEND
+        self.positions = {}  # {term : position or -1, ...}, cleared when full
+
+
+    @classmethod
+    def isCompactDictionaryFile(cls, file):
+        """
+        Returns True if the dictionary file at the given path is stored in the compact format (rather than pickled by TermDictionary).
+        """
+        with open(file, 'rb') as f:
+            header = f.read(len(cls.MAGIC) + 1)
+
+        if header[:len(cls.MAGIC)] != cls.MAGIC:
+            return False
+
+        if header[len(cls.MAGIC)] != cls.VERSION:
+            raise ValueError("unsupported dictionary format version " + str(header[len(cls.MAGIC)]) + " in " + file)
+
+        return True
+
+
+    @classmethod
+    def write(cls, termDictionary, storageLocation, blockSize=BLOCK_SIZE):
+        """
+        Saves the terms held by the given TermDictionary (after indexing) in the compact format.
+        """
+        termInformation = termDictionary.getTermDict()
+        terms = sorted(term for term, termInfo in termInformation.items() if isinstance(termInfo, list))  # leaves the doc table pointer out
+        flags = 0
+        if termDictionary.hasMaxScores():
+            flags |= cls.HAS_MAXSCORES
+        if termDictionary.hasChampions():
+            flags |= cls.HAS_CHAMPIONS
+
+        header = bytearray()
+        PostingsCodec.encodeVarint(len(terms), header)
+        PostingsCodec.encodeVarint(blockSize, header)
+        PostingsCodec.encodeVarint(flags, header)
+        pointerToDocLengths = termInformation.get("d0cum3ntL3ngth")
+        PostingsCodec.encodeVarint(0 if pointerToDocLengths is None else pointerToDocLengths + 1, header)
+        tokenizer = termDictionary.getTokenizer().encode('utf8')
+        PostingsCodec.encodeVarint(len(tokenizer), header)
+        header += tokenizer
+
+        columns = [array('I', [termInformation[term][termDictionary.DOCFREQ_INDEX] for term in terms]),
+                   array('q', [termInformation[term][termDictionary.POINTERS_INDEX] for term in terms])]
+        if flags & cls.HAS_MAXSCORES:
+            columns.append(array('d', [termInformation[term][termDictionary.MAXSCORE_INDEX] for term in terms]))
+        if flags & cls.HAS_CHAMPIONS:
+            columns.append(array('q', [termInformation[term][termDictionary.CHAMPIONS_INDEX] for term in terms]))
+            columns.append(array('d', [termInformation[term][termDictionary.TAILMAXSCORE_INDEX] for term in terms]))
+
+        blocks = bytearray()
+        blockOffsets = array('q')
+        previous = b''
+        for position, term in enumerate(terms):
+            encodedTerm = term.encode('utf8')
+            if position % blockSize == 0:  # first term of a block, stored in full
+                blockOffsets.append(len(blocks))
+                PostingsCodec.encodeVarint(len(encodedTerm), blocks)
+                blocks += encodedTerm
+
+            else:
+                shared = 0
+                limit = min(len(previous), len(encodedTerm))
+                while shared < limit and previous[shared] == encodedTerm[shared]:
+                    shared += 1
+                PostingsCodec.encodeVarint(shared, blocks)
+                PostingsCodec.encodeVarint(len(encodedTerm) - shared, blocks)
+                blocks += encodedTerm[shared:]
+
+            previous = encodedTerm
+        columns.append(blockOffsets)
+
+        with open(storageLocation, 'wb') as f:
+            f.write(cls.MAGIC + bytes([cls.VERSION]))
+            PostingsCodec.writeRecord(f, header)
+            for column in columns:
+                if sys.byteorder != 'little':
+                    column.byteswap()
+                PostingsCodec.writeRecord(f, column.tobytes())
+            PostingsCodec.writeRecord(f, blocks)
+
+
+    def load(self):
+        """
+        Loads the dictionary from the specified storage location.
+        """
+        with open(self.storageLocation, 'rb') as f:
+            if f.read(len(self.MAGIC) + 1) != self.MAGIC + bytes([self.VERSION]):
+                raise ValueError(self.storageLocation + " is not a compact dictionary file")
+
+            header = PostingsCodec.readRecord(f)
+            self.numberOfTerms, offset = PostingsCodec.decodeVarint(header, 0)
+            self.blockSize, offset = PostingsCodec.decodeVarint(header, offset)
+            flags, offset = PostingsCodec.decodeVarint(header, offset)
+            pointerToDocLengths, offset = PostingsCodec.decodeVarint(header, offset)
+            self.pointerToDocLengths = pointerToDocLengths - 1 if pointerToDocLengths > 0 else None
+            self.tokenizer = Tokenizers.DEFAULT_BACKEND
+            if offset < len(header):
+                length, offset = PostingsCodec.decodeVarint(header, offset)
+                self.tokenizer = header[offset:offset + length].decode('utf8')
+
+            self.docFrequencies = self.readColumn(f, 'I')
+            self.pointers = self.readColumn(f, 'q')
+            self.maxScores = self.readColumn(f, 'd') if flags & self.HAS_MAXSCORES else None
+            if flags & self.HAS_CHAMPIONS:
+                self.championsPointers = self.readColumn(f, 'q')
+                self.tailMaxScores = self.readColumn(f, 'd')
+            self.blockOffsets = self.readColumn(f, 'q')
+            self.blocks = PostingsCodec.readRecord(f)
+
+        self.firstTerms = []
+        for blockOffset in self.blockOffsets:
+            length, offset = PostingsCodec.decodeVarint(self.blocks, blockOffset)
+            self.firstTerms.append(self.blocks[offset:offset + length].decode('utf8'))
+        self.positions = {}
+
+
+    def readColumn(self, file, typecode):
+        column = array(typecode)
+        column.frombytes(PostingsCodec.readRecord(file))
+        if sys.byteorder != 'little':  # stored little-endian
+            column.byteswap()
+
+        return column
+
+
+    def decodeBlock(self, blockNumber):
+        """
+        Returns the terms of the given block, in order.
+        """
+        blocks = self.blocks
+        length, offset = PostingsCodec.decodeVarint(blocks, self.blockOffsets[blockNumber])
+        previous = blocks[offset:offset + length]
+        offset += length
+        terms = [previous.decode('utf8')]
+
+        numberOfTerms = min(self.blockSize, self.numberOfTerms - blockNumber * self.blockSize)
+        for _ in range(numberOfTerms - 1):
+            shared, offset = PostingsCodec.decodeVarint(blocks, offset)
+            length, offset = PostingsCodec.decodeVarint(blocks, offset)
+            previous = previous[:shared] + blocks[offset:offset + length]
+            offset += length
+            terms.append(previous.decode('utf8'))
+
+        return terms
+
+
+    def getTermPosition(self, term):
+        """
+        Returns the position of the given term in the sorted terms, or -1 if it is not in the dictionary.
+        """
+        position = self.positions.get(term)
+        if position is not None:
+            return position
+
+        position = -1
+        blockNumber = bisect_right(self.firstTerms, term) - 1
+        if blockNumber >= 0:
+            terms = self.decodeBlock(blockNumber)
+            index = bisect_left(terms, term)
+            if index < len(terms) and terms[index] == term:
+                position = blockNumber * self.blockSize + index
+
+        if len(self.positions) >= self.MAX_CACHED_LOOKUPS:
+            self.positions.clear()
+        self.positions[term] = position
+
+        return position
+
+
+    def getTermPointer(self, term):
+        position = self.getTermPosition(term)
+        return self.pointers[position] if position != -1 else -1
+
+
+    def getTermDocFrequency(self, term):
+        position = self.getTermPosition(term)
+        return self.docFrequencies[position] if position != -1 else 0
+
+
+    def getTermMaxScore(self, term):
+        position = self.getTermPosition(term)
+        return self.maxScores[position] if position != -1 and self.maxScores is not None else 0
+
+
+    def hasMaxScores(self):
+        return self.maxScores is not None
+
+
+    def getTermChampionsPointer(self, term):
+        position = self.getTermPosition(term)
+        return self.championsPointers[position] if position != -1 and self.championsPointers is not None else -1
+
+
+    def getTermTailMaxScore(self, term):
+        position = self.getTermPosition(term)
+        return self.tailMaxScores[position] if position != -1 and self.tailMaxScores is not None else 0
+
+
+    def hasChampions(self):
+        return self.championsPointers is not None
+
+
+    def getPointerToDocLengths(self):
+        if self.pointerToDocLengths is None:
+            raise KeyError("d0cum3ntL3ngth")
+
+        return self.pointerToDocLengths
+
+
+    def getTokenizer(self):
+        return self.tokenizer
+
+
+    def getAllKeys(self):
+        """
+        Yields all terms, in sorted order.
+        """
+        for blockNumber in range(len(self.blockOffsets)):
+            yield from self.decodeBlock(blockNumber)
+
+
+    def expandPrefix(self, prefix):
+        """
+        Returns all terms starting with the given prefix, in sorted order.
+        Only the blocks that can hold such terms are decoded.
+        """
+        blockNumber = max(bisect_left(self.firstTerms, prefix) - 1, 0)
+        terms = []
+        while blockNumber < len(self.blockOffsets):
+            if blockNumber > 0 and self.firstTerms[blockNumber] > prefix and not self.firstTerms[blockNumber].startswith(prefix):
+                break
+
+            terms.extend(term for term in self.decodeBlock(blockNumber) if term.startswith(prefix))
+            blockNumber += 1
+
+        return terms
+
+
+    def expandWildcard(self, pattern):
+        """
+        Returns all terms matching the given wildcard pattern (* for any characters, ? for one character, as in fnmatch), in sorted order.
+        Only the terms starting with the part of the pattern before its first wildcard are looked at.
+        """
+        prefixLength = len(pattern)
+        for wildcard in '*?[':
+            if wildcard in pattern:
+                prefixLength = min(prefixLength, pattern.index(wildcard))
+
+        return [term for term in self.expandPrefix(pattern[:prefixLength]) if fnmatch.fnmatchcase(term, pattern)]
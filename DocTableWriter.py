@@ -0,0 +1,135 @@
+import os
+import sys
+import shutil
+import struct
+
+from array import array
+
+import PostingsCodec
+
+class DocTableWriter(object):
+    """
+    DocTableWriter is a class that spills the document table (docID, length and vector length of each document) to disk
+    as documents are indexed, so that it does not have to be held in memory. It is later copied into the postings file
+    in the format of PostingsCodec.encodeDocTable without being loaded back.
+    The position of a document in the table (its docIndex) is the dense internal ID, from 0 to N - 1, by which SPIMI blocks,
+    postings and scoring refer to it; the table is the lookup from these IDs back to the external docIDs.
+    Only the position of each docID in the table is kept in memory, to assign docIndices and to detect repeated docIDs.
+    A docID that appears again keeps its first entry, whose length grows by that of every later copy, as the copies are indexed
+    as one document; their vector length is only known once their postings are merged (see setVectorLengths).
+    """
+
+    def __init__(self, directory):
+        self.entriesFile = os.path.join(directory, 'docTableEntries.txt')  # [varint(len(docID)) docID varint(docLength)] * N
+        self.vectorLengthsFile = os.path.join(directory, 'docTableVectorLengths.txt')  # float64 * N
+        self.entries = open(self.entriesFile, 'wb')
+        self.vectorLengths = open(self.vectorLengthsFile, 'wb')
+        self.docOrder = {}  # {docID : position in the document table, ...}
+        self.addedLengths = {}  # {position of a repeated docID : total length of its later copies, ...}
+
+
+    def addDocument(self, docID, docLength, vectorLength):
+        """
+        Appends a document to the table, and returns its position in the table.
+        """
+        if docID in self.docOrder:
+            position = self.docOrder[docID]
+            self.addedLengths[position] = self.addedLengths.get(position, 0) + docLength
+            return position
+
+        self.docOrder[docID] = len(self.docOrder)
+        entry = bytearray()
+        encodedDocID = docID.encode('utf8')
+        PostingsCodec.encodeVarint(len(encodedDocID), entry)
+        entry += encodedDocID
+        PostingsCodec.encodeVarint(docLength, entry)
+        self.entries.write(entry)
+        self.vectorLengths.write(struct.pack('<d', vectorLength))
+
+        return self.docOrder[docID]
+
+
+    def getDocOrder(self):
+        return self.docOrder
+
+
+    def getNumberOfDocs(self):
+        return len(self.docOrder)
+
+
+    def getRepeatedDocIndices(self):
+        """
+        Returns the set of positions in the table of the docIDs that appeared more than once.
+        """
+        return set(self.addedLengths)
+
+
+    def finish(self):
+        """
+        Flushes the spilled table to disk, adding the lengths of later copies of repeated docIDs to their entries.
+        No documents can be added afterwards.
+        """
+        self.entries.close()
+        self.vectorLengths.close()
+        if not self.addedLengths:
+            return
+
+        with open(self.entriesFile, 'rb') as entries, open(self.entriesFile + '.new', 'wb') as output:
+            for position in range(len(self.docOrder)):
+                entry = bytearray()
+                encodedDocID = entries.read(PostingsCodec.readVarint(entries))
+                PostingsCodec.encodeVarint(len(encodedDocID), entry)
+                entry += encodedDocID
+                PostingsCodec.encodeVarint(PostingsCodec.readVarint(entries) + self.addedLengths.get(position, 0), entry)
+                output.write(entry)
+        os.replace(self.entriesFile + '.new', self.entriesFile)
+
+
+    def setVectorLengths(self, vectorLengths):
+        """
+        Given {position : vector length, ...}, replaces the vector lengths of those documents (once finished).
+        """
+        with open(self.vectorLengthsFile, 'r+b') as f:
+            for position, vectorLength in vectorLengths.items():
+                f.seek(8 * position)
+                f.write(struct.pack('<d', vectorLength))
+
+
+    def copyTo(self, output):
+        """
+        Writes the document table, in the format of PostingsCodec.encodeDocTable (as a record), to the given open file.
+        """
+        header = bytearray()
+        PostingsCodec.encodeVarint(len(self.docOrder), header)
+        prefix = bytearray()
+        PostingsCodec.encodeVarint(len(header) + os.path.getsize(self.entriesFile) + os.path.getsize(self.vectorLengthsFile), prefix)
+
+        output.write(prefix)
+        output.write(header)
+        for spilledFile in (self.entriesFile, self.vectorLengthsFile):
+            with open(spilledFile, 'rb') as f:
+                shutil.copyfileobj(f, output)
+
+
+    def getVectorLengths(self):
+        """
+        Returns the vector lengths of all documents as an array of doubles (8 bytes per document), in table order.
+        """
+        vectorLengths = array('d')
+        with open(self.vectorLengthsFile, 'rb') as f:
+            vectorLengths.frombytes(f.read())
+        if sys.byteorder != 'little':  # spilled as little-endian doubles
+            vectorLengths.byteswap()
+
+        return vectorLengths
+
+
+    def readDocuments(self):
+        """
+        Yields (docID, docLength, vectorLength) for every document in the table, in table order.
+        """
+        with open(self.entriesFile, 'rb') as entries, open(self.vectorLengthsFile, 'rb') as vectorLengths:
+            for _ in range(len(self.docOrder)):
+                docID = entries.read(PostingsCodec.readVarint(entries)).decode('utf8')
+                docLength = PostingsCodec.readVarint(entries)
+                yield docID, docLength, struct.unpack('<d', vectorLengths.read(8))[0]
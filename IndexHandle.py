@@ -0,0 +1,391 @@
+import os
+import math
+import pickle
+
+from array import array
+from bisect import bisect_left
+
+import PostingsCodec
+import NumpyScoring
+import SearchBundle
+
+from TermDictionary import TermDictionary
+from CompactTermDictionary import CompactTermDictionary
+from PostingsReader import PostingsReader
+from Normaliser import Normaliser
+from PhaseTimer import PhaseTimer
+
+class IndexHandle(object):
+    """
+    IndexHandle is a class that bundles a loaded TermDictionary with its postings file.
+    The document table (docIDs, lengths and vector lengths of documents) and the total number of documents
+    are read once when the handle is created, so that they are not reloaded from disk for every query.
+    Documents are referred to by their position in the document table (docIndex), which is the order they were indexed in.
+    Both the binary postings format and the legacy pickled Node lists can be read, and the dictionary can be
+    a pickled TermDictionary or a CompactTermDictionary.
+    By default the postings file is memory-mapped, and binary postings are decoded straight out of the mapped buffer.
+    The handle also owns the Normaliser used for query terms, preloaded with the stemming cache saved at indexing time (if any).
+    If the index has an up-to-date search bundle (see SearchBundle), the dictionary, stemming cache and document table are loaded from it instead.
+    When profiling, a PhaseTimer set on the handle is charged with reading postings, and counts the postings decoded.
+    Positions of positional indexes (see PostingsCodec) are only read for phrase queries and proximity boosts, from a reader opened on first use.
+    """
+
+    TERM_WEIGHTS = [0] + [1 + math.log10(termFrequency) for termFrequency in range(1, 256)]  # term weights of common term frequencies
+
+    def __init__(self, dictFile, postingsFile, cacheEntries=1024, cacheBytes=None, useMmap=True):
+        self.dictFile = dictFile
+        self.postingsFile = postingsFile
+        self.cacheEntries = cacheEntries
+        self.cacheBytes = cacheBytes
+        self.useMmap = useMmap
+        self.version = tuple((os.stat(f).st_mtime_ns, os.stat(f).st_size) for f in (dictFile, postingsFile))  # taken before loading
+        bundle = SearchBundle.load(dictFile, self.version)
+        if bundle is not None:
+            self.dictionary = bundle["dictionary"]
+        else:
+            self.dictionary = IndexHandle.loadDictionary(dictFile)  # load term information into the dictionary from dictFile
+        self.normaliser = Normaliser(tokenizer=self.dictionary.getTokenizer())  # queries are tokenized as the documents were
+        if bundle is not None:
+            self.normaliser.addEntries(bundle["stems"])
+        else:
+            self.normaliser.load(Normaliser.getStemsFile(dictFile))
+        self.isBinary = bundle is not None or PostingsCodec.isBinaryPostingsFile(postingsFile)  # only binary indexes have bundles
+        if self.isBinary:
+            self.postingsReader = PostingsReader(postingsFile, cacheEntries, cacheBytes, self.decodeBinaryPostings, self.decodeBinaryPostingsAt, useMmap)
+
+        else:
+            self.postingsReader = PostingsReader(postingsFile, cacheEntries, cacheBytes, self.decodeLegacyPostings, useMmap=useMmap)
+
+        pointer = self.dictionary.getPointerToDocLengths()
+        if bundle is not None:
+            self.docIDs, self.docLengths, self.vectorLengths = bundle["docIDs"], bundle["docLengths"], bundle["vectorLengths"]
+
+        elif self.isBinary:
+            self.docIDs, self.docLengths, self.vectorLengths = self.postingsReader.retrieve(pointer, cache=False,
+                decode=PostingsCodec.readDocTable, decodeAt=PostingsCodec.decodeDocTableAt)
+
+        else:
+            docLengths = self.postingsReader.retrieve(pointer, cache=False, decode=pickle.load)  # {docID : length, docID2 : length, ...}
+            self.docIDs = list(docLengths)
+            self.docLengths = list(docLengths.values())
+            self.vectorLengths = [0] * len(self.docIDs)  # legacy postings store vector lengths in every Node, filled in as they are read
+
+        self.totalNumberOfDocs = len(self.docIDs)
+        self.docOrder = None if self.isBinary else {docID: position for position, docID in enumerate(self.docIDs)}  # for legacy postings
+        self.columnarReader = None  # reader of postings as NumPy arrays, opened on first use
+        positionsFile = PostingsCodec.getPositionsFile(postingsFile)
+        self.positionsFile = positionsFile if self.isBinary and os.path.exists(positionsFile) else None
+        self.positionsReader = None  # reader of the positions file, opened on first use
+        self.positionsPointers = None  # {term : pointer in the positions file, ...}, loaded with the reader
+        self.inverseVectorLengths = None
+        self.timer = PhaseTimer(enabled=False)
+
+
+    @staticmethod
+    def loadDictionary(dictFile):
+        """
+        Loads the dictionary file at the given path, as a CompactTermDictionary or a TermDictionary depending on its format.
+        """
+        if CompactTermDictionary.isCompactDictionaryFile(dictFile):
+            dictionary = CompactTermDictionary(dictFile)
+
+        else:
+            dictionary = TermDictionary(dictFile)
+        dictionary.load()
+
+        return dictionary
+
+
+    def getOpenArguments(self):
+        """
+        Returns the arguments this handle was created with, so that another process can open the same index.
+        """
+        return self.dictFile, self.postingsFile, self.cacheEntries, self.cacheBytes, self.useMmap
+
+
+    def getVersion(self):
+        """
+        Returns a stamp of the index files (modification times and sizes) as they were when the handle was created,
+        which changes whenever the index is rebuilt.
+        """
+        return self.version
+
+
+    def getDictionary(self):
+        return self.dictionary
+
+
+    def setTimer(self, timer):
+        """
+        Sets the PhaseTimer charged with reading postings (see PostingsReader), and with the number of postings decoded.
+        """
+        self.timer = timer
+        self.postingsReader.setTimer(timer if timer.isEnabled() else None)
+        if self.columnarReader is not None:
+            self.columnarReader.setTimer(timer if timer.isEnabled() else None)
+        if self.positionsReader is not None:
+            self.positionsReader.setTimer(timer if timer.isEnabled() else None)
+
+
+    def getTimer(self):
+        return self.timer
+
+
+    def getNormaliser(self):
+        return self.normaliser
+
+
+    def getTotalNumberOfDocs(self):
+        return self.totalNumberOfDocs
+
+
+    def getDocID(self, docIndex):
+        return self.docIDs[docIndex]
+
+
+    def getDocLength(self, docIndex):
+        return self.docLengths[docIndex]
+
+
+    def getVectorLengths(self):
+        """
+        Returns the vector lengths of all documents, indexed by docIndex.
+        """
+        return self.vectorLengths
+
+
+    def hasMaxScores(self):
+        """
+        Returns True if the index stores max scores for its terms and its postings are sorted by docIndex,
+        as needed for MaxScore retrieval. This is the case for indexes in the binary format.
+        """
+        return self.isBinary and self.dictionary.hasMaxScores()
+
+
+    def hasChampions(self):
+        """
+        Returns True if the index has champion lists for its terms.
+        """
+        return self.isBinary and self.dictionary.hasChampions()
+
+
+    def getChampions(self, term):
+        """
+        Retrieves the champion list of the given term in the same form as getPostings.
+        """
+        pointer = self.dictionary.getTermChampionsPointer(term)
+        if pointer == -1:  # for non-existent terms
+            return array('i'), array('d')
+
+        return self.postingsReader.retrieve(pointer)
+
+
+    def getTermDocFrequency(self, term):
+        return self.dictionary.getTermDocFrequency(term)
+
+
+    def getPostings(self, term):
+        """
+        Retrieves the postings of the given term as a tuple of 2 parallel arrays: (docIndices, termWeights), of ints and doubles.
+        Both arrays are empty if the term is not in the dictionary.
+        """
+        pointer = self.dictionary.getTermPointer(term)
+        if pointer == -1:  # for non-existent terms
+            return array('i'), array('d')
+
+        return self.postingsReader.retrieve(pointer)
+
+
+    def getRawPostings(self, term):
+        """
+        Reads the postings of the given term (binary format only) without caching them, as a tuple of 2 parallel arrays of ints:
+        (docIndices, termFrequencies). Both arrays are empty if the term is not in the dictionary.
+        """
+        pointer = self.dictionary.getTermPointer(term)
+        if pointer == -1:  # for non-existent terms
+            return array('i'), array('i')
+
+        return self.postingsReader.retrieve(pointer, cache=False, decode=PostingsCodec.readPostings, decodeAt=PostingsCodec.decodePostingsAt)
+
+
+    def hasPositions(self):
+        """
+        Returns True if the index stores the positions of its terms, as needed for phrase queries and proximity boosts.
+        """
+        return self.positionsFile is not None
+
+
+    def getPositionsReader(self):
+        if self.positionsReader is None:
+            self.positionsReader = PostingsReader(self.positionsFile, self.cacheEntries, self.cacheBytes,
+                PostingsCodec.readPositions, PostingsCodec.decodePositionsAt, self.useMmap)
+            self.positionsPointers = PostingsCodec.readPositionsTable(self.positionsReader.file)
+            self.positionsReader.setTimer(self.timer if self.timer.isEnabled() else None)
+
+        return self.positionsReader
+
+
+    def getPositions(self, term, docIndices):
+        """
+        Retrieves the positions of the given term in the given documents (docIndices in ascending order), in the form of
+        {docIndex : [position, ...], ...}, for those of the documents that contain the term. Only the entries of these documents are decoded.
+        """
+        reader = self.getPositionsReader()
+        pointer = self.positionsPointers.get(term)
+        if pointer is None:  # for non-existent terms
+            return {}
+
+        postingsDocIndices = self.getPostings(term)[0]
+        found = []  # (ordinal of the posting, docIndex)
+        for docIndex in docIndices:
+            ordinal = bisect_left(postingsDocIndices, docIndex)
+            if ordinal < len(postingsDocIndices) and postingsDocIndices[ordinal] == docIndex:
+                found.append((ordinal, docIndex))
+
+        allPositions = PostingsCodec.findPositions(reader.retrieve(pointer), [ordinal for ordinal, _ in found])
+        return {docIndex: positions for (_, docIndex), positions in zip(found, allPositions)}
+
+
+    def getRawPositions(self, term):
+        """
+        Reads all the positions of the given term without caching them, as one array of ints holding the positions in each document
+        of getRawPostings in turn (termFrequency of them per posting). The array is empty if the term is not in the index.
+        """
+        reader = self.getPositionsReader()
+        pointer = self.positionsPointers.get(term)
+        if pointer is None:  # for non-existent terms
+            return array('i')
+
+        return PostingsCodec.decodeAllPositions(reader.retrieve(pointer, cache=False))
+
+
+    def supportsNumpy(self):
+        """
+        Returns True if the index can be scored by NumpyScoring: NumPy is installed and the index is in the binary format.
+        """
+        return self.isBinary and NumpyScoring.isAvailable()
+
+
+    def getColumnarReader(self):
+        if self.columnarReader is None:
+            self.columnarReader = PostingsReader(self.postingsFile, self.cacheEntries, self.cacheBytes,
+                self.decodeColumnarPostings, self.decodeColumnarPostingsAt, self.useMmap)
+            self.columnarReader.setTimer(self.timer if self.timer.isEnabled() else None)
+
+        return self.columnarReader
+
+
+    def getColumnarPostings(self, term):
+        """
+        Retrieves the postings of the given term as a tuple of 2 parallel NumPy arrays: (docIndices as int32, termWeights as float32).
+        These are cached separately from the postings of getPostings, with the same limits.
+        """
+        pointer = self.dictionary.getTermPointer(term)
+        if pointer == -1:  # for non-existent terms
+            return NumpyScoring.emptyColumns()
+
+        return self.getColumnarReader().retrieve(pointer)
+
+
+    def getInverseVectorLengths(self):
+        """
+        Returns 1 / vectorLength of all documents as a NumPy array indexed by docIndex (0 for documents of vector length 0).
+        """
+        if self.inverseVectorLengths is None:
+            self.inverseVectorLengths = NumpyScoring.getInverseVectorLengths(self.vectorLengths)
+
+        return self.inverseVectorLengths
+
+
+    def pinPostings(self, terms, columnar=False):
+        """
+        Reads the postings (and champion lists, if any) of the given terms once, and holds them for the rest of the run,
+        so that queries sharing terms do not read or decode them again. If columnar is True, the NumPy postings are pinned instead.
+        """
+        for term in terms:
+            pointer = self.dictionary.getTermPointer(term)
+            if pointer == -1:  # for non-existent terms
+                continue
+
+            if columnar:
+                self.getColumnarReader().pin(pointer)
+                continue
+
+            self.postingsReader.pin(pointer)
+            if self.hasChampions():
+                self.postingsReader.pin(self.dictionary.getTermChampionsPointer(term))
+
+
+    def decodeBinaryPostings(self, file):
+        """
+        Reads a postings list in the binary format, converting term frequencies into term weights (1 + log10(termFrequency)).
+        """
+        return self.toTermWeights(PostingsCodec.readPostings(file))
+
+
+    def decodeBinaryPostingsAt(self, buffer, pointer):
+        """
+        Decodes a postings list in the binary format straight out of the (memory-mapped) buffer.
+        """
+        postings, end = PostingsCodec.decodePostingsAt(buffer, pointer)
+        return self.toTermWeights(postings), end
+
+
+    def decodeColumnarPostings(self, file):
+        postings = NumpyScoring.decodeColumnarPostings(file)
+        self.timer.count('postingsDecoded', len(postings[0]))
+        return postings
+
+
+    def decodeColumnarPostingsAt(self, buffer, pointer):
+        postings, end = NumpyScoring.decodeColumnarPostingsAt(buffer, pointer)
+        self.timer.count('postingsDecoded', len(postings[0]))
+        return postings, end
+
+
+    def toTermWeights(self, postings):
+        """
+        Given (docIndices, termFrequencies), returns (docIndices, termWeights) where each term weight is 1 + log10(termFrequency).
+        """
+        docIndices, termFrequencies = postings
+        self.timer.count('postingsDecoded', len(docIndices))
+        termWeights = self.TERM_WEIGHTS
+        limit = len(termWeights)
+        return docIndices, array('d', [termWeights[termFrequency] if termFrequency < limit else 1 + math.log10(termFrequency)
+                                       for termFrequency in termFrequencies])
+
+
+    def decodeLegacyPostings(self, file):
+        """
+        Reads a pickled list of Node objects, and converts it into docIndices and term weights.
+        """
+        docIndices = array('i')
+        termWeights = array('d')
+        for node in pickle.load(file):
+            docIndex = self.docOrder[node.getDocID()]
+            docIndices.append(docIndex)
+            termWeights.append(node.getTermWeight())
+            self.vectorLengths[docIndex] = node.getVectorDocLength()
+        self.timer.count('postingsDecoded', len(docIndices))
+
+        return docIndices, termWeights
+
+
+    def getCacheStats(self):
+        """
+        Returns the statistics of the postings cache, summed with those of the cache of NumPy postings if it is in use.
+        """
+        stats = self.postingsReader.getStats()
+        if self.columnarReader is not None:
+            for key, value in self.columnarReader.getStats().items():
+                stats[key] += value
+
+        return stats
+
+
+    def close(self):
+        self.postingsReader.close()
+        if self.columnarReader is not None:
+            self.columnarReader.close()
+        if self.positionsReader is not None:
+            self.positionsReader.close()
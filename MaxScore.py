@@ -0,0 +1,112 @@
+"""
+Document-at-a-time top-k retrieval with MaxScore dynamic pruning.
+
+Each query term has an upper bound on its contribution to any document's score: its normalised query weight
+multiplied by its max score (the largest termWeight / vectorDocLength among its postings), stored in the dictionary at indexing time.
+Terms are sorted by upper bound. The terms with the smallest upper bounds whose bounds sum to no more than the current
+k-th best score are non-essential: a document containing only those terms cannot enter the top k, so candidates are only taken
+from the postings of essential terms, and non-essential postings are only searched (by bisection) for promising candidates.
+
+The ranking is exactly that of the exhaustive term-at-a-time path: scores are summed in the same (query term) order,
+documents are visited in docIndex order so that ties go to the document indexed first, and bounds carry a small slack
+so that rounding can never prune a document that would have made the top k.
+"""
+import heapq
+
+from bisect import bisect_left
+
+SLACK = 1 + 1e-9  # relative slack on upper bounds, far above floating point rounding in the scores
+
+
+def contribution(queryWeight, termWeight, vectorLength):
+    """
+    Contribution of a term to the score of a document, computed as search.cosineScores does.
+    """
+    if vectorLength == 0: # avoids division by 0
+        return 0
+
+    return queryWeight * termWeight / vectorLength
+
+
+def maxScoreTopK(queryWeights, indexHandle, k=10):
+    """
+    Given the normalised query weights {term : weight, ...} (in query term order), returns up to k (score, docIndex) pairs
+    of the highest scoring documents with score > 0, best first.
+    """
+    dictionary = indexHandle.getDictionary()
+    vectorLengths = indexHandle.getVectorLengths()
+
+    # (upper bound, query order, query weight, docIndices, termWeights) of every term that can contribute to a score
+    terms = []
+    for order, (term, queryWeight) in enumerate(queryWeights.items()):
+        if queryWeight > 0:
+            docIndices, termWeights = indexHandle.getPostings(term)
+            if docIndices:
+                terms.append((queryWeight * dictionary.getTermMaxScore(term) * SLACK, order, queryWeight, docIndices, termWeights))
+
+    terms.sort(key=lambda termInfo: termInfo[0])
+    numberOfTerms = len(terms)
+    positions = [0] * numberOfTerms  # current position in the postings of each term
+    boundSums = [0] * (numberOfTerms + 1)  # boundSums[i] = sum of the upper bounds of the i terms with smallest bounds
+    for i in range(numberOfTerms):
+        boundSums[i + 1] = boundSums[i] + terms[i][0]
+
+    topK = []  # min-heap of (score, -docIndex), so that the worst document (lowest score, then indexed last) is at the top
+    threshold = 0  # score a document has to beat to enter the top k
+    firstEssential = 0  # terms[:firstEssential] are non-essential
+
+    while firstEssential < numberOfTerms:
+        # next candidate: the smallest current docIndex among essential terms
+        candidate = None
+        for i in range(firstEssential, numberOfTerms):
+            if positions[i] < len(terms[i][3]):
+                docIndex = terms[i][3][positions[i]]
+                if candidate is None or docIndex < candidate:
+                    candidate = docIndex
+
+        if candidate is None: # essential postings exhausted
+            break
+
+        contributions = {}  # {query order : contribution, ...}
+        estimate = 0
+        for i in range(firstEssential, numberOfTerms):
+            position = positions[i]
+            docIndices = terms[i][3]
+            if position < len(docIndices) and docIndices[position] == candidate:
+                value = contribution(terms[i][2], terms[i][4][position], vectorLengths[candidate])
+                contributions[terms[i][1]] = value
+                estimate += value
+                positions[i] = position + 1
+
+        # non-essential terms, from largest bound to smallest, while the candidate can still beat the threshold
+        for i in range(firstEssential - 1, -1, -1):
+            if estimate * SLACK + boundSums[i + 1] <= threshold:
+                break
+
+            docIndices = terms[i][3]
+            position = bisect_left(docIndices, candidate, positions[i])
+            positions[i] = position
+            if position < len(docIndices) and docIndices[position] == candidate:
+                value = contribution(terms[i][2], terms[i][4][position], vectorLengths[candidate])
+                contributions[terms[i][1]] = value
+                estimate += value
+
+        else:
+            # all terms were looked at; sum in query term order to get exactly the exhaustive score
+            score = 0
+            for order in sorted(contributions):
+                score += contributions[order]
+
+            # candidates come in docIndex order, so a tie with the k-th best score does not enter the top k
+            if score > 0 and (len(topK) < k or score > topK[0][0]):
+                if len(topK) < k:
+                    heapq.heappush(topK, (score, -candidate))
+                else:
+                    heapq.heapreplace(topK, (score, -candidate))
+
+                if len(topK) == k:
+                    threshold = topK[0][0]
+                    while firstEssential < numberOfTerms and boundSums[firstEssential + 1] <= threshold:
+                        firstEssential += 1
+
+    return [(score, -negativeDocIndex) for score, negativeDocIndex in sorted(topK, key=lambda entry: (-entry[0], -entry[1]))]
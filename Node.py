@@ -1,8 +1,12 @@
 class Node(object):
     """
     Node is a class that stores a docID, the term frequency in document <docID>, the term weight, and the vector length of document <docID>.
+    Nodes have no per-instance attribute dict, and are pickled as the arguments of their constructor;
+    Nodes pickled with an attribute dict (by earlier versions) can still be loaded.
     """
 
+    __slots__ = ('docID', 'termFrequency', 'termWeight', 'vectorDocLength')
+
     def __init__(self, docID, termFrequency, termWeight, vectorDocLength):
         self.docID = docID
         self.termFrequency = termFrequency
@@ -32,3 +36,15 @@ class Node(object):
 
     def getDocID(self):
         return self.docID
+
+
+    def __reduce__(self):
+        return Node, (self.docID, self.termFrequency, self.termWeight, self.vectorDocLength)
+
+
+    def __setstate__(self, state):
+        """
+        Restores a Node pickled with an attribute dict.
+        """
+        for attribute, value in state.items():
+            setattr(self, attribute, value)
@@ -0,0 +1,157 @@
+import os
+import pickle
+
+from collections import OrderedDict
+
+import Tokenizers
+
+class Normaliser(object):
+    """
+    Normaliser is a class that applies case-folding + stemming to tokens, and memoises the result in a bounded LRU cache.
+    It also holds the tokenizer backend (see Tokenizers) that splits text into tokens, so that queries are tokenized as documents were.
+    Natural language is Zipfian, so most tokens seen while indexing or searching have been stemmed before.
+    The same class is used by indexing and searching, and its cache can be saved next to the dictionary file,
+    so that query-time stemming of common words is a dictionary lookup.
+    The Porter stemmer is only created (importing NLTK, which is slow) when a token is missing from the cache.
+    """
+
+    STEMS_FILE_SUFFIX = '.stems'
+
+    def __init__(self, maxSize=131072, tokenizer=Tokenizers.DEFAULT_BACKEND):
+        self.stemmer = None  # Porter stemmer, created on the first cache miss
+        self.tokenizer = tokenizer
+        self.tokenize = Tokenizers.getTokenizer(tokenizer)  # text -> list of tokens
+        self.maxSize = maxSize
+        self.cache = OrderedDict()  # {token : normalised term, ...}, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.recordUpdates = False
+        self.newEntries = []  # (token, normalised term) pairs added since takeUpdates was last called, if recordUpdates
+        self.reportedHits = 0
+        self.reportedMisses = 0
+
+
+    def normalise(self, token):
+        """
+        Returns the case-folded and stemmed form of the given token.
+        """
+        try:
+            term = self.cache[token]
+            self.hits += 1
+            self.cache.move_to_end(token)
+            return term
+
+        except KeyError:
+            lowerToken = token.lower()
+            term = self.cache.get(lowerToken) if lowerToken != token else None  # the token in lower case was stemmed before
+            if term is not None:
+                self.hits += 1
+
+            else:
+                self.misses += 1
+                if self.stemmer is None:
+                    from nltk.stem.porter import PorterStemmer
+                    self.stemmer = PorterStemmer()
+                term = self.stemmer.stem(lowerToken)  # stemming + case-folding
+            self.addEntry(token, term)
+            if self.recordUpdates:
+                self.newEntries.append((token, term))
+            return term
+
+
+    def setTokenizer(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.tokenize = Tokenizers.getTokenizer(tokenizer)
+
+
+    def getTokenizer(self):
+        return self.tokenizer
+
+
+    def addEntry(self, token, term):
+        """
+        Adds a (token, normalised term) pair to the cache, evicting the least recently used entry if the cache is full.
+        """
+        if self.maxSize == 0:
+            return
+
+        self.cache[token] = term
+        if len(self.cache) > self.maxSize:
+            self.cache.popitem(last=False)
+
+
+    def setRecordUpdates(self, recordUpdates):
+        self.recordUpdates = recordUpdates
+
+
+    def takeUpdates(self):
+        """
+        Returns a tuple of 3 items: the (token, normalised term) pairs added to the cache, and the number of hits and misses,
+        since the last call. Worker processes use this to send what they have learnt back to the main process.
+        """
+        updates = (self.newEntries, self.hits - self.reportedHits, self.misses - self.reportedMisses)
+        self.newEntries = []
+        self.reportedHits = self.hits
+        self.reportedMisses = self.misses
+        return updates
+
+
+    def addUpdates(self, updates):
+        """
+        Merges the updates returned by takeUpdates in another process into this Normaliser.
+        """
+        entries, hits, misses = updates
+        self.addEntries(entries)
+        self.hits += hits
+        self.misses += misses
+
+
+    def addEntries(self, entries):
+        if not self.cache and 0 < len(entries) <= self.maxSize:  # e.g. a saved cache being loaded
+            self.cache.update(entries)
+            return
+
+        for token, term in entries:
+            if token not in self.cache:
+                self.addEntry(token, term)
+
+
+    def getEntries(self):
+        """
+        Returns the cached (token, normalised term) pairs, most recently used last.
+        """
+        return list(self.cache.items())
+
+
+    def getStats(self):
+        """
+        Returns the cache statistics in the form of {"hits": ..., "misses": ..., "entries": ..., "hitRate": ...}.
+        """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.cache),
+                "hitRate": self.hits / lookups if lookups else 0}
+
+
+    def save(self, storageLocation):
+        """
+        Saves the cached (token, normalised term) pairs, most recently used last.
+        """
+        with open(storageLocation, 'wb') as f:
+            pickle.dump(self.getEntries(), f)
+
+
+    def load(self, storageLocation):
+        """
+        Loads (token, normalised term) pairs saved at the specified storage location into the cache, if the file exists.
+        """
+        if os.path.exists(storageLocation):
+            with open(storageLocation, 'rb') as f:
+                self.addEntries(pickle.load(f))
+
+
+    @classmethod
+    def getStemsFile(cls, dictFile):
+        """
+        Returns the location of the saved cache belonging to the given dictionary file.
+        """
+        return dictFile + cls.STEMS_FILE_SUFFIX
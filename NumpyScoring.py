@@ -0,0 +1,112 @@
+"""
+Vectorised scoring over columnar postings with NumPy.
+
+Postings are decoded straight out of the memory-mapped postings file into parallel arrays (int32 docIndices, float32 term weights),
+using NumPy to decode the variable-byte encoding. A query adds the weighted postings of its terms into a dense score vector
+over all documents, divides it by the array of document vector lengths, and selects the top k with argpartition.
+
+Scores are summed before being normalised, and term weights are single precision, so scores can differ from those of the
+pure-Python engines in their last digits, and documents with (almost) tied scores may be ranked differently.
+NumPy is optional; isAvailable() returns False if it is not installed, and search then uses the pure-Python engines.
+It is imported by isAvailable(), which is called before any other function is used, rather than when this module is imported,
+as importing NumPy takes longer than opening a small index.
+"""
+import PostingsCodec
+
+np = None  # the numpy module, once imported
+numpyMissing = False
+
+
+def isAvailable():
+    global np, numpyMissing
+    if np is None and not numpyMissing:
+        try:
+            import numpy
+            np = numpy
+
+        except ImportError:
+            numpyMissing = True
+
+    return np is not None
+
+
+def decodeVarints(buffer, offset, size):
+    """
+    Decodes the size bytes of consecutive variable-byte encoded integers starting at buffer[offset] into an int64 array.
+    """
+    encoded = np.frombuffer(buffer, dtype=np.uint8, count=size, offset=offset)  # a view of the buffer, no copy
+    ends = np.flatnonzero(encoded < 0x80)  # the last byte of every integer has its high bit unset
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+
+    bytePositions = np.arange(size) - np.repeat(starts, ends - starts + 1)  # position of each byte within its integer
+    groups = (encoded & 0x7F).astype(np.int64) << (7 * bytePositions)
+
+    return np.add.reduceat(groups, starts)
+
+
+def decodeColumnarPostings(file):
+    """
+    Reads a postings list in the binary format from the file into (docIndices as int32, termWeights as float32).
+    """
+    size = PostingsCodec.readVarint(file)
+    return toColumns(decodeVarints(file.read(size), 0, size))
+
+
+def decodeColumnarPostingsAt(buffer, pointer):
+    """
+    Decodes the postings list stored at buffer[pointer] into (docIndices as int32, termWeights as float32).
+    Returns a tuple: (decoded postings, offset of the byte after the postings list).
+    """
+    size, offset = PostingsCodec.decodeVarint(buffer, pointer)
+    return toColumns(decodeVarints(buffer, offset, size)), offset + size
+
+
+def toColumns(values):
+    """
+    Given the decoded integers of a postings list [docFreq, gap, termFreq, gap, termFreq, ...],
+    returns (docIndices as int32, termWeights as float32) where each term weight is 1 + log10(termFrequency).
+    """
+    docIndices = np.cumsum(values[1::2]).astype(np.int32)
+    termWeights = (1 + np.log10(values[2::2])).astype(np.float32)
+
+    return docIndices, termWeights
+
+
+def emptyColumns():
+    return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+
+def getInverseVectorLengths(vectorLengths):
+    """
+    Returns 1 / vectorLength for every document as a float64 array, with 0 for documents of vector length 0.
+    """
+    vectorLengths = np.asarray(vectorLengths, dtype=np.float64)
+    inverse = np.zeros_like(vectorLengths)
+    np.divide(1, vectorLengths, out=inverse, where=vectorLengths != 0)
+
+    return inverse
+
+
+def numpyTopK(queryWeights, indexHandle, k=10):
+    """
+    Given the normalised query weights {term : weight, ...}, returns up to k (score, docIndex) pairs
+    of the highest scoring documents with score > 0, best first (ties broken by docIndex).
+    """
+    inverseVectorLengths = indexHandle.getInverseVectorLengths()
+    scores = np.zeros(len(inverseVectorLengths), dtype=np.float64)  # one per document, including deleted ones in segmented indexes
+
+    for term, queryWeight in queryWeights.items():
+        if queryWeight > 0:
+            docIndices, termWeights = indexHandle.getColumnarPostings(term)
+            scores[docIndices] += np.multiply(termWeights, queryWeight, dtype=np.float64)  # docIndices within a postings list are distinct
+
+    scores *= inverseVectorLengths
+
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    candidates = candidates[np.lexsort((candidates, -scores[candidates]))]  # by score, then by docIndex
+
+    return [(float(scores[docIndex]), int(docIndex)) for docIndex in candidates]
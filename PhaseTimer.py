@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import platform
+import tracemalloc
+
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+
+class PhaseTimer(object):
+    """
+    PhaseTimer is a class that accounts the wall clock and CPU time of the current process to named phases of a run.
+    Phases nest: time spent in a phase started inside another one is charged to the inner phase only, so the times of all phases
+    add up to the time of the run. Stages of a generator pipeline can be timed with timeIterator, which charges the time spent
+    producing each item to the stage, rather than to the phase consuming them.
+    CPU time is that of the thread running the phase; work done by other threads or processes shows up as wall clock time
+    of the phase waiting for it, unless their own timings are added with addTimings.
+
+    Phases can also be charged counters (e.g. bytes read), which count towards the innermost running phase.
+    If traceMemory is True, the peak memory allocated by Python (as traced by tracemalloc) while each phase runs is also recorded;
+    tracing slows down allocations noticeably, so it is meant for profiling runs only.
+    A disabled timer records nothing, and its methods return at once, so that instrumented code costs close to nothing when not profiled.
+    """
+
+    def __init__(self, enabled=True, traceMemory=False):
+        self.enabled = enabled
+        self.traceMemory = enabled and traceMemory
+        self.phases = OrderedDict()  # {name : [wall clock seconds, CPU seconds, calls, peak traced bytes, {counter : total, ...}], ...}, in the order phases first started
+        self.stack = []  # [name, wall clock time, CPU time] of the running phases, innermost last, with the times they were last charged
+        self.startedTracing = False
+        if self.traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.startedTracing = True
+
+
+    def isEnabled(self):
+        return self.enabled
+
+
+    def getPhase(self, name):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = [0, 0, 0, 0, {}]
+
+        return phase
+
+
+    def start(self, name):
+        if not self.enabled:
+            return
+
+        wallTime, cpuTime = time.perf_counter(), time.thread_time()
+        if self.stack:
+            self.charge(self.stack[-1], wallTime, cpuTime)  # the outer phase is paused
+        self.stack.append([name, wallTime, cpuTime])
+        self.getPhase(name)[2] += 1
+
+
+    def stop(self):
+        if not self.enabled:
+            return
+
+        wallTime, cpuTime = time.perf_counter(), time.thread_time()
+        self.charge(self.stack.pop(), wallTime, cpuTime)
+        if self.stack:
+            self.stack[-1][1:] = [wallTime, cpuTime]  # the outer phase resumes
+
+
+    def charge(self, running, wallTime, cpuTime):
+        totals = self.getPhase(running[0])
+        totals[0] += wallTime - running[1]
+        totals[1] += cpuTime - running[2]
+        running[1:] = [wallTime, cpuTime]
+        if self.traceMemory:
+            totals[3] = max(totals[3], tracemalloc.get_traced_memory()[1])  # peak since the last time a phase was charged
+            tracemalloc.reset_peak()
+
+
+    def count(self, counter, amount=1, phase=None):
+        """
+        Adds the given amount to a counter of the given phase, by default of the innermost running phase ('other' if none is running).
+        """
+        if not self.enabled:
+            return
+
+        if phase is None:
+            phase = self.stack[-1][0] if self.stack else 'other'
+        counters = self.getPhase(phase)[4]
+        counters[counter] = counters.get(counter, 0) + amount
+
+
+    def countFileSizes(self, counter, files, phase=None):
+        """
+        Adds the total size of the given files (those that exist) to a counter, e.g. bytesRead or bytesWritten.
+        """
+        if not self.enabled:
+            return
+
+        self.count(counter, sum(os.path.getsize(file) for file in files if os.path.exists(file)), phase)
+
+
+    def phase(self, name):
+        """
+        Returns a context manager that charges the time spent in its block to the given phase.
+        """
+        if not self.enabled:
+            return nullcontext()
+
+        return self.timePhase(name)
+
+
+    @contextmanager
+    def timePhase(self, name):
+        self.start(name)
+        try:
+            yield
+
+        finally:
+            self.stop()
+
+
+    def timeIterator(self, name, iterable):
+        """
+        Returns an iterator over the items of the given iterable, charging the time spent producing them to the given phase.
+        """
+        if not self.enabled:
+            return iter(iterable)
+
+        return self.timeItems(name, iterable)
+
+
+    def timeItems(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            self.start(name)
+            try:
+                item = next(iterator)
+
+            except StopIteration:
+                return
+
+            finally:
+                self.stop()
+
+            yield item
+
+
+    def getTimings(self):
+        """
+        Returns the measurements of all phases in the form of
+        {phase : {"wall": seconds, "cpu": seconds, "calls": number of times started, ["peakTracedBytes": bytes,] counter: total, ...}, ...},
+        in the order phases first started.
+        """
+        timings = OrderedDict()
+        for name, (wallTime, cpuTime, calls, peakTracedBytes, counters) in self.phases.items():
+            timings[name] = {"wall": wallTime, "cpu": cpuTime, "calls": calls}
+            if self.traceMemory:
+                timings[name]["peakTracedBytes"] = peakTracedBytes
+            timings[name].update(counters)
+
+        return timings
+
+
+    def takeTimings(self):
+        """
+        Returns the measurements of getTimings, and forgets them. Worker processes use this to send their timings to the main process.
+        """
+        timings = self.getTimings()
+        self.phases = OrderedDict((name, [0, 0, 0, 0, {}]) for name, _, _ in self.stack)  # running phases are kept, from zero
+        return timings
+
+
+    def addTimings(self, timings):
+        """
+        Adds the measurements returned by getTimings of another timer (e.g. of a worker process or thread) to those of this one.
+        Times and counters add up, and peaks are the larger of the two.
+        """
+        if not self.enabled:
+            return
+
+        for name, measurements in timings.items():
+            totals = self.getPhase(name)
+            for key, value in measurements.items():
+                if key == "wall":
+                    totals[0] += value
+                elif key == "cpu":
+                    totals[1] += value
+                elif key == "calls":
+                    totals[2] += value
+                elif key == "peakTracedBytes":
+                    totals[3] = max(totals[3], value)
+                else:
+                    totals[4][key] = totals[4].get(key, 0) + value
+
+
+    def getCounters(self):
+        """
+        Returns the totals of all counters over all phases, in the form of {counter : total, ...}.
+        """
+        totals = {}
+        for phase in self.phases.values():
+            for counter, value in phase[4].items():
+                totals[counter] = totals.get(counter, 0) + value
+
+        return totals
+
+
+    def formatReport(self):
+        """
+        Returns the measurements of all phases as a table, one phase per line, in the order phases first started.
+        """
+        lines = ['%-16s %10s %10s %9s %12s  %s' % ('phase', 'wall s', 'cpu s', 'calls', 'peak MB', 'counters')]
+        for name, measurements in self.getTimings().items():
+            counters = ' '.join(key + '=' + str(value) for key, value in measurements.items() if key not in ('wall', 'cpu', 'calls', 'peakTracedBytes'))
+            peak = '%.1f' % (measurements["peakTracedBytes"] / (1 << 20)) if "peakTracedBytes" in measurements else '-'
+            lines.append('%-16s %10.4f %10.4f %9d %12s  %s' % (name, measurements["wall"], measurements["cpu"], measurements["calls"], peak, counters))
+
+        return '\n'.join(lines)
+
+
+    def writeStats(self, file, record):
+        """
+        Writes the given record (a dict describing the run), with the measurements of all phases and the totals of all counters,
+        to the given file as JSON, so that runs can be compared (see bench/compare.py).
+        """
+        stats = OrderedDict([("python", platform.python_version())])
+        stats.update(record)
+        stats["phases"] = self.getTimings()
+        stats["counters"] = self.getCounters()
+        with open(file, 'w') as f:
+            json.dump(stats, f, indent=2)
+
+
+    def close(self):
+        """
+        Stops tracing memory allocations, if this timer started it.
+        """
+        if self.startedTracing:
+            tracemalloc.stop()
+            self.startedTracing = False
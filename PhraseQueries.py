@@ -0,0 +1,142 @@
+"""
+Phrase queries and proximity boosts over positional indexes (see index.py --positional).
+
+A query can hold "quoted phrases": its words are ranked as ordinary query terms, and a document only matches if it also holds
+every phrase, with the terms of the phrase at consecutive positions. With a positive proximity weight, the score of every
+matching document is multiplied by 1 + weight * (m - 1) / (w - 1), where m is the number of distinct query terms it holds (if at least 2),
+and w the length of the smallest window of its tokens holding all of them: 1 + weight if they are next to each other.
+
+Positions are only read for the candidates that survive ranked retrieval: the engine ranks the top CANDIDATES documents
+as for a plain query, and those holding all phrase terms are checked and boosted. If fewer than k of them match the phrases,
+GROWTH times as many candidates are ranked, until k documents match or the engine runs out of documents; and once there are no more
+documents holding all phrase terms than candidates, those are checked and scored directly instead. Either way, the documents
+matching the phrases are exactly the top k of the plain ranking that do; proximity boosts only reorder the candidates.
+"""
+import re
+import heapq
+
+from bisect import bisect_left
+
+from MaxScore import contribution
+
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+CANDIDATES = 100  # documents ranked before positions are read
+GROWTH = 4  # growth of the number of candidates while too few of them match the phrases
+
+
+def splitPhrases(query):
+    """
+    Returns a tuple: (the query without its double quotes, [text of each quoted phrase, ...]). An unmatched quote is dropped.
+    """
+    return query.replace('"', ' '), PHRASE_PATTERN.findall(query)
+
+
+def positionalTopK(queryWeights, phrases, proximityWeight, indexHandle, rankTopK, k=10):
+    """
+    Given the normalised query weights {term : weight, ...} of a query, its phrases as tuples of terms, and a function returning the top n
+    documents of the query by the ranking engine as (score, docIndex) pairs, best first, returns up to k (score, docIndex) pairs
+    of the documents matching all phrases, with scores boosted by proximity, best first.
+    """
+    proximityTerms = [term for term, weight in queryWeights.items() if weight > 0] if proximityWeight > 0 else []
+    phraseTerms = {term for phrase in phrases for term in phrase}
+    withPhraseTerms = getDocumentsWithTerms(phraseTerms, indexHandle) if phrases else None  # the only documents that can match
+    boosts = {}  # {docIndex : proximity boost, or None if the document does not match the phrases, ...} of the candidates checked
+    timer = indexHandle.getTimer()
+
+    numberOfCandidates = max(CANDIDATES, k)
+    while True:
+        if withPhraseTerms is not None and len(withPhraseTerms) <= numberOfCandidates:  # few enough to check them all
+            candidates = scoreDocuments(queryWeights, indexHandle, sorted(withPhraseTerms))
+            exhausted = True
+
+        else:
+            candidates = rankTopK(numberOfCandidates)
+            exhausted = len(candidates) < numberOfCandidates
+
+        with timer.phase('positions'):
+            docIndices = sorted(docIndex for score, docIndex in candidates
+                                if docIndex not in boosts and (withPhraseTerms is None or docIndex in withPhraseTerms))
+            positions = {term: indexHandle.getPositions(term, docIndices) for term in phraseTerms.union(proximityTerms)}
+            for docIndex in docIndices:
+                boosts[docIndex] = getBoost(docIndex, phrases, proximityTerms, proximityWeight, positions)
+
+        results = [(score * boosts[docIndex], docIndex) for score, docIndex in candidates if boosts.get(docIndex) is not None]
+        if not phrases or len(results) >= k or exhausted:
+            break
+        numberOfCandidates *= GROWTH
+
+    results.sort(key=lambda result: (-result[0], result[1]))  # ties go to the document indexed first
+    return results[:k]
+
+
+def getDocumentsWithTerms(terms, indexHandle):
+    """
+    Returns the set of docIndices of the documents holding all the given terms.
+    """
+    postingsLists = sorted((indexHandle.getPostings(term)[0] for term in terms), key=len)
+    return set(postingsLists[0]).intersection(*postingsLists[1:])
+
+
+def scoreDocuments(queryWeights, indexHandle, docIndices):
+    """
+    Given the normalised query weights {term : weight, ...} of a query and some docIndices in ascending order, returns the (score, docIndex)
+    pairs of those of the documents with score > 0, with scores summed in query term order, as the engines do.
+    """
+    vectorLengths = indexHandle.getVectorLengths()
+    scores = dict.fromkeys(docIndices, 0)
+    for term, queryWeight in queryWeights.items():
+        if queryWeight > 0:
+            postingsDocIndices, termWeights = indexHandle.getPostings(term)
+            for docIndex in docIndices:
+                ordinal = bisect_left(postingsDocIndices, docIndex)
+                if ordinal < len(postingsDocIndices) and postingsDocIndices[ordinal] == docIndex:
+                    scores[docIndex] += contribution(queryWeight, termWeights[ordinal], vectorLengths[docIndex])
+
+    return [(score, docIndex) for docIndex, score in scores.items() if score > 0]
+
+
+def getBoost(docIndex, phrases, proximityTerms, proximityWeight, positions):
+    """
+    Returns the factor the score of the given document is boosted by, or None if it does not hold all the phrases,
+    given the positions of the phrase and proximity terms in the documents checked, as {term : {docIndex : [position, ...], ...}, ...}.
+    """
+    if not all(containsPhrase([positions[term].get(docIndex) for term in phrase]) for phrase in phrases):
+        return None
+
+    positionLists = [positions[term][docIndex] for term in proximityTerms if docIndex in positions[term]]
+    if len(positionLists) < 2:
+        return 1
+
+    return 1 + proximityWeight * (len(positionLists) - 1) / (getSmallestWindow(positionLists) - 1)
+
+
+def containsPhrase(positionLists):
+    """
+    Given the positions in a document of each term of a phrase, in phrase order (None for a term the document does not hold),
+    returns True if the terms follow each other somewhere in the document.
+    """
+    if any(positions is None for positions in positionLists):
+        return False
+
+    following = [set(positions) for positions in positionLists[1:]]
+    return any(all(start + offset in positions for offset, positions in enumerate(following, 1)) for start in positionLists[0])
+
+
+def getSmallestWindow(positionLists):
+    """
+    Given several lists of positions in ascending order, returns the length of the smallest window of positions
+    holding at least one position of every list.
+    """
+    heap = [(positions[0], listIndex, 0) for listIndex, positions in enumerate(positionLists)]
+    heapq.heapify(heap)
+    end = max(positions[0] for positions in positionLists)
+    smallest = end - heap[0][0] + 1
+    while True:
+        start, listIndex, index = heapq.heappop(heap)
+        smallest = min(smallest, end - start + 1)
+        if index + 1 == len(positionLists[listIndex]):  # no window starts further on with this list
+            return smallest
+
+        position = positionLists[listIndex][index + 1]
+        end = max(end, position)
+        heapq.heappush(heap, (position, listIndex, index + 1))
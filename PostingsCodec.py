@@ -0,0 +1,370 @@
+"""
+Binary postings format (version 1).
+
+The postings file starts with MAGIC followed by a version byte. Each postings list is stored as
+    varint(number of bytes that follow) varint(docFreq) [varint(docIndexGap) varint(termFrequency)] * docFreq
+where docIndex is the position of the document in the shared document table, and gaps are taken over docIndices sorted in ascending order.
+The document table is stored as
+    varint(number of bytes that follow) varint(N) [varint(len(docID)) docID varint(docLength)] * N float64 * N
+where the trailing N little-endian doubles are the vector lengths of the documents, in document table order.
+
+Positional indexes (index.py --positional) also have a positions file (<postings file>.pos), so that ranked queries, which only
+read postings, do not pay for positions. It starts with POSITIONS_MAGIC followed by the version byte. The positions of each term are stored as
+    varint(number of bytes that follow) varint(numberOfSkips) varint(skipOffset) * numberOfSkips [varint(size) varint(positionGap) * termFrequency] * docFreq
+with one entry per posting, in the order of the postings list of the term, holding the positions of the term in that document as gaps
+(the first one from 0), in size bytes. The i-th skip offset is where the entry of posting (i + 1) * SKIP_INTERVAL starts, counted from
+the first entry, so that the positions of a few postings are found without going through all the entries before them.
+The positions file ends with a length-prefixed pickled {term : pointer, ...}, followed by its own pointer as 8 little-endian bytes.
+"""
+import pickle
+import struct
+
+from array import array
+
+MAGIC = b'HW4P'
+VERSION = 1
+HEADER = MAGIC + bytes([VERSION])
+
+POSITIONS_MAGIC = b'HW4Q'
+POSITIONS_HEADER = POSITIONS_MAGIC + bytes([VERSION])
+POSITIONS_FILE_SUFFIX = '.pos'
+SKIP_INTERVAL = 64  # postings between skip offsets of a positions record
+
+
+def isBinaryPostingsFile(file):
+    """
+    Returns True if the postings file at the given path is stored in the binary format.
+    Postings files written with pickle (the legacy format) start with the pickle protocol marker instead.
+    """
+    with open(file, 'rb') as f:
+        header = f.read(len(HEADER))
+
+    if header[:len(MAGIC)] != MAGIC:
+        return False
+
+    if header[len(MAGIC)] != VERSION:
+        raise ValueError("unsupported postings format version " + str(header[len(MAGIC)]) + " in " + file)
+
+    return True
+
+
+def encodeVarint(value, output):
+    """
+    Appends value to the bytearray output using variable-byte encoding:
+    7 bits per byte, least significant group first, with the high bit set on every byte except the last.
+    """
+    while value >= 0x80:
+        output.append((value & 0x7F) | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def decodeVarint(buffer, offset):
+    """
+    Decodes a variable-byte encoded integer starting at buffer[offset].
+    Returns a tuple: (value, offset of the byte after the integer).
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def readVarint(file):
+    """
+    Reads a variable-byte encoded integer from the current position of the given file.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = file.read(1)[0]
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value
+        shift += 7
+
+
+def writeRecord(file, payload):
+    """
+    Writes payload to file, prefixed with its length, so that it can be read back without parsing it.
+    """
+    prefix = bytearray()
+    encodeVarint(len(payload), prefix)
+    file.write(prefix)
+    file.write(payload)
+
+
+def readRecord(file):
+    """
+    Reads a length-prefixed payload from the current position of the given file.
+    """
+    return file.read(readVarint(file))
+
+
+def encodePostings(postings):
+    """
+    Given a list of (docIndex, termFrequency) pairs, returns the encoded postings list.
+    """
+    output = bytearray()
+    encodeVarint(len(postings), output)
+
+    previousDocIndex = 0
+    for docIndex, termFrequency in sorted(postings):
+        encodeVarint(docIndex - previousDocIndex, output)  # gap from the previous docIndex
+        encodeVarint(termFrequency, output)
+        previousDocIndex = docIndex
+
+    return output
+
+
+def encodePostingsArrays(docIndices, termFrequencies):
+    """
+    Given the docIndices (in ascending order) and term frequencies of a postings list, as 2 sequences of ints,
+    returns the encoded postings list, as encodePostings does.
+    """
+    output = bytearray()
+    encodeVarint(len(docIndices), output)
+
+    previousDocIndex = 0
+    for docIndex, termFrequency in zip(docIndices, termFrequencies):
+        encodeVarint(docIndex - previousDocIndex, output)  # gap from the previous docIndex
+        encodeVarint(termFrequency, output)
+        previousDocIndex = docIndex
+
+    return output
+
+
+def decodePostings(buffer, offset=0):
+    """
+    Decodes an encoded postings list starting at buffer[offset].
+    Returns a tuple of 2 arrays of ints: (docIndices in ascending order, termFrequencies).
+    """
+    docFrequency, offset = decodeVarint(buffer, offset)
+    docIndices = [0] * docFrequency
+    termFrequencies = [0] * docFrequency
+
+    docIndex = 0
+    for i in range(docFrequency):
+        gap, offset = decodeVarint(buffer, offset)
+        docIndex += gap
+        docIndices[i] = docIndex
+        termFrequencies[i], offset = decodeVarint(buffer, offset)
+
+    return array('i', docIndices), array('i', termFrequencies)  # packed, as postings stay cached; filling lists first is faster
+
+
+def readPostings(file):
+    """
+    Reads and decodes the postings list stored at the current position of the given file.
+    """
+    return decodePostings(readRecord(file))
+
+
+def decodePostingsAt(buffer, pointer):
+    """
+    Decodes the postings list stored at buffer[pointer] without copying it out of the buffer (e.g. a memory-mapped file).
+    Returns a tuple: (decoded postings, offset of the byte after the postings list).
+    """
+    size, offset = decodeVarint(buffer, pointer)
+    return decodePostings(buffer, offset), offset + size
+
+
+def encodeDocTable(docIDs, docLengths, vectorLengths):
+    """
+    Given 3 lists in document table order (docIDs, lengths of documents, vector lengths of documents),
+    returns the encoded document table.
+    """
+    output = bytearray()
+    encodeVarint(len(docIDs), output)
+
+    for docID, docLength in zip(docIDs, docLengths):
+        encodedDocID = docID.encode('utf8')
+        encodeVarint(len(encodedDocID), output)
+        output += encodedDocID
+        encodeVarint(docLength, output)
+
+    output += struct.pack('<' + str(len(vectorLengths)) + 'd', *vectorLengths)
+
+    return output
+
+
+def decodeDocTable(buffer, offset=0):
+    """
+    Decodes an encoded document table starting at buffer[offset].
+    Returns a tuple of 3 lists: (docIDs, lengths of documents, vector lengths of documents).
+    """
+    numberOfDocs, offset = decodeVarint(buffer, offset)
+    docIDs = [None] * numberOfDocs
+    docLengths = [0] * numberOfDocs
+
+    for i in range(numberOfDocs):
+        size, offset = decodeVarint(buffer, offset)
+        docIDs[i] = bytes(buffer[offset:offset + size]).decode('utf8')
+        offset += size
+        docLengths[i], offset = decodeVarint(buffer, offset)
+
+    vectorLengths = list(struct.unpack_from('<' + str(numberOfDocs) + 'd', buffer, offset))
+
+    return docIDs, docLengths, vectorLengths
+
+
+def readDocTable(file):
+    """
+    Reads and decodes the document table stored at the current position of the given file.
+    """
+    return decodeDocTable(readRecord(file))
+
+
+def decodeDocTableAt(buffer, pointer):
+    """
+    Decodes the document table stored at buffer[pointer] without copying it out of the buffer.
+    Returns a tuple: (decoded document table, offset of the byte after the document table).
+    """
+    size, offset = decodeVarint(buffer, pointer)
+    return decodeDocTable(buffer, offset), offset + size
+
+
+def getPositionsFile(postingsFile):
+    """
+    Returns the location of the positions file belonging to the given postings file.
+    """
+    return postingsFile + POSITIONS_FILE_SUFFIX
+
+
+def encodePositions(termFrequencies, positions):
+    """
+    Given the term frequencies of a postings list and the positions of the term in each of its documents, as one sequence of ints
+    (termFrequency ascending positions per posting, in postings order), returns the encoded positions record.
+    """
+    entries = bytearray()
+    skipOffsets = []
+    start = 0
+    for ordinal, termFrequency in enumerate(termFrequencies):
+        if ordinal > 0 and ordinal % SKIP_INTERVAL == 0:
+            skipOffsets.append(len(entries))
+
+        entry = bytearray()
+        previousPosition = 0
+        for position in positions[start:start + termFrequency]:
+            encodeVarint(position - previousPosition, entry)  # gap from the previous position
+            previousPosition = position
+        start += termFrequency
+
+        encodeVarint(len(entry), entries)
+        entries += entry
+
+    output = bytearray()
+    encodeVarint(len(skipOffsets), output)
+    for skipOffset in skipOffsets:
+        encodeVarint(skipOffset, output)
+    output += entries
+
+    return output
+
+
+def decodePositionsRecord(buffer):
+    """
+    Decodes the skip offsets of an encoded positions record.
+    Returns a tuple: (skip offsets, buffer, offset of the first entry), which findPositions and decodeAllPositions take.
+    """
+    numberOfSkips, offset = decodeVarint(buffer, 0)
+    skipOffsets = [0] * numberOfSkips
+    for i in range(numberOfSkips):
+        skipOffsets[i], offset = decodeVarint(buffer, offset)
+
+    return skipOffsets, buffer, offset
+
+
+def readPositions(file):
+    """
+    Reads the positions record stored at the current position of the given file, as decodePositionsRecord returns it.
+    """
+    return decodePositionsRecord(readRecord(file))
+
+
+def decodePositionsAt(buffer, pointer):
+    """
+    Reads the positions record stored at buffer[pointer] (e.g. a memory-mapped file), copying it out of the buffer, as it is decoded lazily.
+    Returns a tuple: (record, offset of the byte after the record).
+    """
+    size, offset = decodeVarint(buffer, pointer)
+    return decodePositionsRecord(bytes(buffer[offset:offset + size])), offset + size
+
+
+def decodeGaps(buffer, offset, end):
+    """
+    Decodes the gap-encoded positions in buffer[offset:end] into a list of positions.
+    """
+    positions = []
+    position = 0
+    while offset < end:
+        gap, offset = decodeVarint(buffer, offset)
+        position += gap
+        positions.append(position)
+
+    return positions
+
+
+def findPositions(record, ordinals):
+    """
+    Given a positions record (see decodePositionsRecord) and the ordinals of some of its postings in ascending order,
+    returns the list of positions of each of them, in the same order.
+    """
+    skipOffsets, buffer, entriesStart = record
+    allPositions = []
+    ordinal, offset = 0, entriesStart  # entry at the current offset
+    for target in ordinals:
+        skip = target // SKIP_INTERVAL
+        if skip > 0 and skip * SKIP_INTERVAL > ordinal:  # jump over whole intervals
+            ordinal, offset = skip * SKIP_INTERVAL, entriesStart + skipOffsets[skip - 1]
+
+        while ordinal < target:
+            size, offset = decodeVarint(buffer, offset)
+            offset += size
+            ordinal += 1
+
+        size, start = decodeVarint(buffer, offset)
+        allPositions.append(decodeGaps(buffer, start, start + size))
+
+    return allPositions
+
+
+def decodeAllPositions(record):
+    """
+    Decodes all the entries of a positions record (see decodePositionsRecord) into one array of ints, in the form encodePositions takes.
+    """
+    skipOffsets, buffer, offset = record
+    positions = array('i')
+    while offset < len(buffer):
+        size, offset = decodeVarint(buffer, offset)
+        positions.extend(decodeGaps(buffer, offset, offset + size))
+        offset += size
+
+    return positions
+
+
+def writePositionsTable(file, pointers):
+    """
+    Ends a positions file with the given {term : pointer, ...}, followed by its own pointer.
+    """
+    pointer = file.tell()
+    writeRecord(file, pickle.dumps(pointers, pickle.HIGHEST_PROTOCOL))
+    file.write(struct.pack('<q', pointer))
+
+
+def readPositionsTable(file):
+    """
+    Reads the {term : pointer, ...} table at the end of the given positions file (an open binary file or a memory-mapped buffer).
+    """
+    file.seek(0)
+    if file.read(len(POSITIONS_HEADER)) != POSITIONS_HEADER:
+        raise ValueError("unsupported positions file format")
+
+    file.seek(-8, 2)
+    file.seek(struct.unpack('<q', file.read(8))[0])
+    return pickle.loads(readRecord(file))
@@ -0,0 +1,134 @@
+import mmap
+import os
+import pickle
+
+from collections import OrderedDict
+
+class PostingsReader(object):
+    """
+    PostingsReader is a class that keeps one open handle to a postings file for the whole run,
+    and holds recently decoded postings in a bounded LRU cache keyed by pointer.
+    The cache can be bounded by the number of entries, by the (on-disk) size in bytes of the entries, or both.
+    A bound of 0 disables caching; a bound of None leaves that dimension unbounded.
+    Postings can also be pinned: they are then held outside the cache, and never evicted, until the reader is closed.
+    decode is the function that reads one entry from the current position of the file, pickle.load by default.
+
+    If useMmap is True, the file is memory-mapped (read-only) instead, so that several processes share the OS page cache
+    for it and entries are read without open()/read() calls. decodeAt(buffer, pointer), if given, then decodes an entry
+    straight out of the mapped buffer and returns (entry, offset of the byte after the entry); otherwise decode
+    is applied to the mapped file, which behaves like a file object.
+
+    If a PhaseTimer is set, the time spent reading and decoding entries that are not cached is charged to the phase postingsFetch,
+    with the number of entries and bytes read.
+    """
+
+    def __init__(self, postingsFile, maxEntries=1024, maxBytes=None, decode=pickle.load, decodeAt=None, useMmap=False):
+        self.postingsFile = postingsFile
+        self.file = open(postingsFile, 'rb')
+        self.buffer = None
+        if useMmap and os.path.getsize(postingsFile) > 0:  # empty files cannot be mapped
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.file.close()  # the mapping stays valid after the file is closed
+            self.file = self.buffer
+        self.decode = decode
+        self.decodeAt = decodeAt
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+
+        self.cache = OrderedDict()  # {pointer : (postings, sizeInBytes), ...}, least recently used first
+        self.cachedBytes = 0
+        self.pinned = {}  # {pointer : postings, ...}
+        self.hits = 0
+        self.misses = 0
+        self.timer = None  # PhaseTimer, only set when profiling
+
+
+    def retrieve(self, pointer, cache=True, decode=None, decodeAt=None):
+        """
+        Given a pointer to determine the location in disk, retrieves the postings stored at that location.
+        Postings are served from the cache if present, and added to it after being read if cache is True.
+        decode and decodeAt override the reader's decode functions for this entry.
+        """
+        if pointer in self.pinned:
+            self.hits += 1
+            return self.pinned[pointer]
+
+        if pointer in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(pointer)
+            return self.cache[pointer][0]
+
+        self.misses += 1
+        if self.timer is not None:
+            self.timer.start('postingsFetch')
+
+        decodeAt = decodeAt or self.decodeAt
+        if self.buffer is not None and decodeAt is not None:
+            postings, end = decodeAt(self.buffer, pointer)
+
+        else:
+            if self.file.tell() != pointer:  # merging reads postings in file order, so seeking is often unnecessary
+                self.file.seek(pointer)
+            postings = (decode or self.decode)(self.file)
+            end = self.file.tell()
+
+        if self.timer is not None:
+            self.timer.count('postingsListsRead')
+            self.timer.count('bytesRead', end - pointer)
+            self.timer.stop()
+
+        if cache:
+            self.addToCache(pointer, postings, end - pointer)
+
+        return postings
+
+
+    def setTimer(self, timer):
+        """
+        Sets the PhaseTimer charged with reading entries, or None.
+        """
+        self.timer = timer
+
+
+    def pin(self, pointer):
+        """
+        Reads the postings stored at the given pointer (unless already pinned) and holds them until the reader is closed.
+        """
+        if pointer not in self.pinned:
+            self.pinned[pointer] = self.retrieve(pointer, cache=False)
+
+
+    def addToCache(self, pointer, postings, size):
+        """
+        Adds decoded postings to the cache, evicting least recently used entries until the bounds are met.
+        """
+        if self.maxEntries == 0 or self.maxBytes == 0 or (self.maxBytes is not None and size > self.maxBytes):
+            return
+
+        self.cache[pointer] = (postings, size)
+        self.cachedBytes += size
+
+        while (self.maxEntries is not None and len(self.cache) > self.maxEntries) or \
+                (self.maxBytes is not None and self.cachedBytes > self.maxBytes):
+            evicted = self.cache.popitem(last=False)
+            self.cachedBytes -= evicted[1][1]
+
+
+    def getStats(self):
+        """
+        Returns the cache statistics in the form of {"hits": ..., "misses": ..., "entries": ..., "bytes": ..., "pinned": ...}.
+        """
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.cache), "bytes": self.cachedBytes, "pinned": len(self.pinned)}
+
+
+    def close(self):
+        self.pinned = {}
+        self.file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,92 @@
+import time
+
+from collections import OrderedDict
+
+class ResultCache(object):
+    """
+    ResultCache is a class that holds the results of recent queries in a bounded LRU cache, so that repeated queries are not scored again.
+    Queries are keyed on their stemmed term frequency vector (see getQueryKey), so queries with the same terms in any order,
+    or differing only in terms that do not affect scores, share an entry.
+
+    Entries are bounded by number, and optionally expire ttl seconds after being added. Every lookup and insertion carries
+    the version of the index the result was computed on (see IndexHandle.getVersion); when the version changes,
+    e.g. after the index was rebuilt and reloaded, all entries are dropped.
+    """
+
+    def __init__(self, maxEntries=1024, ttl=None):
+        self.maxEntries = maxEntries
+        self.ttl = ttl  # in seconds, None for no expiry
+        self.cache = OrderedDict()  # {key : (result, expiry time), ...}, least recently used first
+        self.indexVersion = None
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+
+    @staticmethod
+    def getQueryKey(termFrequencies, queryWeights, engine, phrases=(), proximity=0):
+        """
+        Given the stemmed term frequencies {term : frequency, ...} of a query and its normalised query weights,
+        returns the key of the query: its terms of non-zero weight and their frequencies, in term order, and the engine used,
+        with its phrases (tuples of terms, see search.computeQueryPhrases) in phrase order and the weight of proximity boosts.
+        """
+        return engine, tuple(sorted((term, frequency) for term, frequency in termFrequencies.items() if queryWeights[term] > 0)), \
+            tuple(sorted(phrases)), proximity
+
+
+    def checkVersion(self, indexVersion):
+        if indexVersion != self.indexVersion:
+            if self.cache:
+                self.invalidations += 1
+            self.cache.clear()
+            self.indexVersion = indexVersion
+
+
+    def get(self, indexVersion, key):
+        """
+        Returns the cached result of the given key, or None if it is not cached (or has expired).
+        """
+        self.checkVersion(indexVersion)
+        if key in self.cache:
+            result, expiry = self.cache[key]
+            if expiry is None or time.monotonic() < expiry:
+                self.hits += 1
+                self.cache.move_to_end(key)
+                return result
+
+            self.expired += 1
+            del self.cache[key]
+
+        self.misses += 1
+        return None
+
+
+    def recordHit(self):
+        """
+        Counts a lookup answered without the cache by a result being computed for the same key, e.g. a repeated query in a batch.
+        """
+        self.hits += 1
+
+
+    def put(self, indexVersion, key, result):
+        """
+        Caches the result of the given key, evicting the least recently used entries beyond maxEntries.
+        """
+        self.checkVersion(indexVersion)
+        if self.maxEntries == 0:
+            return
+
+        self.cache[key] = (result, None if self.ttl is None else time.monotonic() + self.ttl)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.maxEntries:
+            self.cache.popitem(last=False)
+
+
+    def getStats(self):
+        """
+        Returns the cache statistics in the form of {"hits": ..., "misses": ..., "entries": ..., "hitRate": ..., "expired": ..., "invalidations": ...}.
+        """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.cache), "hitRate": self.hits / lookups if lookups else 0,
+                "expired": self.expired, "invalidations": self.invalidations}
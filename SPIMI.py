@@ -1,187 +1,134 @@
-import pickle
 import os
-import math
+import heapq
+import itertools
+
+from array import array
+from contextlib import nullcontext
+
+import PostingsCodec
 
 from TermDictionary import TermDictionary
+from SPIMIBlock import SPIMIBlock
 
-def SPIMIInvert(tokenStream, outputFile, dictFile):
+def SPIMIInvert(tokenStream, outputFile, dictFile, positionsFile=None):
     """
     This function is akin to the one we've seen the in textbook. Each call to
     SPIMIInvert writes a block to disk.
+    Indexing inverts documents incrementally into a SPIMIBlock instead; this inverts a whole token stream at once.
+    If positionsFile is given, the tokens carry their positions (see index.generateTokenStreamWithVectorLength), which are written there.
     """
-    tempDict = {} # {term : {docID : [termFreq, weight, vectorLength], docID2 : [termFreq, weight, vectorLength2], ...}, term2 : ...}
-    termDict = TermDictionary(dictFile)
-
-    for termDocIDWeightLengthQuartet in tokenStream: # tokenStream is in the form of [(term1, docID, weight, vectorLength), (term2, docID, weight, vectorLength2), ...]
-        term = termDocIDWeightLengthQuartet[0]
-        docID = termDocIDWeightLengthQuartet[1] 
-        weight = termDocIDWeightLengthQuartet[2]
-        vectorDocLength = termDocIDWeightLengthQuartet[3] # can have 2 occurence of the same term hence 2 occurence of the vectorLength
-        if term not in tempDict:
-            tempDict[term] = {}
-            tempDict[term][docID] = [1, weight, vectorDocLength]
-        else:
-            # 2 cases when term is already present in the tempDict:
-            #   1. we have seen its docID
-            if docID in tempDict[term]:
-                tempDict[term][docID][0]+=1
-
-            #   2. we have not seen its docID
-            else:
-                tempDict[term][docID] = [1, weight, vectorDocLength]
-
-    with open(outputFile, 'wb') as f:
-        for term in sorted(tempDict): # {term : {docID : [termFreq, weight, vectorLength], docID2 : [termFreq, weight, vectorLength2], ...}, term2 : ...}
-            pointer = f.tell()
-            pickle.dump(tempDict[term], f) # store the dictionary {docID : [termFreq, weight, vectorLength], docID2 : [termFreq, weight, vectorLength2], ...}
-            termDict.addTerm(term, len(tempDict[term]), pointer) # update TermDictionary
-    
-    termDict.save()
+    block = SPIMIBlock(positionsFile is not None)
+    block.addTokens(tokenStream) # tokenStream is in the form of [(term1, docIndex, termFreq, weight, vectorLength), (term2, docIndex, termFreq, weight, vectorLength2), ...]
+    block.write(outputFile, dictFile, positionsFile)
 
 
-def retrievePostingsDict(file, pointer):
+def mergePostings(postingsLists):
     """
-    Given a pointer to determine the location in disk, 
-    retrieves the postings dictionary from that location.
+    Merges any number of postings lists of the same term, each in the form of (docIndices in ascending order, termFrequencies),
+    into one in the same form. Blocks hold documents in the order they were indexed, so the lists usually follow each other
+    and are concatenated; a docIndex found in several lists (a docID repeated in the input) has its term frequencies added up.
+    Postings lists of positional blocks have the positions of the term as a third array (see SPIMIBlock), which are merged alike.
     """
-    if pointer == -1: # for non-existent terms
-        return {}
-
-    with open(file, 'rb') as f:
-        f.seek(pointer)
-        postingsList = pickle.load(f)
+    postingsLists = [postings for postings in postingsLists if len(postings[0]) > 0]
+    if len(postingsLists) == 1:
+        return postingsLists[0]
 
-    return postingsList
+    merged = tuple(array('i') for _ in (postingsLists[0] if postingsLists else range(2)))
+    for postings in postingsLists:
+        if len(merged[0]) > 0 and postings[0][0] <= merged[0][-1]:  # overlapping lists
+            merged = mergeOverlappingPostings(merged, postings)
 
+        else:
+            for column, values in zip(merged, postings):
+                column.extend(values)
 
-def mergeDictsAndPostings(dictFile1, postingsFile1, dictFile2, postingsFile2, outputdictFile, outputPostingsFile):
-    """
-    This function serves to merge 2 dictionaries and their respective postings files into 1 dictionary and 1 postings file.
-    """
-    termDict = TermDictionary(outputdictFile) # output dictionary after merging
-    dict1 = TermDictionary(dictFile1)
-    dict1.load()
-    dict2 = TermDictionary(dictFile2)
-    dict2.load()
-    
-    # what I want is to merge 2 dictionaries
-    # use term pointers in them to access the postingIDs
-    # create a new TermDictionary
-    # retrieve the 2 sets of postingsIDs, combine them together
-    # get pointer in outputposting file, f.tell()
-    # dump the combined postings list into this file
-    # update TermDictionary with the term, docFreq (size of set), and pointer
-    with open(outputPostingsFile, 'wb') as output:
-        keySet1 = set(dict1.getAllKeys()) # all terms only
-        keySet2 = set(dict2.getAllKeys()) # all terms only
-        unionOfKeys = sorted(keySet1.union(keySet2)) # all (unique) keys (i.e. terms) from the 2 dictionaries to be merged.
-
-        for key in unionOfKeys:
-            postings1 = retrievePostingsDict(postingsFile1, dict1.getTermPointer(key)) #retrieves postingsDict if term is present, else {}
-            postings2 = retrievePostingsDict(postingsFile2, dict2.getTermPointer(key))
-            mergedPostingsDict = mergePostingsDict(postings1, postings2)
-            
-            pointer = output.tell()
-            termDict.addTerm(key, len(mergedPostingsDict), pointer)
-            pickle.dump(mergedPostingsDict, output) # storing a dictionary of postings: {docID : termFreq, docID2 : termFreq, ...}
-
-    # end of merging dictionaries and postings file
-    # delete the files that have been merged to free up space.
-    os.remove(dictFile1)
-    os.remove(dictFile2)
-    os.remove(postingsFile1)
-    os.remove(postingsFile2)
-    termDict.save()
+    return merged
 
 
-def mergePostingsDict(dict1, dict2):
+def mergeOverlappingPostings(postings1, postings2):
     """
-    Merges 2 postings dictionary together.
-    Result is in the form of {term1 : [combinedTermFrequency, normWeight], term2 : [combinedTermFrequency, normWeight], ...}
+    Merges 2 postings lists of the same term whose docIndices overlap, as mergePostings does.
+    Positions of a docIndex in the second list come after those in the first (see index.invertDocuments).
     """
-    docIDs1 = set(dict1.keys())
-    docIDs2 = set(dict2.keys())
-    unionOfDocIDs = sorted(docIDs1.union(docIDs2))
-    result = {}
+    combined = {}  # {docIndex : [termFrequency(, positions)], ...}
+    for postings in (postings1, postings2):
+        start = 0
+        for docIndex, termFrequency in zip(postings[0], postings[1]):
+            entry = combined.setdefault(docIndex, [0, array('i')])
+            entry[0] += termFrequency
+            if len(postings) > 2:
+                entry[1] = entry[1] + postings[2][start:start + termFrequency]
+                start += termFrequency
+
+    docIndices = array('i', sorted(combined))
+    merged = (docIndices, array('i', [combined[docIndex][0] for docIndex in docIndices]))
+    if len(postings1) > 2:
+        merged += (array('i', [position for docIndex in docIndices for position in combined[docIndex][1]]),)
 
-    for docID in unionOfDocIDs:
-        result[docID] = [getTermFrequency(dict1, docID) + getTermFrequency(dict2, docID), 
-            max(getTermWeight(dict1, docID), getTermWeight(dict2, docID)), max(getVectorDocLength(dict1, docID), getVectorDocLength(dict2, docID))]
-            # max() is used because of the way we process files; we process documents fully, and 1024 at a time. Thus, no 2 dictionary file will contain the same
-            # docIDs. max() is used because we don't know which of the 2 dictionary contains a particular docID.
+    return merged
 
-    return result
-        
 
-def getTermFrequency(postingsDict, docID):
+def readBlock(dictFile, postingsFile, positionsFile=None, bufferSize=1 << 20):
     """
-    A clean implementation of retrieving a value from the dictionary.
-    Returns the term frequency associated with the key if the key is present.
-    Else, return 0.
+    Yields (term, (docIndices, termFrequencies)) for every term of a block written by SPIMIInvert, in term order.
+    SPIMIInvert writes postings in term order, so the postings file is read sequentially from start to end.
+    If the positions file of the block is given, the positions of each term are read alongside, as a third array of its postings.
     """
-    try:
-        return postingsDict[docID][0]
+    blockDict = TermDictionary(dictFile)
+    blockDict.load()
+    terms = sorted(blockDict.getAllKeys())
+    del blockDict
+
+    with open(postingsFile, 'rb', buffering=bufferSize) as f:
+        if positionsFile is None:
+            for term in terms:
+                yield term, PostingsCodec.readPostings(f)
+            return
 
-    except KeyError:
-        return 0
+        with open(positionsFile, 'rb', buffering=bufferSize) as positionsInput:
+            for term in terms:
+                positions = array('i')
+                positions.frombytes(PostingsCodec.readRecord(positionsInput))
+                yield term, PostingsCodec.readPostings(f) + (positions,)
 
 
-def getTermWeight(postingsDict, docID):
+def kWayMerge(dir, fileIDs, outputPostingsFile, outputDictFile, outputPositionsFile=None):
     """
-    A clean implementation of retrieving a value from the dictionary.
-    Returns the weight associated with the key if the key is present.
-    Else, return 0.
+    Merges all blocks in the specified directory in a single pass. Every block is streamed at once in term order,
+    and a heap picks the next term across blocks, so each posting is read and written exactly once.
+    If outputPositionsFile is given, the blocks are positional, and their positions are merged into it, in the format of PostingsCodec.
     """
-    try:
-        return postingsDict[docID][1]
+    termDict = TermDictionary(outputDictFile)
+    blocks = [readBlock(dir + 'tempDictionaryFile' + str(ID) + '_stage0.txt', dir + 'tempPostingFile' + str(ID) + '_stage0.txt',
+                        dir + 'tempPositionsFile' + str(ID) + '_stage0.txt' if outputPositionsFile is not None else None)
+              for ID in range(fileIDs)]
+    positionsPointers = {}  # {term : pointer in outputPositionsFile, ...}
 
-    except KeyError:
-        return 0
+    with open(outputPostingsFile, 'wb') as output, \
+            (open(outputPositionsFile, 'wb') if outputPositionsFile is not None else nullcontext()) as positionsOutput:
+        if positionsOutput is not None:
+            positionsOutput.write(PostingsCodec.POSITIONS_HEADER)
 
+        mergedBlocks = heapq.merge(*blocks, key=lambda termAndPostings: termAndPostings[0]) # ties are taken in block order
+        for term, group in itertools.groupby(mergedBlocks, key=lambda termAndPostings: termAndPostings[0]):
+            postings = mergePostings([postings for _, postings in group])
+            docIndices, termFrequencies = postings[0], postings[1]
 
-def getVectorDocLength(postingsDict, docID):
-    """
-    A clean implementation of retrieving a value from the dictionary.
-    Returns the length of (document) vector associated with the key if the key is present.
-    Else, return 0.
-    """
-    try:
-        return postingsDict[docID][2]
+            pointer = output.tell()
+            termDict.addTerm(term, len(docIndices), pointer)
+            PostingsCodec.writeRecord(output, PostingsCodec.encodePostingsArrays(docIndices, termFrequencies)) # as in the binary postings format
+            if positionsOutput is not None:
+                positionsPointers[term] = positionsOutput.tell()
+                PostingsCodec.writeRecord(positionsOutput, PostingsCodec.encodePositions(termFrequencies, postings[2]))
 
-    except KeyError:
-        return 0
+        if positionsOutput is not None:
+            PostingsCodec.writePositionsTable(positionsOutput, positionsPointers)
 
+    termDict.save()
 
-def binaryMerge(dir, fileIDs, outputPostingsFile, outputDictFile):
-    """
-    Performs binary merge on all files in the specified directory.
-    """
-    for stage in range(math.ceil(math.log2(fileIDs))): # no. of times we merge is proportional to the no. of unique fileIDs in the directory
-        newFileID = 0 # to merged file identifier
-        for ID in range(0, fileIDs, 2): # merge files_docID with files_ID+1
-            if ID + 1 < fileIDs:
-                dictFile1 = dir + 'tempDictionaryFile' + str(ID) + '_stage' + str(stage) + '.txt'
-                dictFile2 = dir + 'tempDictionaryFile' + str(ID + 1) + '_stage' + str(stage) + '.txt'
-                postingsFile1 = dir + 'tempPostingFile' + str(ID) + '_stage' + str(stage) + '.txt'
-                postingsFile2 = dir + 'tempPostingFile' + str(ID + 1) + '_stage' + str(stage) + '.txt'
-                outDictFile = dir + 'tempDictionaryFile' + str(newFileID) + '_stage' + str(stage + 1) + '.txt'
-                outPostingsFile = dir + 'tempPostingFile' + str(newFileID) + '_stage' + str(stage + 1) + '.txt'
-                mergeDictsAndPostings(dictFile1, postingsFile1, dictFile2, postingsFile2, outDictFile, outPostingsFile)
-                
-            else: # there is an odd number of files in the directory
-                oldDictFile = dir + 'tempDictionaryFile' + str(ID) + '_stage' + str(stage) + '.txt'
-                newDictFile = dir + 'tempDictionaryFile' + str(newFileID) + '_stage' + str(stage + 1) + '.txt'
-                oldPostingsFile = dir + 'tempPostingFile' + str(ID) + '_stage' + str(stage) + '.txt'
-                newPostingsFile = dir + 'tempPostingFile' + str(newFileID) + '_stage' + str(stage + 1) + '.txt'
-                os.rename(oldDictFile, newDictFile)
-                os.rename(oldPostingsFile, newPostingsFile)
-            
-            newFileID+=1
-        fileIDs = newFileID
-
-    # here, i will only have 1 dictionary.txt and 1 postings.txt (the end)
-    # move these out into the main directory.
-    IDOfLeftoverFiles = newFileID - 1
-    StageOfLeftoverFiles = stage + 1
-    os.rename(dir + 'tempDictionaryFile' + str(IDOfLeftoverFiles) + '_stage' + str(StageOfLeftoverFiles) + '.txt', outputDictFile)
-    os.rename(dir + 'tempPostingFile' + str(IDOfLeftoverFiles) + '_stage' + str(StageOfLeftoverFiles) + '.txt', outputPostingsFile)
+    # delete the blocks that have been merged to free up space.
+    for ID in range(fileIDs):
+        os.remove(dir + 'tempDictionaryFile' + str(ID) + '_stage0.txt')
+        os.remove(dir + 'tempPostingFile' + str(ID) + '_stage0.txt')
+        if outputPositionsFile is not None:
+            os.remove(dir + 'tempPositionsFile' + str(ID) + '_stage0.txt')
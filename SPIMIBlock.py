@@ -0,0 +1,139 @@
+import sys
+
+from array import array
+from bisect import bisect_left
+from contextlib import nullcontext
+
+import PostingsCodec
+
+from TermDictionary import TermDictionary
+
+class SPIMIBlock(object):
+    """
+    SPIMIBlock is a class that holds the in-memory dictionary of a SPIMI block while documents are inverted into it,
+    and keeps an estimate of how much memory the dictionary takes, so that the block can be written to disk once it reaches a budget.
+    Documents are referred to by their dense internal ID (docIndex, their position in the document table), and the postings
+    of each term are kept in a pair of packed arrays, in ascending docIndex order as documents are added in that order.
+    A positional block also keeps the positions of each term in each of its documents, concatenated in postings order into a third array,
+    and writes them into a positions file of its own, as raw arrays of ints (which only the merge reads back).
+    """
+
+    # approximate memory taken by the structures in tempDict, measured with tracemalloc on CPython 3
+    TERM_OVERHEAD = 250  # the [docIndices, termFrequencies] arrays of a new term, and its slot in tempDict (excluding the term string itself)
+    POSTING_OVERHEAD = 9  # a docIndex and a term frequency in the arrays, with their spare capacity
+    POSITIONS_ARRAY_OVERHEAD = 80  # the positions array of a new term in a positional block
+    POSITION_OVERHEAD = 5  # a position in the positions array, with its spare capacity
+
+    def __init__(self, positional=False):
+        self.tempDict = {} # {term : [array of docIndices, array of termFrequencies(, array of positions)], term2 : ...}
+        self.positional = positional
+        self.estimatedSize = 0
+
+
+    def addDocument(self, docIndex, countOfTerms, positionsOfTerms=None):
+        """
+        Inverts a document into the block, given its docIndex and its term counts, in the form of {term : termFrequency, ...}.
+        A positional block also takes the positions of each term in the document, in the form of {term : [position, ...], ...}.
+        """
+        if self.positional:
+            self.addPositionalDocument(docIndex, countOfTerms, positionsOfTerms)
+            return
+
+        tempDict = self.tempDict
+        for term, termFrequency in countOfTerms.items():
+            postings = tempDict.get(term)
+            if postings is None:
+                tempDict[term] = [array('i', [docIndex]), array('i', [termFrequency])]
+                self.estimatedSize += sys.getsizeof(term) + self.TERM_OVERHEAD + self.POSTING_OVERHEAD
+
+            elif postings[0][-1] < docIndex:  # the usual case: a document after those already in the block
+                postings[0].append(docIndex)
+                postings[1].append(termFrequency)
+                self.estimatedSize += self.POSTING_OVERHEAD
+
+            else:  # a docID seen before, which keeps its first docIndex
+                self.addOutOfOrder(postings, docIndex, termFrequency)
+
+
+    def addPositionalDocument(self, docIndex, countOfTerms, positionsOfTerms):
+        """
+        Inverts a document into a positional block, as addDocument does.
+        """
+        tempDict = self.tempDict
+        for term, termFrequency in countOfTerms.items():
+            positions = positionsOfTerms[term]
+            postings = tempDict.get(term)
+            if postings is None:
+                tempDict[term] = [array('i', [docIndex]), array('i', [termFrequency]), array('i', positions)]
+                self.estimatedSize += sys.getsizeof(term) + self.TERM_OVERHEAD + self.POSITIONS_ARRAY_OVERHEAD + self.POSTING_OVERHEAD
+
+            elif postings[0][-1] < docIndex:
+                postings[0].append(docIndex)
+                postings[1].append(termFrequency)
+                postings[2].extend(positions)
+                self.estimatedSize += self.POSTING_OVERHEAD
+
+            else:
+                self.addOutOfOrder(postings, docIndex, termFrequency, positions)
+            self.estimatedSize += self.POSITION_OVERHEAD * len(positions)
+
+
+    def addTokens(self, tokenStream):
+        """
+        Inverts the given tokens into the block.
+        tokenStream is in the form of [(term1, docIndex, termFreq, weight, vectorLength), (term2, docIndex, termFreq, weight, vectorLength2), ...],
+        with the positions of the term in the document as a sixth item for a positional block.
+        """
+        for term, docIndex, termFrequency, weight, vectorDocLength, *positions in tokenStream:
+            self.addDocument(docIndex, {term: termFrequency}, {term: positions[0]} if self.positional else None)
+
+
+    def addOutOfOrder(self, postings, docIndex, termFrequency, positions=None):
+        """
+        Adds a posting whose docIndex is not after the last one of the term, adding up term frequencies if the document is already there.
+        The positions of a repeated docID come after those of its earlier copies (see index.invertDocuments), so they are appended to them.
+        """
+        docIndices, termFrequencies = postings[0], postings[1]
+        position = bisect_left(docIndices, docIndex)
+        found = position < len(docIndices) and docIndices[position] == docIndex
+        if positions is not None:
+            start = sum(termFrequencies[:position + 1 if found else position])  # where the positions of the posting end
+            postings[2][start:start] = array('i', positions)
+
+        if found:
+            termFrequencies[position] += termFrequency
+
+        else:
+            docIndices.insert(position, docIndex)
+            termFrequencies.insert(position, termFrequency)
+            self.estimatedSize += self.POSTING_OVERHEAD
+
+
+    def getEstimatedSize(self):
+        """
+        Returns the estimated size in bytes of the in-memory dictionary of the block.
+        """
+        return self.estimatedSize
+
+
+    def isEmpty(self):
+        return len(self.tempDict) == 0
+
+
+    def write(self, outputFile, dictFile, positionsFile=None):
+        """
+        Writes the block to disk: the postings of each term, in term order, into outputFile (as records of PostingsCodec.encodePostingsArrays),
+        and the TermDictionary into dictFile. A positional block also writes the positions of each term, in the same order, into positionsFile.
+        """
+        termDict = TermDictionary(dictFile)
+
+        with open(outputFile, 'wb') as f, (open(positionsFile, 'wb') if self.positional else nullcontext()) as positionsOutput:
+            for term in sorted(self.tempDict):
+                postings = self.tempDict[term]
+                pointer = f.tell()
+                PostingsCodec.writeRecord(f, PostingsCodec.encodePostingsArrays(postings[0], postings[1]))
+                termDict.addTerm(term, len(postings[0]), pointer) # update TermDictionary
+                if self.positional:
+                    PostingsCodec.writeRecord(positionsOutput, postings[2].tobytes())
+
+        termDict.save()
@@ -0,0 +1,70 @@
+"""
+Search bundles: what search reads from an index before it can answer its first query, in one file next to the dictionary file.
+
+Opening an index otherwise loads the dictionary file and the stemming cache saved next to it, and decodes the document table stored
+at the end of the postings file, whose docIDs and lengths are variable-byte encoded and decoded one by one in Python.
+The bundle (<dictionary file>.bundle) holds all of them, already decoded, as 2 pickles:
+    the stamp of the dictionary and postings files it was written for (see IndexHandle.getVersion), with BUNDLE_VERSION
+    {"dictionary": the loaded TermDictionary or CompactTermDictionary, "stems": [(token, normalised term), ...],
+     "docIDs": [...], "docLengths": [...], "vectorLengths": [...]}
+which are the collection statistics scoring needs (document frequencies and max scores are in the dictionary).
+The stamp comes first, so that a stale bundle (e.g. the index was rebuilt by a version that does not write bundles) is told apart
+without loading the rest; it is then ignored, and the index is read from its own files.
+Bundles are written by index.py for indexes in the binary format.
+"""
+import os
+import pickle
+
+BUNDLE_FILE_SUFFIX = '.bundle'
+BUNDLE_VERSION = 1
+
+
+def getBundleFile(dictFile):
+    """
+    Returns the location of the bundle belonging to the given dictionary file.
+    """
+    return dictFile + BUNDLE_FILE_SUFFIX
+
+
+def write(indexHandle, stems=None):
+    """
+    Writes the bundle of the index opened by the given IndexHandle, which must be in the binary format.
+    stems are the (token, normalised term) pairs to preload the stemming cache of search with, by default those the handle loaded.
+    """
+    dictFile = indexHandle.getOpenArguments()[0]
+    bundle = {
+        "dictionary": indexHandle.getDictionary(),
+        "stems": stems if stems is not None else indexHandle.getNormaliser().getEntries(),
+        "docIDs": indexHandle.docIDs,
+        "docLengths": indexHandle.docLengths,
+        "vectorLengths": indexHandle.getVectorLengths(),
+    }
+
+    bundleFile = getBundleFile(dictFile)
+    with open(bundleFile + '.new', 'wb') as f:
+        pickle.dump((BUNDLE_VERSION, indexHandle.getVersion()), f, pickle.HIGHEST_PROTOCOL)
+        pickle.dump(bundle, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(bundleFile + '.new', bundleFile)  # a search opening the index meanwhile reads either no bundle or a whole one
+
+
+def load(dictFile, stamp):
+    """
+    Returns the bundle of the given dictionary file, if it has one written for index files with the given stamp, None otherwise.
+    """
+    try:
+        with open(getBundleFile(dictFile), 'rb') as f:
+            if pickle.load(f) != (BUNDLE_VERSION, stamp):
+                return None
+
+            return pickle.load(f)
+
+    except FileNotFoundError:
+        return None
+
+
+def remove(dictFile):
+    """
+    Removes the bundle of the given dictionary file, if any.
+    """
+    if os.path.exists(getBundleFile(dictFile)):
+        os.remove(getBundleFile(dictFile))
@@ -0,0 +1,79 @@
+import json
+import socket
+
+def parseAddress(address):
+    """
+    Parses the address of a search server: "host:port" for TCP, or the path of a Unix socket otherwise.
+    Returns (socket family, address).
+    """
+    host, separator, port = address.rpartition(':')
+    if separator and port.isdigit() and '/' not in address:
+        return socket.AF_INET, (host or 'localhost', int(port))
+
+    return socket.AF_UNIX, address
+
+
+class SearchClient(object):
+    """
+    SearchClient is a class that sends queries to a running search server (see SearchServer) over one connection.
+    Requests and responses are JSON objects, one per line.
+    """
+
+    def __init__(self, address, timeout=None):
+        family, socketAddress = parseAddress(address)
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        try:
+            self.socket.connect(socketAddress)
+        except OSError:
+            self.socket.close()
+            raise
+        self.file = self.socket.makefile('rwb')
+
+
+    def request(self, request):
+        """
+        Sends a request, and returns the server's response. Raises RuntimeError if the server reports an error.
+        """
+        self.file.write(json.dumps(request).encode('utf8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError('search server closed the connection')
+
+        response = json.loads(line)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+
+        return response
+
+
+    def search(self, query):
+        """
+        Returns the top 10 docIDs of the query as a space-separated string, as search.cosineScores does.
+        """
+        return self.request({"query": query})["result"]
+
+
+    def reload(self, dictFile=None, postingsFile=None):
+        """
+        Asks the server to load the given index (by default, its current files again), and returns the new index generation.
+        """
+        return self.request({"command": "reload", "dictionary": dictFile, "postings": postingsFile})["generation"]
+
+
+    def getStats(self):
+        return self.request({"command": "stats"})
+
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,150 @@
+import os
+import json
+import signal
+import socket
+import asyncio
+
+from SegmentedIndexHandle import openIndexHandle
+from SearchClient import parseAddress
+import search
+
+class SearchServer(object):
+    """
+    SearchServer is a class that keeps an index loaded, and answers queries sent by SearchClient over a Unix socket or TCP.
+    Connections are served concurrently by asyncio; each query is scored on the event loop, so it always sees one index.
+
+    The index can be hot-swapped with a "reload" request (or SIGHUP, to reload the same files): the new index is loaded
+    in a background thread while queries are still answered from the old one, and then replaces it between two queries.
+    index.py writes a rebuilt index into new files, and only then replaces the postings (and positions) file and lastly the dictionary file,
+    each atomically, so an index can be rebuilt in place while the server maps the old files. A reload in the moment between
+    those replaces can still pair the new postings with the old dictionary; reloading again once index.py is done fixes that.
+    If a ResultCache is given, results of repeated queries are served from it; its entries are dropped when the index is swapped.
+    Queries can hold "quoted phrases", and proximity is the weight of proximity boosts, as in search.py (both need a positional index).
+
+    Requests are JSON objects, one per line, and each gets a JSON response line:
+        {"query": "..."}                                        -> {"result": "docID docID2 ..."}
+        {"command": "reload", "dictionary": ..., "postings": ...} -> {"generation": n}  (files are optional)
+        {"command": "stats"}                                    -> {"generation": n, "queries": n, "engine": ..., "dictionary": ..., ...}
+    Failed requests get {"error": "..."}.
+    """
+
+    def __init__(self, dictFile, postingsFile, engine='exhaustive', cacheEntries=1024, cacheBytes=None, useMmap=True, resultCache=None, proximity=0):
+        self.dictFile = dictFile
+        self.postingsFile = postingsFile
+        self.requestedEngine = engine
+        self.cacheEntries = cacheEntries
+        self.cacheBytes = cacheBytes
+        self.useMmap = useMmap
+        self.resultCache = resultCache
+        self.proximity = proximity
+        self.indexHandle, self.engine = self.openIndex(dictFile, postingsFile)
+        self.generation = 1  # incremented on every reload
+        self.numberOfQueries = 0
+        self.reloadLock = None  # created in the event loop
+
+
+    def openIndex(self, dictFile, postingsFile):
+        """
+        Loads an index, and returns (IndexHandle, engine to use with it).
+        """
+        indexHandle = openIndexHandle(dictFile, postingsFile, self.cacheEntries, self.cacheBytes, self.useMmap)
+        return indexHandle, search.chooseEngine(self.requestedEngine, indexHandle)
+
+
+    async def serve(self, address):
+        """
+        Serves requests on the given address ("host:port", or the path of a Unix socket) until cancelled.
+        """
+        self.reloadLock = asyncio.Lock()
+        family, socketAddress = parseAddress(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(socketAddress):
+                probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    probe.connect(socketAddress)
+                    raise OSError('a server is already listening on ' + address)
+                except ConnectionRefusedError:  # left behind by a server that is gone
+                    os.remove(socketAddress)
+                finally:
+                    probe.close()
+            server = await asyncio.start_unix_server(self.handleConnection, socketAddress)
+
+        else:
+            server = await asyncio.start_server(self.handleConnection, socketAddress[0], socketAddress[1])
+
+        if hasattr(signal, 'SIGHUP'):  # not on Windows
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(self.reload()))
+            loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)  # stop cleanly, removing the socket file
+
+        print('serving ' + self.dictFile + ' and ' + self.postingsFile + ' on ' + address)
+        try:
+            async with server:
+                await server.serve_forever()
+
+        finally:
+            if family == socket.AF_UNIX and os.path.exists(socketAddress):
+                os.remove(socketAddress)
+            self.indexHandle.close()
+
+
+    async def handleConnection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    response = await self.handleRequest(json.loads(line))
+                except Exception as e:  # keep serving other requests
+                    response = {"error": type(e).__name__ + ': ' + str(e)}
+
+                writer.write(json.dumps(response).encode('utf8') + b'\n')
+                await writer.drain()
+
+        except ConnectionError:
+            pass
+
+        finally:
+            writer.close()
+
+
+    async def handleRequest(self, request):
+        if "query" in request:
+            self.numberOfQueries += 1
+            query = request["query"]
+            return {"result": search.cosineScores(query, self.indexHandle, self.engine, self.resultCache, self.proximity) if query.strip() else ""}
+
+        command = request.get("command")
+        if command == "reload":
+            return {"generation": await self.reload(request.get("dictionary"), request.get("postings"))}
+
+        elif command == "stats":
+            return {"generation": self.generation, "queries": self.numberOfQueries, "engine": self.engine, "proximity": self.proximity,
+                    "dictionary": os.path.abspath(self.dictFile), "postings": os.path.abspath(self.postingsFile),
+                    "postingsCache": self.indexHandle.getCacheStats(), "stemmingCache": self.indexHandle.getNormaliser().getStats(),
+                    "resultCache": self.resultCache.getStats() if self.resultCache is not None else None}
+
+        raise ValueError('unknown request')
+
+
+    async def reload(self, dictFile=None, postingsFile=None):
+        """
+        Loads the given index (by default, the current files again) in a background thread, then swaps it in.
+        Returns the new generation.
+        """
+        async with self.reloadLock:  # one reload at a time
+            dictFile = dictFile or self.dictFile
+            postingsFile = postingsFile or self.postingsFile
+            indexHandle, engine = await asyncio.get_running_loop().run_in_executor(None, self.openIndex, dictFile, postingsFile)
+
+            # queries are scored synchronously on the event loop, so none is using the old index at this point
+            oldIndexHandle = self.indexHandle
+            self.indexHandle, self.engine = indexHandle, engine
+            self.dictFile, self.postingsFile = dictFile, postingsFile
+            self.generation += 1
+            oldIndexHandle.close()
+
+            print('reloaded ' + dictFile + ' and ' + postingsFile + ' (generation ' + str(self.generation) + ')')
+            return self.generation
@@ -0,0 +1,325 @@
+import os
+
+from array import array
+from collections import OrderedDict
+
+import Segments
+import NumpyScoring
+
+from IndexHandle import IndexHandle
+from ShardedIndex import ShardedIndex
+
+def openIndexHandle(dictFile, postingsFile, cacheEntries=1024, cacheBytes=None, useMmap=True):
+    """
+    Opens the given index: a ShardedIndex if it is split into shards,
+    a SegmentedIndexHandle if it has several segments or deleted documents, an IndexHandle otherwise.
+    """
+    if ShardedIndex.isShardedIndex(dictFile):
+        return ShardedIndex(dictFile, postingsFile, cacheEntries, cacheBytes, useMmap)
+
+    if Segments.hasSegments(dictFile):
+        return SegmentedIndexHandle(dictFile, postingsFile, cacheEntries, cacheBytes, useMmap)
+
+    return IndexHandle(dictFile, postingsFile, cacheEntries, cacheBytes, useMmap)
+
+
+class SegmentedIndexHandle(object):
+    """
+    SegmentedIndexHandle is a class that opens all the segments of an index (see Segments) with an IndexHandle each,
+    and presents them to search as a single IndexHandle.
+
+    Documents are numbered across segments in the order they were added: the docIndex of a document is its position in its segment
+    plus the number of documents in the segments before it. Postings of a term are concatenated across segments, leaving out deleted documents,
+    so they stay sorted by docIndex and results (including ties) are the same as those of an index rebuilt from all live documents.
+    The number of documents and document frequencies only count live documents. Champion lists are not used across segments.
+    Merged postings are held in a bounded LRU cache keyed by term, of cacheEntries entries like that of each segment;
+    a handle only ever reads one version of the manifest (reloading opens a new handle), so the cache never goes stale.
+    """
+
+    def __init__(self, dictFile, postingsFile, cacheEntries=1024, cacheBytes=None, useMmap=True):
+        self.dictFile = dictFile
+        self.postingsFile = postingsFile
+        self.cacheEntries = cacheEntries
+        self.cacheBytes = cacheBytes
+        self.useMmap = useMmap
+
+        manifestFile = Segments.getManifestFile(dictFile)
+        manifestStat = os.stat(manifestFile)
+        manifest = Segments.loadManifest(dictFile)
+        self.segments = []  # IndexHandle of each segment
+        self.deleted = []  # deletion bitmap of each segment
+        self.offsets = []  # docIndex of the first document of each segment
+        self.docIDs = []
+        self.docLengths = []
+        self.vectorLengths = []
+        numberOfDeleted = 0
+        for segment in manifest["segments"]:
+            segmentDictFile, segmentPostingsFile = Segments.getSegmentFiles(dictFile, segment)
+            indexHandle = IndexHandle(segmentDictFile, segmentPostingsFile, cacheEntries, cacheBytes, useMmap)
+            self.segments.append(indexHandle)
+            self.deleted.append(segment["deleted"])
+            self.offsets.append(len(self.docIDs))
+            self.docIDs.extend(indexHandle.docIDs)
+            self.docLengths.extend(indexHandle.docLengths)
+            self.vectorLengths.extend(indexHandle.getVectorLengths())
+            numberOfDeleted += Segments.countDeleted(segment["deleted"])
+
+        self.totalNumberOfDocs = len(self.docIDs) - numberOfDeleted
+        self.hasDeletions = numberOfDeleted > 0
+        self.version = ((manifestStat.st_mtime_ns, manifestStat.st_size),) + tuple(segment.getVersion() for segment in self.segments)
+        self.dictionary = SegmentedDictionary(self)
+        self.inverseVectorLengths = None
+        self.postingsCache = OrderedDict()  # {term : (docIndices, termWeights), ...} of merged postings, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+
+    def getOpenArguments(self):
+        return self.dictFile, self.postingsFile, self.cacheEntries, self.cacheBytes, self.useMmap
+
+
+    def getVersion(self):
+        return self.version
+
+
+    def getDictionary(self):
+        return self.dictionary
+
+
+    def getNormaliser(self):
+        return self.segments[0].getNormaliser()
+
+
+    def setTimer(self, timer):
+        for segment in self.segments:
+            segment.setTimer(timer)
+
+
+    def getTimer(self):
+        return self.segments[0].getTimer()
+
+
+    def getTotalNumberOfDocs(self):
+        """
+        Returns the number of live (not deleted) documents.
+        """
+        return self.totalNumberOfDocs
+
+
+    def getDocID(self, docIndex):
+        return self.docIDs[docIndex]
+
+
+    def getDocLength(self, docIndex):
+        return self.docLengths[docIndex]
+
+
+    def getVectorLengths(self):
+        return self.vectorLengths
+
+
+    def hasMaxScores(self):
+        return all(segment.hasMaxScores() for segment in self.segments)
+
+
+    def hasChampions(self):
+        return False
+
+
+    def getChampions(self, term):
+        return self.getPostings(term)
+
+
+    def getTermDocFrequency(self, term):
+        return self.dictionary.getTermDocFrequency(term)
+
+
+    def getPostings(self, term):
+        """
+        Retrieves the postings of the given term in all segments, as a tuple of 2 parallel arrays: (docIndices, termWeights).
+        """
+        if len(self.segments) == 1 and not self.hasDeletions:
+            return self.segments[0].getPostings(term)
+
+        if term in self.postingsCache:
+            self.hits += 1
+            self.postingsCache.move_to_end(term)
+            return self.postingsCache[term]
+
+        self.misses += 1
+        postings = self.mergePostings(term)
+        if self.cacheEntries != 0:
+            self.postingsCache[term] = postings
+            if self.cacheEntries is not None and len(self.postingsCache) > self.cacheEntries:
+                self.postingsCache.popitem(last=False)
+
+        return postings
+
+
+    def mergePostings(self, term):
+        """
+        Concatenates the postings of the given term in all segments, shifting docIndices by the offset of their segment.
+        Only the postings of segments with deleted documents are checked one by one against the deletion bitmap.
+        """
+        docIndices = array('i')
+        termWeights = array('d')
+        for segment, deleted, offset in zip(self.segments, self.deleted, self.offsets):
+            segmentDocIndices, segmentTermWeights = segment.getPostings(term)
+            if not any(deleted):
+                docIndices.extend(segmentDocIndices if offset == 0 else [docIndex + offset for docIndex in segmentDocIndices])
+                termWeights.extend(segmentTermWeights)
+                continue
+
+            for docIndex, termWeight in zip(segmentDocIndices, segmentTermWeights):
+                if not Segments.isDeleted(deleted, docIndex):
+                    docIndices.append(docIndex + offset)
+                    termWeights.append(termWeight)
+
+        return docIndices, termWeights
+
+
+    def hasPositions(self):
+        return all(segment.hasPositions() for segment in self.segments)
+
+
+    def getPositions(self, term, docIndices):
+        """
+        Retrieves the positions of the given term in the given documents, as IndexHandle.getPositions does, from the segments holding them.
+        """
+        positions = {}
+        ends = self.offsets[1:] + [len(self.docIDs)]
+        for segment, offset, end in zip(self.segments, self.offsets, ends):
+            segmentDocIndices = [docIndex - offset for docIndex in docIndices if offset <= docIndex < end]
+            if segmentDocIndices:
+                for docIndex, docPositions in segment.getPositions(term, segmentDocIndices).items():
+                    positions[docIndex + offset] = docPositions
+
+        return positions
+
+
+    def supportsNumpy(self):
+        return all(segment.supportsNumpy() for segment in self.segments)
+
+
+    def getColumnarPostings(self, term):
+        """
+        Retrieves the postings of the given term in all segments as NumPy arrays, as IndexHandle.getColumnarPostings does.
+        Postings of deleted documents are left in, as their inverse vector length is 0.
+        """
+        np = NumpyScoring.np
+        columns = [segment.getColumnarPostings(term) for segment in self.segments]
+        docIndices = np.concatenate([segmentDocIndices + offset for (segmentDocIndices, _), offset in zip(columns, self.offsets)])
+        termWeights = np.concatenate([segmentTermWeights for _, segmentTermWeights in columns])
+
+        return docIndices.astype(np.int32), termWeights
+
+
+    def getInverseVectorLengths(self):
+        """
+        Returns 1 / vectorLength of all documents as a NumPy array indexed by docIndex, with 0 for deleted documents.
+        """
+        if self.inverseVectorLengths is None:
+            self.inverseVectorLengths = NumpyScoring.getInverseVectorLengths(self.vectorLengths)
+            for deleted, offset in zip(self.deleted, self.offsets):
+                for position, byte in enumerate(deleted):
+                    for bit in range(8):
+                        if byte & (1 << bit):
+                            self.inverseVectorLengths[offset + position * 8 + bit] = 0
+
+        return self.inverseVectorLengths
+
+
+    def pinPostings(self, terms, columnar=False):
+        for segment in self.segments:
+            segment.pinPostings(terms, columnar)
+
+
+    def getCacheStats(self):
+        """
+        Returns the cache statistics of all segments added up, with those of the merged postings as mergedHits, mergedMisses and mergedEntries.
+        """
+        stats = {}
+        for segment in self.segments:
+            for key, value in segment.getCacheStats().items():
+                stats[key] = stats.get(key, 0) + value
+
+        stats["mergedHits"] = self.hits
+        stats["mergedMisses"] = self.misses
+        stats["mergedEntries"] = len(self.postingsCache)
+        return stats
+
+
+    def close(self):
+        self.postingsCache.clear()
+        for segment in self.segments:
+            segment.close()
+
+
+class SegmentedDictionary(object):
+    """
+    SegmentedDictionary is a class that answers the dictionary lookups used by search over all the segments of a SegmentedIndexHandle.
+    Document frequencies count the live postings of a term in every segment; max scores are the largest among the segments,
+    which still bound the contribution of the term to any live document.
+    """
+
+    MAX_CACHED_LOOKUPS = 4096
+
+    def __init__(self, indexHandle):
+        self.indexHandle = indexHandle
+        self.dictionaries = [segment.getDictionary() for segment in indexHandle.segments]
+        self.docFrequencies = {}  # {term : docFreq, ...} of terms with deleted postings, cleared when full
+
+
+    def getTermDocFrequency(self, term):
+        if not self.indexHandle.hasDeletions:
+            return sum(dictionary.getTermDocFrequency(term) for dictionary in self.dictionaries)
+
+        if term not in self.docFrequencies:
+            if len(self.docFrequencies) >= self.MAX_CACHED_LOOKUPS:
+                self.docFrequencies.clear()
+            self.docFrequencies[term] = len(self.indexHandle.getPostings(term)[0])
+
+        return self.docFrequencies[term]
+
+
+    def getTermPointer(self, term):
+        """
+        Returns -1 if the term is in no segment; pointers are per segment, so any other value only tells that the term exists.
+        """
+        return max(dictionary.getTermPointer(term) for dictionary in self.dictionaries)
+
+
+    def getTermMaxScore(self, term):
+        return max(dictionary.getTermMaxScore(term) for dictionary in self.dictionaries)
+
+
+    def hasMaxScores(self):
+        return all(dictionary.hasMaxScores() for dictionary in self.dictionaries)
+
+
+    def hasChampions(self):
+        return False
+
+
+    def getTokenizer(self):
+        return self.dictionaries[0].getTokenizer()  # segments are all indexed with the tokenizer of the first one
+
+
+    def getAllKeys(self):
+        return self.expandPrefix('')
+
+
+    def expandPrefix(self, prefix):
+        terms = set()
+        for dictionary in self.dictionaries:
+            terms.update(dictionary.expandPrefix(prefix))
+
+        return sorted(terms)
+
+
+    def expandWildcard(self, pattern):
+        terms = set()
+        for dictionary in self.dictionaries:
+            terms.update(dictionary.expandWildcard(pattern))
+
+        return sorted(terms)
@@ -0,0 +1,184 @@
+"""
+Segment manifests of incrementally built indexes.
+
+An index built by index.py is a single segment. Appending documents to it (index.py --append) indexes them into a new segment
+(a dictionary file and a postings file of their own), and deleting documents marks them in a deletion bitmap instead of rewriting postings.
+The list of segments, in the order their documents were added, and the deletion bitmap of each are stored in a manifest
+next to the dictionary file (<dictionary file>.segments). Search opens all the segments of an index that has a manifest.
+
+The manifest is pickled as {"nextSegment": number of the next segment file, "segments": [segment, ...]}, where each segment is
+{"dictionary": path, "postings": path, "numberOfDocs": N, "deleted": bytearray of N bits}, with paths relative to the manifest.
+It is always replaced atomically, and updated under a lock (see lockManifest) so that appends, deletions and compaction do not overwrite each other.
+"""
+import os
+import pickle
+
+from contextlib import contextmanager
+
+import PostingsCodec
+import SearchBundle
+
+from IndexHandle import IndexHandle
+from Normaliser import Normaliser
+
+try:
+    import fcntl
+except ImportError:  # not on Windows, where updates are not locked
+    fcntl = None
+
+MANIFEST_FILE_SUFFIX = '.segments'
+
+
+def getManifestFile(dictFile):
+    return dictFile + MANIFEST_FILE_SUFFIX
+
+
+def hasSegments(dictFile):
+    return os.path.exists(getManifestFile(dictFile))
+
+
+@contextmanager
+def lockManifest(dictFile):
+    """
+    Holds an exclusive lock on the manifest of the given index while the block runs.
+    """
+    with open(getManifestFile(dictFile) + '.lock', 'w') as lockFile:
+        if fcntl is not None:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+        try:
+            yield
+
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lockFile, fcntl.LOCK_UN)
+
+
+def newManifest(dictFile, postingsFile, numberOfDocs):
+    """
+    Returns the manifest of an index made of the single segment in the given files.
+    """
+    manifest = {"nextSegment": 1, "segments": []}
+    addSegment(dictFile, manifest, dictFile, postingsFile, numberOfDocs)
+
+    return manifest
+
+
+def loadOrCreateManifest(dictFile, postingsFile):
+    """
+    Loads the manifest of the given index, or returns a new manifest of its single segment if it has none.
+    """
+    manifest = loadManifest(dictFile)
+    if manifest is None:
+        indexHandle = IndexHandle(dictFile, postingsFile, cacheEntries=0)
+        manifest = newManifest(dictFile, postingsFile, indexHandle.getTotalNumberOfDocs())
+        indexHandle.close()
+
+    return manifest
+
+
+def loadManifest(dictFile):
+    """
+    Loads the manifest of the given index, or returns None if the index has a single segment and no deletions.
+    """
+    if not hasSegments(dictFile):
+        return None
+
+    with open(getManifestFile(dictFile), 'rb') as f:
+        return pickle.load(f)
+
+
+def saveManifest(dictFile, manifest):
+    manifestFile = getManifestFile(dictFile)
+    with open(manifestFile + '.new', 'wb') as f:
+        pickle.dump(manifest, f)
+    os.replace(manifestFile + '.new', manifestFile)  # readers see either the old or the new manifest
+
+
+def addSegment(dictFile, manifest, segmentDictFile, segmentPostingsFile, numberOfDocs):
+    """
+    Adds a segment, stored in the given files, at the end of the manifest.
+    """
+    manifest["segments"].append(makeSegment(dictFile, segmentDictFile, segmentPostingsFile, numberOfDocs))
+
+
+def makeSegment(dictFile, segmentDictFile, segmentPostingsFile, numberOfDocs):
+    """
+    Returns the manifest entry of a segment of the given index, stored in the given files, with no deleted documents.
+    """
+    directory = os.path.dirname(os.path.abspath(getManifestFile(dictFile)))
+    return {"dictionary": os.path.relpath(os.path.abspath(segmentDictFile), directory),
+            "postings": os.path.relpath(os.path.abspath(segmentPostingsFile), directory),
+            "numberOfDocs": numberOfDocs, "deleted": bytearray((numberOfDocs + 7) // 8)}
+
+
+def getNumberOfLiveDocs(segment):
+    return segment["numberOfDocs"] - countDeleted(segment["deleted"])
+
+
+def getSegmentFiles(dictFile, segment):
+    """
+    Returns (dictionary file, postings file) of a segment of the manifest.
+    """
+    directory = os.path.dirname(os.path.abspath(getManifestFile(dictFile)))
+    return os.path.join(directory, segment["dictionary"]), os.path.join(directory, segment["postings"])
+
+
+def reserveSegmentFiles(dictFile, postingsFile, manifest=None):
+    """
+    Returns (dictionary file, postings file) for a new segment of the given index, which no other segment uses.
+    If the manifest is given, it is updated but not saved (the caller holds the lock and saves it); otherwise it is loaded and saved.
+    """
+    if manifest is None:
+        with lockManifest(dictFile):
+            manifest = loadOrCreateManifest(dictFile, postingsFile)
+            segmentFiles = reserveSegmentFiles(dictFile, postingsFile, manifest)
+            saveManifest(dictFile, manifest)
+
+        return segmentFiles
+
+    number = manifest["nextSegment"]
+    manifest["nextSegment"] += 1
+
+    return dictFile + '.' + str(number), postingsFile + '.' + str(number)
+
+
+def isDeleted(deleted, docIndex):
+    return deleted[docIndex >> 3] & (1 << (docIndex & 7)) != 0
+
+
+def markDeleted(deleted, docIndex):
+    deleted[docIndex >> 3] |= 1 << (docIndex & 7)
+
+
+def countDeleted(deleted):
+    return sum(bin(byte).count('1') for byte in deleted)
+
+
+def removeSegmentFiles(dictFile, segment, keep=()):
+    """
+    Removes the files of a segment that is no longer in the manifest (except those in keep), with its stemming cache, search bundle
+    and positions file. Searches that still have them open keep reading them until they reopen the index.
+    """
+    segmentDictFile, segmentPostingsFile = getSegmentFiles(dictFile, segment)
+    for file in (segmentDictFile, segmentPostingsFile, Normaliser.getStemsFile(segmentDictFile), SearchBundle.getBundleFile(segmentDictFile),
+                 PostingsCodec.getPositionsFile(segmentPostingsFile)):
+        if os.path.exists(file) and os.path.abspath(file) not in [os.path.abspath(kept) for kept in keep]:
+            os.remove(file)
+
+
+def removeSegments(dictFile, keep=()):
+    """
+    Removes the manifest of the given index and the files of all its segments (except those in keep),
+    e.g. when the index is rebuilt from scratch.
+    """
+    if not hasSegments(dictFile):
+        return
+
+    with lockManifest(dictFile):
+        manifest = loadManifest(dictFile)
+        if manifest is None:  # removed meanwhile
+            return
+
+        for segment in manifest["segments"]:
+            removeSegmentFiles(dictFile, segment, keep)
+        os.remove(getManifestFile(dictFile))
@@ -0,0 +1,299 @@
+import os
+import sys
+import zlib
+import pickle
+
+from array import array
+
+import NumpyScoring
+import PostingsCodec
+import SearchBundle
+
+from IndexHandle import IndexHandle
+from Normaliser import Normaliser
+from PhaseTimer import PhaseTimer
+
+class ShardedIndex(object):
+    """
+    ShardedIndex is a class that searches an index split into shards (index.py --shards N), with one worker process per shard.
+
+    Each document is indexed in the shard its docID hashes to (see getShard), so every shard is an independent index
+    with a dictionary file and a postings file of its own. Query weights must use the document frequencies and number of documents
+    of the whole collection, for scores to be the same as those of an unsharded index: these are kept in a global dictionary,
+    saved in the dictionary file of the index (with no postings), and in a manifest next to it (<dictionary file>.shards).
+    The manifest is pickled as {"shards": [{"dictionary": path, "postings": path}, ...], "totalNumberOfDocs": N},
+    with paths relative to the manifest.
+
+    Each shard also stores the position of each of its documents in the document table of the unsharded index
+    (<shard dictionary file>.positions, int64 little-endian in shard order), so that ties between shards are broken as the unsharded index does.
+
+    This class is used by search as an IndexHandle: query terms are normalised and weighed in the main process,
+    then the weights are sent to every shard process, which scores them against its own index; the top 10 of each shard
+    are merged by score, then by position, into the top 10 of the collection.
+    """
+
+    MANIFEST_FILE_SUFFIX = '.shards'
+    POSITIONS_FILE_SUFFIX = '.positions'
+
+    def __init__(self, dictFile, postingsFile, cacheEntries=1024, cacheBytes=None, useMmap=True):
+        self.dictFile = dictFile
+        self.postingsFile = postingsFile
+        self.cacheEntries = cacheEntries
+        self.cacheBytes = cacheBytes
+        self.useMmap = useMmap
+
+        manifestFile = ShardedIndex.getManifestFile(dictFile)
+        self.version = tuple((os.stat(f).st_mtime_ns, os.stat(f).st_size) for f in (manifestFile, dictFile))  # taken before loading
+        with open(manifestFile, 'rb') as f:
+            manifest = pickle.load(f)
+
+        directory = os.path.dirname(os.path.abspath(manifestFile))
+        self.shardFiles = [(os.path.join(directory, shard["dictionary"]), os.path.join(directory, shard["postings"])) for shard in manifest["shards"]]
+        self.totalNumberOfDocs = manifest["totalNumberOfDocs"]
+        self.dictionary = IndexHandle.loadDictionary(dictFile)  # document frequencies of the whole collection
+        self.normaliser = Normaliser(tokenizer=self.dictionary.getTokenizer())  # queries are tokenized as the documents were
+        self.normaliser.load(Normaliser.getStemsFile(dictFile))
+        self.timer = PhaseTimer(enabled=False)
+
+        import multiprocessing  # imported here, as it slows down starting searches of indexes that are not sharded
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+
+        else:
+            context = multiprocessing.get_context()
+
+        self.connections = []
+        self.processes = []
+        for shardDictFile, shardPostingsFile in self.shardFiles:
+            connection, shardConnection = context.Pipe()
+            process = context.Process(target=ShardedIndex.serveShard, daemon=True,
+                                      args=(shardConnection, shardDictFile, shardPostingsFile, cacheEntries, cacheBytes, useMmap))
+            process.start()
+            shardConnection.close()
+            self.connections.append(connection)
+            self.processes.append(process)
+
+
+    @classmethod
+    def getManifestFile(cls, dictFile):
+        return dictFile + cls.MANIFEST_FILE_SUFFIX
+
+
+    @classmethod
+    def isShardedIndex(cls, dictFile):
+        return os.path.exists(cls.getManifestFile(dictFile))
+
+
+    @classmethod
+    def getPositionsFile(cls, shardDictFile):
+        return shardDictFile + cls.POSITIONS_FILE_SUFFIX
+
+
+    @staticmethod
+    def getShardFiles(dictFile, postingsFile, shardNumber):
+        """
+        Returns (dictionary file, postings file) of the given shard of an index.
+        """
+        return dictFile + '.shard' + str(shardNumber), postingsFile + '.shard' + str(shardNumber)
+
+
+    @staticmethod
+    def getShard(docID, numberOfShards):
+        """
+        Returns the shard the document of the given docID is indexed in. The hash does not depend on the process, unlike hash().
+        """
+        return zlib.crc32(docID.encode('utf8')) % numberOfShards
+
+
+    @classmethod
+    def writePositions(cls, shardDictFile, positions):
+        """
+        Saves the positions (an array of int64) of the documents of a shard in the document table of the unsharded index.
+        """
+        if sys.byteorder != 'little':
+            positions.byteswap()
+        with open(cls.getPositionsFile(shardDictFile), 'wb') as f:
+            positions.tofile(f)
+
+
+    @classmethod
+    def readPositions(cls, shardDictFile):
+        positions = array('q')
+        with open(cls.getPositionsFile(shardDictFile), 'rb') as f:
+            positions.frombytes(f.read())
+        if sys.byteorder != 'little':  # stored little-endian
+            positions.byteswap()
+
+        return positions
+
+
+    @classmethod
+    def writeManifest(cls, dictFile, shardFiles, totalNumberOfDocs):
+        """
+        Saves the manifest of a sharded index, given (dictionary file, postings file) of each shard. It is replaced atomically.
+        """
+        manifestFile = cls.getManifestFile(dictFile)
+        directory = os.path.dirname(os.path.abspath(manifestFile))
+        manifest = {"shards": [{"dictionary": os.path.relpath(os.path.abspath(shardDictFile), directory),
+                                "postings": os.path.relpath(os.path.abspath(shardPostingsFile), directory)}
+                               for shardDictFile, shardPostingsFile in shardFiles],
+                    "totalNumberOfDocs": totalNumberOfDocs}
+        with open(manifestFile + '.new', 'wb') as f:
+            pickle.dump(manifest, f)
+        os.replace(manifestFile + '.new', manifestFile)
+
+
+    @classmethod
+    def removeShards(cls, dictFile, keep=()):
+        """
+        Removes the manifest of the given index and the files of all its shards (except those in keep), e.g. when the index is rebuilt.
+        Searches that still have them open keep reading them until they reopen the index.
+        """
+        manifestFile = cls.getManifestFile(dictFile)
+        if not os.path.exists(manifestFile):
+            return
+
+        with open(manifestFile, 'rb') as f:
+            manifest = pickle.load(f)
+
+        directory = os.path.dirname(os.path.abspath(manifestFile))
+        for shard in manifest["shards"]:
+            shardDictFile = os.path.join(directory, shard["dictionary"])
+            for file in (shardDictFile, os.path.join(directory, shard["postings"]), cls.getPositionsFile(shardDictFile),
+                         Normaliser.getStemsFile(shardDictFile), SearchBundle.getBundleFile(shardDictFile)):
+                if os.path.exists(file) and os.path.abspath(file) not in [os.path.abspath(kept) for kept in keep]:
+                    os.remove(file)
+        os.remove(manifestFile)
+
+
+    @staticmethod
+    def serveShard(connection, dictFile, postingsFile, cacheEntries, cacheBytes, useMmap):
+        """
+        Main loop of the process of a shard. It receives (list of query weights, engine) requests and answers each with,
+        for every query, the top 10 documents of the shard as (score, position, docID) tuples, best first; "stats" is answered
+        with the postings cache statistics of the shard, and None ends the process. Errors are sent back to be raised in the main process.
+        """
+        import search  # imported here, as search imports this module
+
+        indexHandle = IndexHandle(dictFile, postingsFile, cacheEntries, cacheBytes, useMmap)
+        positions = ShardedIndex.readPositions(dictFile)
+        while True:
+            request = connection.recv()
+            if request is None:
+                break
+
+            try:
+                if request == "stats":
+                    connection.send(indexHandle.getCacheStats())
+                    continue
+
+                allWeights, engine = request
+                if len(allWeights) > 1:  # a batch: read the postings of its terms once
+                    indexHandle.pinPostings({term for weights in allWeights for term in weights}, engine == 'numpy')
+
+                connection.send([[(score, positions[docIndex], indexHandle.getDocID(docIndex))
+                                  for score, docIndex in search.rankTopDocuments(weights, indexHandle, engine)] for weights in allWeights])
+
+            except Exception as e:
+                connection.send(e)
+
+        indexHandle.close()
+        connection.close()
+
+
+    def request(self, request):
+        """
+        Sends the given request to every shard, and returns their answers in shard order. Shards work on it in parallel.
+        """
+        for connection in self.connections:
+            connection.send(request)
+
+        answers = [connection.recv() for connection in self.connections]
+        for answer in answers:
+            if isinstance(answer, Exception):
+                raise answer
+
+        return answers
+
+
+    def rankQueries(self, allWeights, engine):
+        """
+        Given the normalised query weights of a list of queries, returns the top 10 documents of each query in the whole collection,
+        as a list of (score, docID) pairs, best first. Documents of equal score are ordered as in the unsharded index.
+        """
+        if not allWeights:
+            return []
+
+        shardResults = self.request((allWeights, engine))
+        results = []
+        for query in range(len(allWeights)):
+            candidates = [candidate for shardResult in shardResults for candidate in shardResult[query]]
+            candidates.sort(key=lambda candidate: (-candidate[0], candidate[1]))
+            results.append([(score, docID) for score, position, docID in candidates[:10]])
+
+        return results
+
+
+    def getOpenArguments(self):
+        return self.dictFile, self.postingsFile, self.cacheEntries, self.cacheBytes, self.useMmap
+
+
+    def getVersion(self):
+        return self.version
+
+
+    def getDictionary(self):
+        return self.dictionary
+
+
+    def getNormaliser(self):
+        return self.normaliser
+
+
+    def setTimer(self, timer):
+        """
+        Sets the PhaseTimer charged with the work of the main process; the work of the shard processes shows up as scoring time.
+        """
+        self.timer = timer
+
+
+    def getTimer(self):
+        return self.timer
+
+
+    def getTotalNumberOfDocs(self):
+        return self.totalNumberOfDocs
+
+
+    def getTermDocFrequency(self, term):
+        return self.dictionary.getTermDocFrequency(term)
+
+
+    def supportsNumpy(self):
+        return NumpyScoring.isAvailable() and all(PostingsCodec.isBinaryPostingsFile(shardPostingsFile) for _, shardPostingsFile in self.shardFiles)
+
+
+    def getCacheStats(self):
+        stats = {}
+        for shardStats in self.request("stats"):
+            for key, value in shardStats.items():
+                stats[key] = stats.get(key, 0) + value
+
+        return stats
+
+
+    def close(self):
+        """
+        Ends the shard processes.
+        """
+        for connection in self.connections:
+            try:
+                connection.send(None)
+            except OSError:  # already ended
+                pass
+            connection.close()
+
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
@@ -1,4 +1,7 @@
 import pickle
+import fnmatch
+
+import Tokenizers
 
 class TermDictionary(object):
     """
@@ -7,10 +10,16 @@ class TermDictionary(object):
 
     DOCFREQ_INDEX = 0
     POINTERS_INDEX = 1
+    MAXSCORE_INDEX = 2
+    CHAMPIONS_INDEX = 3
+    TAILMAXSCORE_INDEX = 4
 
     def __init__(self, storageLocation):
         # In the form of {term: [docFrequency, pointer], term2: [docFrequency, pointer], ..., termN: [docFrequency, pointer]}
         # In the form of {term: [docFrequency, pointer], term2: [docFrequency, pointer], ..., "d0cum3ntL3ngth": pointer} (after indexing)
+        # In the form of {term: [docFrequency, pointer, maxScore], ..., "d0cum3ntL3ngth": pointer} (after indexing into the binary format)
+        # In the form of {term: [docFrequency, pointer, maxScore, championsPointer, tailMaxScore], ...} (after indexing with champion lists)
+        # "t0k3n1z3r": name of the tokenizer backend, if recorded (see setTokenizer)
         self.termInformation = {} 
         self.storageLocation = storageLocation
 
@@ -41,11 +50,11 @@ class TermDictionary(object):
         return self.termInformation.keys()
     
 
-    def save(self):
+    def save(self, storageLocation=None):
         """
-        Saves term information held in the storage location specified
+        Saves term information held in the storage location specified, or in the given one
         """
-        with open(self.storageLocation, 'wb') as f:
+        with open(storageLocation or self.storageLocation, 'wb') as f:
             pickle.dump(self.termInformation, f)
 
 
@@ -78,6 +87,75 @@ class TermDictionary(object):
             return 0
             
     
+    def setTermMaxScore(self, term, maxScore):
+        """
+        Stores the largest normalised term weight (termWeight / vectorDocLength) among the postings of the given term,
+        which bounds the contribution of the term to the score of any document.
+        """
+        termInfo = self.termInformation[term]
+        del termInfo[self.MAXSCORE_INDEX:]
+        termInfo.append(maxScore)
+
+
+    def getTermMaxScore(self, term):
+        try:
+            # if term exists in the dictionary
+            return self.termInformation[term][self.MAXSCORE_INDEX]
+
+        except KeyError: # term does not exist in the dictionary
+            return 0
+
+
+    def hasMaxScores(self):
+        """
+        Returns True if the terms in the dictionary have max scores (dictionaries of the legacy pickle format do not).
+        """
+        for termInfo in self.termInformation.values():
+            if isinstance(termInfo, list):
+                return len(termInfo) > self.MAXSCORE_INDEX
+
+        return False
+
+
+    def setTermChampions(self, term, championsPointer, tailMaxScore):
+        """
+        Stores a pointer to the champion list of the given term (its postings with the highest normalised term weights),
+        and the largest normalised term weight among the postings left out of the champion list (0 if none are).
+        """
+        termInfo = self.termInformation[term]
+        del termInfo[self.CHAMPIONS_INDEX:]
+        termInfo.extend([championsPointer, tailMaxScore])
+
+
+    def getTermChampionsPointer(self, term):
+        try:
+            # if term exists in the dictionary
+            return self.termInformation[term][self.CHAMPIONS_INDEX]
+
+        except KeyError: # term does not exist in the dictionary
+            return -1
+
+
+    def getTermTailMaxScore(self, term):
+        try:
+            # if term exists in the dictionary
+            return self.termInformation[term][self.TAILMAXSCORE_INDEX]
+
+        except KeyError: # term does not exist in the dictionary
+            return 0
+
+
+    def hasChampions(self):
+        """
+        Returns True if the terms in the dictionary have champion lists.
+        """
+        for termInfo in self.termInformation.values():
+            if isinstance(termInfo, list):
+                return len(termInfo) > self.CHAMPIONS_INDEX
+
+        return False
+
+
     def addPointerToDocLengths(self, pointer):
         """
         Adds a pointer to a dictionary where key = docID, value = length of document with ID = docID.
@@ -87,4 +165,29 @@ class TermDictionary(object):
     
     def getPointerToDocLengths(self):
         return self.termInformation["d0cum3ntL3ngth"]
-    
\ No newline at end of file
+
+
+    def setTokenizer(self, tokenizer):
+        """
+        Records the tokenizer backend (see Tokenizers) the index was built with, so that search tokenizes queries with the same one.
+        """
+        self.termInformation["t0k3n1z3r"] = tokenizer
+
+
+    def getTokenizer(self):
+        return self.termInformation.get("t0k3n1z3r", Tokenizers.DEFAULT_BACKEND)  # indexes built before backends could be chosen used NLTK
+    
+
+
+    def expandPrefix(self, prefix):
+        """
+        Returns all terms starting with the given prefix, in sorted order.
+        """
+        return sorted(term for term, termInfo in self.termInformation.items() if isinstance(termInfo, list) and term.startswith(prefix))
+
+
+    def expandWildcard(self, pattern):
+        """
+        Returns all terms matching the given wildcard pattern (* for any characters, ? for one character, as in fnmatch), in sorted order.
+        """
+        return sorted(term for term, termInfo in self.termInformation.items() if isinstance(termInfo, list) and fnmatch.fnmatchcase(term, pattern))
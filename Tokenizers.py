@@ -0,0 +1,104 @@
+"""
+Tokenizers turning the text of documents and queries into tokens, before they are normalised (see Normaliser).
+
+Two backends are available:
+    nltk: NLTK's Punkt sentence tokenizer, then its word tokenizer on every sentence.
+    regex: a single pass of one precompiled regular expression, which splits words as the NLTK word tokenizer does in common cases
+           (punctuation, quotes, brackets, contractions), but tells where sentences end without Punkt's model: a period followed
+           by white space or the end of the text ends a sentence, unless it belongs to a known abbreviation or to initials.
+           It is many times faster.
+The index records the backend it was built with, and queries are tokenized with the same one.
+"""
+import re
+
+BACKENDS = ('nltk', 'regex')
+DEFAULT_BACKEND = 'nltk'
+
+# abbreviations whose period does not end a sentence, as Punkt learns for English. They are matched as written, capitalised:
+# lowercase forms such as no, art, est or ed are common words, which keep their period only if matched to end a sentence.
+ABBREVIATIONS = ['Mr', 'Mrs', 'Ms', 'Dr', 'Prof', 'Sr', 'Jr', 'St', 'Mt', 'No', 'Nos', 'Co', 'Corp', 'Inc', 'Ltd', 'Pte', 'Bhd', 'Cap', 'Art', 'Arts',
+                 'Ch', 'Cl', 'Para', 'Paras', 'Pt', 'Reg', 'Regs', 'Sch', 'Sec', 'Sect', 'Ss', 'Vol', 'Vols', 'App', 'Supp', 'Ed', 'Eds',
+                 'Rev', 'Gen', 'Gov', 'Hon', 'Sen', 'Rep', 'Vs', 'Cf', 'Ibid', 'Etc', 'Approx', 'Dept', 'Est', 'Fig', 'Figs',
+                 'Jan', 'Feb', 'Mar', 'Apr', 'Jun', 'Jul', 'Aug', 'Sep', 'Sept', 'Oct', 'Nov', 'Dec']
+ABBREVIATION = '(?:' + '|'.join(sorted(ABBREVIATIONS + ['v', 'pp', 'ss'], key=len, reverse=True)) + ')'  # and lowercase ones that are not words
+
+SPLIT = r"\s;@#$%&?!*()\[\]{}<>‒-―«»“”‘’„`\"\-:,."  # characters that do not always stay in a word
+CLOSERS = r"\]\)}>\"'»”’"  # characters that can follow a sentence-ending period
+SENTENCE_END = r"(?=[" + CLOSERS + r"]*(?:\s|$))"  # after a sentence-ending period
+
+TOKEN_PATTERN = re.compile(r"""
+    (?<![^\s(\[{<])(?:""" + ABBREVIATION + r"""|[A-Za-z](?:\.[A-Za-z])*)\.""" + SENTENCE_END + r"""  # abbreviations and initials keep their period
+  | ``|''|`+|\.{2,}|--|[;@#$%&?!*()\[\]{}<>‒-―«»“”‘’„]  # punctuation standing on its own
+  | [:,](?!\d)  # colons and commas, unless inside a number
+  | \.""" + SENTENCE_END + r"""  # the period ending a sentence
+  | (?:[^""" + SPLIT + r"""]|-(?!-)|[:,](?=\d)|\.(?!\.)(?![""" + CLOSERS + r"""]*(?:\s|$)))+  # words
+    """, re.VERBOSE)
+
+STARTING_QUOTE_PATTERN = re.compile(r'(?:^|(?<=[\s(\[{<«“‘„`]))"')
+CONTRACTION_PATTERN = re.compile(r"(?i)'|\b(?:cannot|d'ye|gimme|gonna|gotta|lemme|more'n|wanna)\b")
+CLITIC_PATTERN = re.compile(r"(?s)(.*[^' ])(n't|N'T|'ll|'LL|'re|'RE|'ve|'VE|'[sSmMdD]|')$")
+LEADING_QUOTE_PATTERN = re.compile(r"(?i)(')(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)")
+SPLIT_WORDS = {'cannot': 3, "d'ye": 1, 'gimme': 3, 'gonna': 3, 'gotta': 3, 'lemme': 3, "more'n": 4, 'wanna': 3}  # {word : split position, ...}
+
+
+def getTokenizer(backend):
+    """
+    Returns the tokenize function of the given backend.
+    """
+    if backend == 'nltk':
+        return nltkTokenize
+
+    if backend == 'regex':
+        return regexTokenize
+
+    raise ValueError("unknown tokenizer " + str(backend))
+
+
+def nltkTokenize(text):
+    """
+    Splits the text into sentences with Punkt, and each sentence into words with NLTK's word tokenizer.
+    """
+    import nltk
+
+    tokens = []
+    for sentence in nltk.tokenize.sent_tokenize(text):
+        tokens.extend(nltk.tokenize.word_tokenize(sentence))
+
+    return tokens
+
+
+def regexTokenize(text):
+    """
+    Splits the text into the tokens NLTK's tokenizers would give in common cases, in a single pass of TOKEN_PATTERN.
+    """
+    if '"' in text:  # opening double quotes become ``, closing ones ''
+        text = STARTING_QUOTE_PATTERN.sub(' `` ', text).replace('"', " '' ")
+
+    tokens = TOKEN_PATTERN.findall(text)
+    if CONTRACTION_PATTERN.search(text) is None:
+        return tokens
+
+    output = []
+    for token in tokens:
+        if "'" not in token and token.lower() not in SPLIT_WORDS:
+            output.append(token)
+            continue
+
+        position = SPLIT_WORDS.get(token.lower())
+        if position is not None:  # e.g. cannot -> can not
+            output.extend((token[:position], token[position:]))
+            continue
+
+        quote = LEADING_QUOTE_PATTERN.match(token)
+        if quote is not None and len(token) > 1:  # 'quoted -> ' quoted
+            output.append("'")
+            token = token[1:]
+
+        clitic = CLITIC_PATTERN.match(token)
+        if clitic is not None:  # e.g. don't -> do n't, court's -> court 's, courts' -> courts '
+            output.extend(clitic.groups())
+
+        else:
+            output.append(token)
+
+    return output
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+import os
+import sys
+import json
+import time
+import getopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from IndexHandle import IndexHandle
+from MaxScore import maxScoreTopK
+from ChampionLists import championsTopK
+from search import computeQueryWeights
+
+
+def usage():
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries")
+
+
+def run_benchmark(dict_file, postings_file, queries_file):
+    """
+    Compares champion list retrieval against exact (MaxScore) retrieval over the given queries, on an index built with --champions.
+    Reports the time taken by each, how many queries exact champion retrieval settles without the full postings,
+    and the mean recall@10 of approximate champion retrieval against the exact top 10.
+    """
+    indexHandle = IndexHandle(dict_file, postings_file, cacheEntries=None)
+    if not indexHandle.hasChampions():
+        print("the index has no champion lists, build it with index.py --champions R")
+        sys.exit(1)
+
+    with open(queries_file, 'r') as queryFile:
+        queries = [computeQueryWeights(query, indexHandle) for query in queryFile if query.strip()]
+
+    # read every postings list and champion list once, so that the timings below compare scoring only
+    for queryWeights in queries:
+        for term in queryWeights:
+            indexHandle.getPostings(term)
+            indexHandle.getChampions(term)
+
+    start = time.perf_counter()
+    exact = [maxScoreTopK(queryWeights, indexHandle, 10) for queryWeights in queries]
+    exactTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    settled = 0
+    for queryWeights in queries:
+        output = championsTopK(queryWeights, indexHandle, 10)
+        if output is None:
+            output = maxScoreTopK(queryWeights, indexHandle, 10)
+        else:
+            settled += 1
+    championsTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    approximate = [championsTopK(queryWeights, indexHandle, 10, approximate=True) for queryWeights in queries]
+    approximateTime = time.perf_counter() - start
+
+    recalls = []
+    for exactOutput, approximateOutput in zip(exact, approximate):
+        exactDocs = set(docIndex for score, docIndex in exactOutput)
+        if exactDocs:
+            recalls.append(len(exactDocs.intersection(docIndex for score, docIndex in approximateOutput)) / len(exactDocs))
+
+    print(json.dumps({
+        "queries": len(queries),
+        "exactSeconds": round(exactTime, 4),
+        "championsSeconds": round(championsTime, 4),
+        "championsSettled": settled,
+        "approximateSeconds": round(approximateTime, 4),
+        "approximateRecallAt10": round(sum(recalls) / len(recalls), 4) if recalls else None,
+    }, indent=2))
+
+
+dictionary_file = postings_file = file_of_queries = None
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:')
+except getopt.GetoptError:
+    usage()
+    sys.exit(2)
+
+for o, a in opts:
+    if o == '-d':
+        dictionary_file = a
+    elif o == '-p':
+        postings_file = a
+    elif o == '-q':
+        file_of_queries = a
+    else:
+        assert False, "unhandled option"
+
+if dictionary_file == None or postings_file == None or file_of_queries == None:
+    usage()
+    sys.exit(2)
+
+run_benchmark(dictionary_file, postings_file, file_of_queries)
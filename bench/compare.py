@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+import sys
+import json
+import getopt
+
+MEASUREMENTS = ('wall', 'cpu', 'calls', 'peakTracedBytes')  # measurements of a phase other than its counters
+LOWER_IS_BETTER = ('wall', 'cpu', 'peakTracedBytes')
+
+
+def usage():
+    print("usage: " + sys.argv[0] + " -b baseline-stats-json -c current-stats-json [--threshold fraction] [--min-seconds seconds]\n"
+          "stats files are written by index.py or search.py with --stats-json")
+
+
+def formatChange(previous, current):
+    """
+    Returns the change from previous to current as a string, e.g. '1.2 -> 1.5 (+25.0%)'.
+    """
+    change = ''
+    if previous:
+        relative = (current - previous) / previous
+        change = ' (' + ('+' if relative >= 0 else '') + str(round(relative * 100, 1)) + '%)'
+
+    return str(round(previous, 4)) + ' -> ' + str(round(current, 4)) + change
+
+
+def comparePhases(baseline, current, threshold, minSeconds):
+    """
+    Compares the phases of 2 stats files, as written by PhaseTimer.writeStats.
+    Returns a tuple: (a line describing each measurement and counter of each phase that changed,
+    a description of each time or peak memory that grew by more than the given fraction).
+    Times of phases that took less than minSeconds in both runs are too noisy to count as regressions.
+    """
+    lines = []
+    regressions = []
+    for phase in list(baseline["phases"]) + [phase for phase in current["phases"] if phase not in baseline["phases"]]:
+        previousPhase, currentPhase = baseline["phases"].get(phase, {}), current["phases"].get(phase, {})
+        if not previousPhase or not currentPhase:
+            lines.append(phase + ': only in the ' + ('baseline' if previousPhase else 'current run'))
+            continue
+
+        keys = [key for key in MEASUREMENTS if key in previousPhase or key in currentPhase] \
+               + sorted(key for key in set(previousPhase) | set(currentPhase) if key not in MEASUREMENTS)
+        for key in keys:
+            previous, value = previousPhase.get(key, 0), currentPhase.get(key, 0)
+            if previous == value:
+                continue
+
+            lines.append(phase + ' ' + key + ': ' + formatChange(previous, value))
+            if key not in LOWER_IS_BETTER or not previous or (value - previous) / previous <= threshold:
+                continue
+            if key in ('wall', 'cpu') and max(previous, value) < minSeconds:
+                continue
+            regressions.append(phase + ' ' + key + ': ' + formatChange(previous, value))
+
+    return lines, regressions
+
+
+if __name__ == "__main__":
+    baseline_file = current_file = None
+    threshold = 0.1  # largest tolerated relative growth of a time or peak against the baseline
+    min_seconds = 0.01  # shortest phase time that can count as a regression
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'b:c:', ['threshold=', 'min-seconds='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-b':
+            baseline_file = a
+        elif o == '-c':
+            current_file = a
+        elif o == '--threshold':
+            threshold = float(a)
+        elif o == '--min-seconds':
+            min_seconds = float(a)
+        else:
+            assert False, "unhandled option"
+
+    if baseline_file == None or current_file == None:
+        usage()
+        sys.exit(2)
+
+    with open(baseline_file, 'r') as f:
+        baseline = json.load(f)
+    with open(current_file, 'r') as f:
+        current = json.load(f)
+
+    if baseline.get("arguments") != current.get("arguments"):
+        print('note: the runs were made with different arguments')
+
+    lines, regressions = comparePhases(baseline, current, threshold, min_seconds)
+    for line in lines:
+        print(line)
+    for regression in regressions:
+        print('regression: ' + regression)
+    if regressions:
+        sys.exit(1)
@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+import csv
+import sys
+import math
+import random
+import getopt
+import itertools
+
+SYLLABLES = ['ba', 'co', 'de', 'fi', 'gu', 'ha', 'je', 'ki', 'lo', 'mu', 'na', 're', 'si', 'to', 'vu', 'wa', 'xe', 'yo', 'za', 'pre',
+             'con', 'ment', 'tion', 'ing', 'ed', 'er', 'ly', 'al', 'ous', 'ive']
+SUFFIXES = ['', '', '', 's', 'ed', 'ing', 'er']  # inflections, so that stemming conflates some words
+
+
+def usage():
+    print("usage: " + sys.argv[0] + " -n number-of-documents -o output-csv-file [-q output-queries-file] [-Q number-of-queries] [-s seed]")
+
+
+def parseCount(count):
+    """
+    Parses a number of documents such as 10000, 10k or 1M.
+    """
+    multipliers = {'k': 1000, 'm': 1000 * 1000}
+    if count[-1:].lower() in multipliers:
+        return int(float(count[:-1]) * multipliers[count[-1:].lower()])
+
+    return int(count)
+
+
+def makeVocabulary(size, generator):
+    """
+    Returns the given number of distinct made-up words, in the order of their (Zipfian) rank.
+    """
+    words = []
+    seen = set()
+    for length in itertools.count(1):
+        for _ in range(size * 2):
+            word = ''.join(generator.choice(SYLLABLES) for _ in range(length)) + generator.choice(SUFFIXES)
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+                if len(words) == size:
+                    return words
+
+
+def getVocabularySize(numberOfDocs):
+    """
+    Grows the vocabulary with the size of the corpus, as in Heaps' law.
+    """
+    return int(40 * numberOfDocs ** 0.6) + 1000
+
+
+def getZipfWeights(size, exponent=1.07):
+    """
+    Returns the cumulative weights of the ranks 1 to size under Zipf's law, for random.choices.
+    """
+    return list(itertools.accumulate(1 / math.pow(rank, exponent) for rank in range(1, size + 1)))
+
+
+def generateDocumentLength(generator):
+    """
+    Returns a document length in words from a long-tailed (log-normal) distribution, with a median of about 150 words.
+    """
+    return max(5, min(int(generator.lognormvariate(5, 1)), 20000))
+
+
+def generateCorpus(numberOfDocs, out_file, seed=0):
+    """
+    Writes a synthetic corpus of the given number of documents, in the same csv format as the real one
+    (document_id, title, content, date_posted, court), drawing words from a Zipfian vocabulary.
+    The corpus only depends on the number of documents and the seed.
+    """
+    generator = random.Random(seed)
+    vocabulary = makeVocabulary(getVocabularySize(numberOfDocs), generator)
+    cumulativeWeights = getZipfWeights(len(vocabulary))
+
+    with open(out_file, 'w', newline='', encoding='utf8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["document_id", "title", "content", "date_posted", "court"])
+        for docNumber in range(numberOfDocs):
+            words = generator.choices(vocabulary, cum_weights=cumulativeWeights, k=generateDocumentLength(generator))
+            sentences = []
+            for start in range(0, len(words), 12):
+                sentence = ' '.join(words[start:start + 12])
+                sentences.append(sentence[0].upper() + sentence[1:] + generator.choice(['.', '.', '.', '?', '!', ',']))
+            writer.writerow([str(1000000 + docNumber), 'Document ' + str(docNumber), ' '.join(sentences), '2020-01-01', 'Bench Court'])
+
+
+def generateQueries(numberOfDocs, out_file, numberOfQueries=1000, seed=0):
+    """
+    Writes the given number of queries of 1 to 4 words over the vocabulary of the corpus generateCorpus makes with the same arguments.
+    Query words are drawn from the Zipfian distribution without its 100 most common words, which queries seldom contain.
+    """
+    generator = random.Random(seed)
+    vocabulary = makeVocabulary(getVocabularySize(numberOfDocs), generator)[100:]
+    cumulativeWeights = getZipfWeights(len(vocabulary))
+
+    generator = random.Random(seed + 1)
+    with open(out_file, 'w', encoding='utf8') as f:
+        for _ in range(numberOfQueries):
+            f.write(' '.join(generator.choices(vocabulary, cum_weights=cumulativeWeights, k=generator.randint(1, 4))) + '\n')
+
+
+if __name__ == "__main__":
+    number_of_docs = output_file = queries_file = None
+    number_of_queries = 1000
+    seed = 0
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'n:o:q:Q:s:')
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-n':
+            number_of_docs = parseCount(a)
+        elif o == '-o':
+            output_file = a
+        elif o == '-q':
+            queries_file = a
+        elif o == '-Q':
+            number_of_queries = int(a)
+        elif o == '-s':
+            seed = int(a)
+        else:
+            assert False, "unhandled option"
+
+    if number_of_docs == None or output_file == None:
+        usage()
+        sys.exit(2)
+
+    generateCorpus(number_of_docs, output_file, seed)
+    if queries_file != None:
+        generateQueries(number_of_docs, queries_file, number_of_queries, seed)
@@ -0,0 +1,130 @@
+#!/usr/bin/python3
+import os
+import sys
+import json
+import time
+import getopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import PostingsCodec
+
+from IndexHandle import IndexHandle
+from PhraseQueries import splitPhrases
+from index import readDocuments
+from search import computeQueryTermFrequencies, computeQueryWeightsFromFrequencies, computeQueryPhrases, rankDocuments, rankTopDocuments
+
+POST_FILTER_DEPTH = 200  # documents ranked before post-filtering
+
+
+def usage():
+    print("usage: " + sys.argv[0] + " -i input-file -d dictionary-file -p postings-file -q file-of-queries [-o output-json-file]\n"
+          "the index must be built from the input file with index.py --positional; queries should hold \"quoted phrases\"")
+
+
+def containsTerms(terms, phrase):
+    """
+    Returns True if the given terms of a document hold the given phrase (a tuple of terms).
+    """
+    return any(tuple(terms[start:start + len(phrase)]) == phrase for start in range(len(terms) - len(phrase) + 1))
+
+
+def run_benchmark(in_file, dict_file, postings_file, queries_file):
+    """
+    Compares phrase queries answered with positional postings (see PhraseQueries) against post-filtering: ranking the top POST_FILTER_DEPTH
+    documents of the plain query, then tokenizing their text to find the phrases. Also times the plain queries without phrases,
+    which read no positions. Reports the time taken by each, how many queries post-filtering answers differently (it misses
+    matches ranked below its depth), and the size of the positions file against that of the postings file.
+    """
+    indexHandle = IndexHandle(dict_file, postings_file, cacheEntries=None)
+    if not indexHandle.hasPositions():
+        print("the index has no positions, build it with index.py --positional")
+        sys.exit(1)
+
+    normaliser = indexHandle.getNormaliser()
+    queries = []  # (normalised query weights, phrases)
+    with open(queries_file, 'r') as queryFile:
+        for query in queryFile:
+            if query.strip():
+                text, phraseTexts = splitPhrases(query)
+                queries.append((computeQueryWeightsFromFrequencies(computeQueryTermFrequencies(text, indexHandle), indexHandle),
+                                computeQueryPhrases(phraseTexts, indexHandle)))
+
+    contents = {}  # {docID : content, ...}, with the copies of a repeated docID joined, as they are indexed
+    for docID, content in readDocuments(in_file):
+        contents[docID] = contents[docID] + ' ' + content if docID in contents else content
+
+    # read every postings list once, so that the timings below compare scoring only
+    for queryWeights, phrases in queries:
+        for term in queryWeights:
+            indexHandle.getPostings(term)
+
+    start = time.perf_counter()
+    for queryWeights, phrases in queries:
+        rankDocuments(queryWeights, indexHandle, 'maxscore')
+    plainTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    positional = [rankDocuments(queryWeights, indexHandle, 'maxscore', phrases) for queryWeights, phrases in queries]
+    positionalTime = time.perf_counter() - start
+
+    start = time.perf_counter()
+    postFiltered = []
+    for queryWeights, phrases in queries:
+        docIDs = []
+        for score, docIndex in rankTopDocuments(queryWeights, indexHandle, 'maxscore', POST_FILTER_DEPTH):
+            docID = indexHandle.getDocID(docIndex)
+            terms = [normaliser.normalise(token) for token in normaliser.tokenize(contents[docID])]
+            if all(containsTerms(terms, phrase) for phrase in phrases):
+                docIDs.append(docID)
+                if len(docIDs) == 10:
+                    break
+        postFiltered.append(" ".join(docIDs))
+    postFilterTime = time.perf_counter() - start
+
+    results = {
+        "queries": len(queries),
+        "plainSeconds": round(plainTime, 4),
+        "positionalSeconds": round(positionalTime, 4),
+        "postFilterSeconds": round(postFilterTime, 4),
+        "postFilterDepth": POST_FILTER_DEPTH,
+        "postFilterDifferent": sum(1 for positionalResult, postFilterResult in zip(positional, postFiltered) if positionalResult != postFilterResult),
+        "postingsBytes": os.path.getsize(postings_file),
+        "positionsBytes": os.path.getsize(PostingsCodec.getPositionsFile(postings_file)),
+    }
+    indexHandle.close()
+    return results
+
+
+if __name__ == "__main__":
+    input_file = dictionary_file = postings_file = file_of_queries = output_file = None
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'i:d:p:q:o:')
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-i':
+            input_file = a
+        elif o == '-d':
+            dictionary_file = a
+        elif o == '-p':
+            postings_file = a
+        elif o == '-q':
+            file_of_queries = a
+        elif o == '-o':
+            output_file = a
+        else:
+            assert False, "unhandled option"
+
+    if input_file == None or dictionary_file == None or postings_file == None or file_of_queries == None:
+        usage()
+        sys.exit(2)
+
+    results = run_benchmark(input_file, dictionary_file, postings_file, file_of_queries)
+    print(json.dumps(results, indent=2))
+    if output_file != None:
+        with open(output_file, 'w') as f:
+            json.dump(results, f, indent=2)
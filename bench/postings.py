@@ -0,0 +1,158 @@
+#!/usr/bin/python3
+import os
+import sys
+import json
+import time
+import heapq
+import getopt
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from Node import Node
+from IndexHandle import IndexHandle
+from search import computeQueryWeights, rankTopDocuments, extractTop10
+
+
+def usage():
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries [-r repetitions]")
+
+
+class DictNode(object):
+    """
+    A posting as Node stored it before it had __slots__, with a per-instance attribute dict.
+    """
+
+    def __init__(self, docID, termFrequency, termWeight, vectorDocLength):
+        self.docID = docID
+        self.termFrequency = termFrequency
+        self.termWeight = termWeight
+        self.vectorDocLength = vectorDocLength
+
+
+class RankedDocument(object):
+    """
+    A scored document as search ranked them before, compared by weight through rich comparisons.
+    """
+
+    def __init__(self, docIndex, weight):
+        self.docIndex = docIndex
+        self.weight = weight
+
+    def __lt__(self, otherDoc):
+        return self.weight < otherDoc.weight
+
+    def __gt__(self, otherDoc):
+        return self.weight > otherDoc.weight
+
+
+def measureBytesPerPosting(build, terms, indexHandle):
+    """
+    Returns the memory allocated by build(docIndices, termWeights) over the postings of all the given terms, per posting.
+    """
+    allPostings = [indexHandle.getPostings(term) for term in terms]
+    numberOfPostings = sum(len(docIndices) for docIndices, termWeights in allPostings)
+
+    tracemalloc.start()
+    built = [build(docIndices, termWeights) for docIndices, termWeights in allPostings]
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return allocated / numberOfPostings
+
+
+def timeQueries(rank, queries, repetitions):
+    """
+    Returns the best mean time (in milliseconds) of rank(queryWeights) over the given queries, out of the given number of repetitions.
+    """
+    best = None
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        for queryWeights in queries:
+            rank(queryWeights)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best / len(queries) * 1000
+
+
+def run_benchmark(dict_file, postings_file, queries_file, repetitions=5):
+    """
+    Measures the memory taken per posting by postings held as objects with an attribute dict (as legacy Nodes were),
+    as Nodes with __slots__, and as the packed arrays cached by IndexHandle; and the query latency of search,
+    with the top 10 extracted from a heap of (score, docIndex) pairs or from a heap of objects, as search did before.
+    """
+    indexHandle = IndexHandle(dict_file, postings_file, cacheEntries=None)
+    terms = list(indexHandle.getDictionary().expandPrefix(''))
+    docIDs = [indexHandle.getDocID(docIndex) for docIndex in range(indexHandle.getTotalNumberOfDocs())]
+    vectorLengths = indexHandle.getVectorLengths()
+
+    dictNodeBytes = measureBytesPerPosting(lambda docIndices, termWeights: [DictNode(docIDs[docIndex], 1, termWeight, vectorLengths[docIndex])
+                                                                            for docIndex, termWeight in zip(docIndices, termWeights)], terms, indexHandle)
+    slotNodeBytes = measureBytesPerPosting(lambda docIndices, termWeights: [Node(docIDs[docIndex], 1, termWeight, vectorLengths[docIndex])
+                                                                            for docIndex, termWeight in zip(docIndices, termWeights)], terms, indexHandle)
+    listBytes = measureBytesPerPosting(lambda docIndices, termWeights: (list(docIndices), list(termWeights)), terms, indexHandle)
+    arrayBytes = measureBytesPerPosting(lambda docIndices, termWeights: (docIndices[:], termWeights[:]), terms, indexHandle)
+
+    with open(queries_file, 'r') as queryFile:
+        queries = [computeQueryWeights(query, indexHandle) for query in queryFile if query.strip()]
+
+    def accumulate(queryWeights):
+        result = {}
+        for term, queryWeight in queryWeights.items():
+            docIndices, termWeights = indexHandle.getPostings(term)
+            for docIndex, termWeight in zip(docIndices, termWeights):
+                result[docIndex] = result.get(docIndex, 0) + queryWeight * termWeight / vectorLengths[docIndex]
+        return result
+
+    allScores = [accumulate(queryWeights) for queryWeights in queries]  # also reads every postings list once
+    tuplesTime = timeQueries(extractTop10, allScores, repetitions)
+    objectsTime = timeQueries(lambda result: heapq.nlargest(10, [RankedDocument(docIndex, result[docIndex]) for docIndex in sorted(result)]),
+                              allScores, repetitions)
+
+    print(json.dumps({
+        "queries": len(queries),
+        "postings": sum(indexHandle.getTermDocFrequency(term) for term in terms),
+        "bytesPerPosting": {
+            "dictNodes": round(dictNodeBytes, 1),
+            "slotNodes": round(slotNodeBytes, 1),
+            "lists": round(listBytes, 1),
+            "arrays": round(arrayBytes, 1),
+        },
+        "top10Milliseconds": {
+            "objectHeap": round(objectsTime, 4),
+            "tupleHeap": round(tuplesTime, 4),
+        },
+        "queryMilliseconds": {
+            "exhaustive": round(timeQueries(lambda queryWeights: rankTopDocuments(queryWeights, indexHandle, 'exhaustive'), queries, repetitions), 4),
+            "maxscore": round(timeQueries(lambda queryWeights: rankTopDocuments(queryWeights, indexHandle, 'maxscore'), queries, repetitions), 4),
+        },
+    }, indent=2))
+
+
+dictionary_file = postings_file = file_of_queries = None
+repetitions = 5
+
+try:
+    opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:r:')
+except getopt.GetoptError:
+    usage()
+    sys.exit(2)
+
+for o, a in opts:
+    if o == '-d':
+        dictionary_file = a
+    elif o == '-p':
+        postings_file = a
+    elif o == '-q':
+        file_of_queries = a
+    elif o == '-r':
+        repetitions = int(a)
+    else:
+        assert False, "unhandled option"
+
+if dictionary_file == None or postings_file == None or file_of_queries == None or repetitions < 1:
+    usage()
+    sys.exit(2)
+
+run_benchmark(dictionary_file, postings_file, file_of_queries, repetitions)
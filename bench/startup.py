@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+import os
+import sys
+import json
+import time
+import getopt
+import shutil
+import itertools
+import platform
+import tempfile
+import subprocess
+
+from statistics import median
+
+BENCH_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+REPOSITORY_DIRECTORY = os.path.join(BENCH_DIRECTORY, '..')
+sys.path.insert(0, REPOSITORY_DIRECTORY)
+
+import Segments
+import SearchBundle
+
+from IndexHandle import IndexHandle
+from Normaliser import Normaliser
+from ShardedIndex import ShardedIndex
+
+LOWER_IS_BETTER = ('seconds', 'loadIndexSeconds', 'firstQueryMs')
+
+
+def usage():
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries [-n runs] [-o output-json-file]"
+          " [--baseline json-file] [--threshold fraction]\n"
+          "the first query of the file is searched; the index must be a single segment, as built by index.py without --append or --shards")
+
+
+def timeProcess(arguments):
+    """
+    Runs a Python process with the given arguments, and returns the wall clock seconds it took.
+    """
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def linkIndex(dictFile, postingsFile, directory, withBundle):
+    """
+    Links the files of the given index into the given directory, with or without its search bundle (which is written if missing).
+    Links keep the modification times and sizes of the index files, so that the bundle stays up to date.
+    Returns the paths of the linked dictionary and postings files.
+    """
+    os.mkdir(directory)
+    links = []
+    for file in (dictFile, postingsFile, Normaliser.getStemsFile(dictFile)):
+        links.append(os.path.join(directory, os.path.basename(file)))
+        if os.path.exists(file):
+            os.symlink(os.path.abspath(file), links[-1])
+
+    if withBundle:
+        indexHandle = IndexHandle(dictFile, postingsFile, cacheEntries=0)
+        if SearchBundle.load(dictFile, indexHandle.getVersion()) is not None:
+            os.symlink(os.path.abspath(SearchBundle.getBundleFile(dictFile)), SearchBundle.getBundleFile(links[0]))
+
+        else:
+            indexHandle.close()
+            indexHandle = IndexHandle(links[0], links[1], cacheEntries=0)
+            SearchBundle.write(indexHandle)
+        indexHandle.close()
+
+    return links[0], links[1]
+
+
+def run_benchmark(dictFile, postingsFile, queriesFile, runs=10):
+    """
+    Measures how long search.py takes to answer the first query of the given file, as a new process, with and without a search bundle:
+    the wall clock time of the whole process (median of the given number of runs), and the time it spent loading the index
+    and answering the query, as measured by search.py --stats-json. The variant bundleUncached adds a term missing from the stemming
+    cache to the query, so that it also measures loading the Porter stemmer. Also measures the time taken to start Python and to import search.py.
+    Returns the results.
+    """
+    workingDirectory = tempfile.mkdtemp()
+    try:
+        with open(queriesFile, 'r') as f:
+            query = next((line for line in f if line.strip()), '')
+        indexHandle = IndexHandle(dictFile, postingsFile, cacheEntries=0)
+        cachedTokens = {token for token, term in indexHandle.getNormaliser().getEntries()}
+        indexHandle.close()
+        uncachedToken = next(token for token in ('uncached' + 'x' * length for length in itertools.count()) if token not in cachedTokens)
+        queries = {"files": query.strip(), "bundle": query.strip(), "bundleUncached": query.strip() + ' ' + uncachedToken}
+
+        interpreterSeconds = median(timeProcess(['-c', 'pass']) for _ in range(runs))
+        importSeconds = median(timeProcess(['-c', 'import sys; sys.path.insert(0, ' + repr(REPOSITORY_DIRECTORY) + '); import search'])
+                               for _ in range(runs))
+        results = {"python": platform.python_version(), "index": os.path.abspath(dictFile), "query": query.strip(), "uncachedToken": uncachedToken, "runs": runs,
+                   "interpreterSeconds": interpreterSeconds, "importSeconds": importSeconds - interpreterSeconds, "variants": {}}
+
+        for variant, variantQuery in queries.items():
+            linkedDictFile, linkedPostingsFile = linkIndex(dictFile, postingsFile, os.path.join(workingDirectory, variant), variant != 'files')
+            statsFile = os.path.join(workingDirectory, variant + '.json')
+            queryFile = os.path.join(workingDirectory, variant + '.txt')
+            with open(queryFile, 'w') as f:
+                f.write(variantQuery)
+            measurements = []
+            for _ in range(runs):
+                seconds = timeProcess([os.path.join(REPOSITORY_DIRECTORY, 'search.py'), '-d', linkedDictFile, '-p', linkedPostingsFile,
+                                       '-q', queryFile, '-o', os.path.join(workingDirectory, 'results.txt'), '--stats-json', statsFile])
+                with open(statsFile, 'r') as f:
+                    stats = json.load(f)
+                measurements.append((seconds, stats["phases"]["loadIndex"]["wall"], stats["queryRecords"][0]["ms"] if stats["queryRecords"] else 0))
+
+            results["variants"][variant] = {
+                "seconds": median(seconds for seconds, _, _ in measurements),
+                "minSeconds": min(seconds for seconds, _, _ in measurements),
+                "loadIndexSeconds": median(loadIndexSeconds for _, loadIndexSeconds, _ in measurements),
+                "firstQueryMs": median(firstQueryMs for _, _, firstQueryMs in measurements),
+            }
+
+        results["speedup"] = results["variants"]["files"]["seconds"] / results["variants"]["bundle"]["seconds"]
+        return results
+
+    finally:
+        shutil.rmtree(workingDirectory, ignore_errors=True)
+
+
+def findRegressions(results, baseline, threshold):
+    """
+    Compares the results of a run with those of a baseline run, and returns a description of each time that grew by more than the given fraction.
+    """
+    regressions = []
+    for variant, measurements in results["variants"].items():
+        previousMeasurements = baseline["variants"].get(variant, {})
+        for key in LOWER_IS_BETTER:
+            current, previous = measurements[key], previousMeasurements.get(key)
+            if not previous:
+                continue
+
+            change = (current - previous) / previous
+            if change > threshold:
+                regressions.append(variant + ' ' + key + ': ' + str(round(previous, 4)) + ' -> ' + str(round(current, 4))
+                                   + ' (+' + str(round(change * 100, 1)) + '%)')
+
+    return regressions
+
+
+if __name__ == "__main__":
+    dictionary_file = postings_file = queries_file = output_file = baseline_file = None
+    runs = 10
+    threshold = 0.1  # largest tolerated relative change for the worse against the baseline
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:n:o:', ['baseline=', 'threshold='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-d':
+            dictionary_file = a
+        elif o == '-p':
+            postings_file = a
+        elif o == '-q':
+            queries_file = a
+        elif o == '-n':
+            runs = int(a)
+        elif o == '-o':
+            output_file = a
+        elif o == '--baseline':
+            baseline_file = a
+        elif o == '--threshold':
+            threshold = float(a)
+        else:
+            assert False, "unhandled option"
+
+    if dictionary_file == None or postings_file == None or queries_file == None or runs < 1:
+        usage()
+        sys.exit(2)
+
+    if Segments.hasSegments(dictionary_file) or ShardedIndex.isShardedIndex(dictionary_file):
+        print('segmented and sharded indexes are not supported')
+        sys.exit(2)
+
+    results = run_benchmark(dictionary_file, postings_file, queries_file, runs)
+    print(json.dumps(results, indent=2))
+    if output_file != None:
+        with open(output_file, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if baseline_file != None:
+        with open(baseline_file, 'r') as f:
+            regressions = findRegressions(results, json.load(f), threshold)
+        for regression in regressions:
+            print('regression: ' + regression)
+        if regressions:
+            sys.exit(1)
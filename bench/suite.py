@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+import os
+import sys
+import json
+import time
+import getopt
+import shutil
+import resource
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIRECTORY, '..'))
+
+import corpus
+
+LOWER_IS_BETTER = ('seconds', 'p50Ms', 'p95Ms', 'p99Ms', 'peakRSSBytes')
+HIGHER_IS_BETTER = ('qps',)
+
+
+def usage():
+    print("usage: " + sys.argv[0] + " -o output-json-file [-n sizes] [-s seed] [-Q number-of-queries] [-w working-directory] [-j workers]"
+          " [--engine exhaustive|maxscore|champions|champions-approximate|numpy] [--baseline json-file] [--threshold fraction]\n"
+          "sizes is a comma-separated list of numbers of documents, e.g. 10k,100k,1M (10k by default)")
+
+
+def getPeakRSS():
+    """
+    Returns the peak resident set size of the current process, in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # in kilobytes on Linux
+
+
+def percentile(values, fraction):
+    """
+    Returns the given percentile (as a fraction) of the given sorted values, by the nearest-rank method.
+    """
+    if not values:
+        return None
+
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values) + 0.5)) - 1))]
+
+
+def measureIndexing(in_file, out_dict, out_postings, workers):
+    """
+    Builds the index of the given corpus, and returns the time taken by each phase and the peak RSS of the process.
+    Runs in a process of its own, so that the peak RSS is that of indexing alone.
+    """
+    import index
+    from PhaseTimer import PhaseTimer
+
+    os.chdir(os.path.dirname(os.path.abspath(out_dict)))  # indexing writes its working files in the current directory
+    timer = PhaseTimer()
+    startTime = time.perf_counter()
+    index.build_index(in_file, out_dict, out_postings, workers=workers, saveStems=True, timer=timer)
+
+    return {"seconds": time.perf_counter() - startTime, "phases": timer.getTimings(), "peakRSSBytes": getPeakRSS(),
+            "dictionaryBytes": os.path.getsize(out_dict), "postingsBytes": os.path.getsize(out_postings)}
+
+
+def measureSearch(dict_file, postings_file, queries_file, engine):
+    """
+    Runs the given queries with search.run_search, and returns the latency percentiles, queries per second and the peak RSS of the process.
+    Runs in a process of its own, so that the peak RSS is that of search alone.
+    """
+    import search
+
+    startTime = time.perf_counter()
+    stats = search.run_search(dict_file, postings_file, queries_file, os.devnull, engine=engine)
+    elapsed = time.perf_counter() - startTime  # including loading the index
+    latencies = sorted(stats["latencies"])
+
+    return {"queries": stats["queries"], "seconds": elapsed, "qps": stats["queries"] / max(stats["seconds"], 1e-9),
+            "p50Ms": percentile(latencies, 0.50) * 1000, "p95Ms": percentile(latencies, 0.95) * 1000,
+            "p99Ms": percentile(latencies, 0.99) * 1000, "peakRSSBytes": getPeakRSS()}
+
+
+def runIsolated(function, *arguments):
+    """
+    Runs function(*arguments) in a new process (started fresh rather than forked, so it starts with nothing loaded) and returns its result.
+    """
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(function, *arguments).result()
+
+
+def getCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIRECTORY, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run_benchmark(sizes, out_file, seed=0, numberOfQueries=1000, workingDirectory=None, workers=1, engine='exhaustive'):
+    """
+    For each number of documents, generates a corpus and queries (see corpus.py, reused if already in the working directory),
+    indexes it and searches it, and writes all measurements to out_file as JSON. Returns the results.
+    """
+    temporaryDirectory = None
+    if workingDirectory is None:
+        workingDirectory = temporaryDirectory = tempfile.mkdtemp(prefix='bench')
+    workingDirectory = os.path.abspath(workingDirectory)
+    os.makedirs(workingDirectory, exist_ok=True)
+
+    results = {"commit": getCommit(), "python": platform.python_version(), "seed": seed, "engine": engine, "workers": workers, "sizes": {}}
+    try:
+        for numberOfDocs in sizes:
+            name = 'corpus-' + str(numberOfDocs) + '-' + str(seed)
+            corpusFile = os.path.join(workingDirectory, name + '.csv')
+            queriesFile = os.path.join(workingDirectory, name + '-' + str(numberOfQueries) + '.queries')
+            if not os.path.exists(corpusFile):
+                print('generating ' + str(numberOfDocs) + ' documents...')
+                corpus.generateCorpus(numberOfDocs, corpusFile + '.new', seed)
+                os.replace(corpusFile + '.new', corpusFile)
+            if not os.path.exists(queriesFile):
+                corpus.generateQueries(numberOfDocs, queriesFile, numberOfQueries, seed)
+
+            dictFile = os.path.join(workingDirectory, name + '.dict')
+            postingsFile = os.path.join(workingDirectory, name + '.post')
+            results["sizes"][str(numberOfDocs)] = {
+                "corpusBytes": os.path.getsize(corpusFile),
+                "index": runIsolated(measureIndexing, corpusFile, dictFile, postingsFile, workers),
+                "search": runIsolated(measureSearch, dictFile, postingsFile, queriesFile, engine),
+            }
+
+    finally:
+        if temporaryDirectory is not None:
+            shutil.rmtree(temporaryDirectory, ignore_errors=True)
+
+    with open(out_file, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    return results
+
+
+def findRegressions(results, baseline, threshold):
+    """
+    Compares the results of a run with those of a baseline run, and returns a description of each measurement
+    that is worse by more than the given fraction: times and memory that grew, or throughput that dropped.
+    Only sizes measured in both runs are compared.
+    """
+    regressions = []
+    for size, measurements in results["sizes"].items():
+        if size not in baseline["sizes"]:
+            continue
+
+        for part in ('index', 'search'):
+            current, previous = measurements[part], baseline["sizes"][size][part]
+            for key in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+                if key not in current or not previous.get(key):
+                    continue
+
+                change = (current[key] - previous[key]) / previous[key]
+                if (key in LOWER_IS_BETTER and change > threshold) or (key in HIGHER_IS_BETTER and -change > threshold):
+                    regressions.append(size + ' docs, ' + part + ' ' + key + ': ' + str(round(previous[key], 4)) + ' -> '
+                                       + str(round(current[key], 4)) + ' (' + ('+' if change >= 0 else '') + str(round(change * 100, 1)) + '%)')
+
+    return regressions
+
+
+if __name__ == "__main__":
+    output_file = baseline_file = working_directory = None
+    sizes = [10000]
+    seed = 0
+    number_of_queries = 1000
+    workers = 1
+    engine = 'exhaustive'
+    threshold = 0.1  # largest tolerated relative change for the worse against the baseline
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'o:n:s:Q:w:j:', ['engine=', 'baseline=', 'threshold='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-o':
+            output_file = a
+        elif o == '-n':
+            sizes = [corpus.parseCount(size) for size in a.split(',')]
+        elif o == '-s':
+            seed = int(a)
+        elif o == '-Q':
+            number_of_queries = int(a)
+        elif o == '-w':
+            working_directory = a
+        elif o == '-j':
+            workers = int(a)
+        elif o == '--engine':
+            engine = a
+        elif o == '--baseline':
+            baseline_file = a
+        elif o == '--threshold':
+            threshold = float(a)
+        else:
+            assert False, "unhandled option"
+
+    if output_file == None or engine not in ('maxscore', 'exhaustive', 'champions', 'champions-approximate', 'numpy'):
+        usage()
+        sys.exit(2)
+
+    results = run_benchmark(sizes, output_file, seed, number_of_queries, working_directory, workers, engine)
+    for size, measurements in results["sizes"].items():
+        print(size + ' docs: indexed in ' + str(round(measurements["index"]["seconds"], 2)) + 's, '
+              + str(round(measurements["search"]["qps"], 1)) + ' queries/sec, p50/p95/p99 '
+              + '/'.join(str(round(measurements["search"][key], 3)) for key in ('p50Ms', 'p95Ms', 'p99Ms')) + ' ms')
+
+    if baseline_file != None:
+        with open(baseline_file, 'r') as f:
+            regressions = findRegressions(results, json.load(f), threshold)
+        for regression in regressions:
+            print('regression: ' + regression)
+        if regressions:
+            sys.exit(1)
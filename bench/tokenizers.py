@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+import os
+import sys
+import json
+import time
+import getopt
+import difflib
+
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import Tokenizers
+
+from index import readDocuments
+
+
+def usage():
+    print("usage: " + sys.argv[0] + " -i input-csv-file [-n max-documents] [-m max-mismatches-shown] [--min-agreement fraction]")
+
+
+def run_benchmark(in_file, maxDocuments=None, maxMismatches=10, minAgreement=None):
+    """
+    Tokenizes the documents of the given corpus with every backend (see Tokenizers), and compares the regex backend to the NLTK one.
+    Reports the time taken by each, the fraction of documents tokenized identically, and the fraction of NLTK's tokens
+    (counted as a multiset per document) the regex backend also produces, with the most common differences.
+    Returns False if the token agreement is below minAgreement.
+    """
+    documents = []
+    for docID, content in readDocuments(in_file):
+        documents.append(content)
+        if maxDocuments is not None and len(documents) >= maxDocuments:
+            break
+
+    timings = {}
+    tokens = {}
+    for backend in Tokenizers.BACKENDS:
+        tokenize = Tokenizers.getTokenizer(backend)
+        tokenize("Warm up.")  # loads models, if any
+        start = time.perf_counter()
+        tokens[backend] = [tokenize(content) for content in documents]
+        timings[backend] = time.perf_counter() - start
+
+    identical = 0
+    shared = 0
+    total = 0
+    mismatches = Counter()  # {(tokens from NLTK, tokens from the regex backend in their place) : count, ...}
+    for expected, actual in zip(tokens['nltk'], tokens['regex']):
+        if expected == actual:
+            identical += 1
+
+        expectedCounts, actualCounts = Counter(expected), Counter(actual)
+        shared += sum((expectedCounts & actualCounts).values())
+        total += len(expected)
+        if expected != actual:
+            for operation, expectedStart, expectedEnd, actualStart, actualEnd in difflib.SequenceMatcher(None, expected, actual, False).get_opcodes():
+                if operation != 'equal':
+                    mismatches[(' '.join(expected[expectedStart:expectedEnd]), ' '.join(actual[actualStart:actualEnd]))] += 1
+
+    agreement = shared / total if total else 1
+    print(json.dumps({
+        "documents": len(documents),
+        "tokens": total,
+        "seconds": {backend: round(seconds, 4) for backend, seconds in timings.items()},
+        "speedup": round(timings['nltk'] / max(timings['regex'], 1e-9), 1),
+        "identicalDocuments": round(identical / len(documents), 4) if documents else 1,
+        "tokenAgreement": round(agreement, 6),
+        "commonMismatches": [[expectedTokens, actualTokens, count] for (expectedTokens, actualTokens), count in mismatches.most_common(maxMismatches)],
+    }, indent=2, ensure_ascii=False))
+
+    return minAgreement is None or agreement >= minAgreement
+
+
+if __name__ == "__main__":
+    input_file = None
+    max_documents = None
+    max_mismatches = 10
+    min_agreement = None
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'i:n:m:', ['min-agreement='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-i':
+            input_file = a
+        elif o == '-n':
+            max_documents = int(a)
+        elif o == '-m':
+            max_mismatches = int(a)
+        elif o == '--min-agreement':
+            min_agreement = float(a)
+        else:
+            assert False, "unhandled option"
+
+    if input_file == None:
+        usage()
+        sys.exit(2)
+
+    if not run_benchmark(input_file, max_documents, max_mismatches, min_agreement):
+        sys.exit(1)
@@ -1,46 +1,97 @@
 #!/usr/bin/python3
 import shutil
-import nltk
 import sys
 import getopt
 import os
 import pickle
 import math
 import csv
+import multiprocessing
+import queue
+import threading
+import subprocess
+import tempfile
+import time
+
+from array import array
+from collections import deque
+from contextlib import nullcontext
+
+import PostingsCodec
+import Segments
+import SearchBundle
+import Tokenizers
 
 from TermDictionary import TermDictionary
+from CompactTermDictionary import CompactTermDictionary
 from Node import Node
-from SPIMI import SPIMIInvert, binaryMerge
+from Normaliser import Normaliser
+from DocTableWriter import DocTableWriter
+from PostingsReader import PostingsReader
+from IndexHandle import IndexHandle
+from ShardedIndex import ShardedIndex
+from PhaseTimer import PhaseTimer
+from SPIMI import kWayMerge
+from SPIMIBlock import SPIMIBlock
 
 
-maxs = sys.maxsize
-while True:
-    try:
-        csv.field_size_limit(maxs)
-        break
-    except OverflowError:
-        maxs = int(maxs/10)
+normaliser = Normaliser()  # shared by all documents processed in this process
+phaseTimer = PhaseTimer(enabled=False)  # charged by the stages of indexing that run in this process (see build_index)
 
 
 def usage():
-    print("usage: " + sys.argv[0] + " -i input-file -d dictionary-file -p postings-file")
+    print("usage: " + sys.argv[0] + " -i input-file -d dictionary-file -p postings-file [--format binary|pickle] [-j workers] [--save-stems] [--block-memory bytes[K|M|G]] [--champions R]"
+          " [--dict-format pickle|compact] [--append [--no-compact]] [--merge-factor N] [--shards N] [--tokenizer nltk|regex] [--positional]"
+          " [--profile] [--stats-json file] [--trace-memory]\n"
+          "       " + sys.argv[0] + " -d dictionary-file -p postings-file --delete file-of-docIDs\n"
+          "       " + sys.argv[0] + " -d dictionary-file -p postings-file --compact [--merge-factor N] [--champions R] [--dict-format pickle|compact]"
+          " [--profile] [--stats-json file] [--trace-memory]")
 
 
-def build_index(in_file, out_dict, out_postings):
+def build_index(in_file, out_dict, out_postings, postingsFormat='binary', workers=1, saveStems=False, blockMemory=64 * 1024 * 1024,
+                championListSize=0, dictFormat='pickle', shard=None, timer=None, tokenizer=Tokenizers.DEFAULT_BACKEND, positional=False):
     """
     build index from documents stored in the input directory,
-    then output the dictionary file and postings file
+    then output the dictionary file and postings file.
+    postingsFormat is either 'binary' (see PostingsCodec) or 'pickle' (the legacy format of pickled Node lists).
+    Tokenization and stemming are spread over the given number of worker processes; the output does not depend on it.
+    If saveStems is True, the stemming cache is saved next to the dictionary file for search to load.
+    Documents are inverted into a SPIMI block as they are read, and the block is written to disk once its estimated size reaches blockMemory bytes.
+    If championListSize is positive (binary format only), a champion list of that many postings is also written for every term.
+    dictFormat is either 'pickle' (a pickled TermDictionary) or 'compact' (see CompactTermDictionary).
+    If shard is given as (shard number, number of shards), only the documents of that shard (see ShardedIndex.getShard) are indexed,
+    in working files of their own so that shards can be built at the same time.
+    If a PhaseTimer is given, the time taken is charged to the phases read (reading the csv file, in a thread of its own),
+    wait (waiting for documents to be read or tokenized), tokenize, stem (stemming and counting terms), weigh, invert (SPIMI inversion),
+    writeBlocks, merge (merging the blocks), writePostings, writeDictionary and writeBundle, with the bytes read and written by each.
+    With several workers, tokenize and stem add up the times of all worker processes.
+    tokenizer is the tokenizer backend (see Tokenizers); it is recorded in the dictionary, for search to tokenize queries with.
+    Indexes in the binary format also get a search bundle (see SearchBundle), which holds the stemming cache whether or not it is saved.
+    If positional is True (binary format only), the positions of every term in every document are also written into a positions file
+    (see PostingsCodec), for phrase queries and proximity boosts; a positions file of a previous index in these files is removed otherwise.
+    The index is written into <file>.new files, which replace out_postings (and its positions file), then out_dict, once all are whole.
     """
+    if positional and postingsFormat != 'binary':
+        raise ValueError("positional indexes must be in the binary format")
+
     print('indexing...')
 
+    global phaseTimer
+    normaliser.setTokenizer(tokenizer)
+
+    timer = phaseTimer = timer or PhaseTimer(enabled=False)
+    readTimer = PhaseTimer(timer.isEnabled())  # rows are read in a thread of its own
+
     tempFile = 'temp.txt'
     workingDirectory = "workingDirectory/"
-    limit = 1024  # max number of docs to be processed at any 1 time.
-    result = TermDictionary(out_dict)
-
-    file = open(in_file, 'r', encoding="utf8")
-    csvreader = csv.reader(file)
-    fields = next(csvreader)
+    if shard is not None:
+        tempFile = 'temp.shard' + str(shard[0]) + '.txt'
+        workingDirectory = "workingDirectory.shard" + str(shard[0]) + "/"
+    mergedDictionary = workingDirectory + 'mergedDictionaryFile.txt'  # pointers of the merged dictionary are into tempFile
+    newPostings = out_postings + '.new'  # replaces out_postings once written, so that a search server mapping the old file is unaffected
+    newPositions = PostingsCodec.getPositionsFile(newPostings) if positional else None
+    newDictionary = out_dict + '.new'  # replaces out_dict once written, after the postings and positions files
+    queueSize = 256  # max number of rows read ahead of tokenization
 
     # set up temp directory for SPIMI process
     if not os.path.exists(workingDirectory):
@@ -49,130 +100,901 @@ def build_index(in_file, out_dict, out_postings):
         shutil.rmtree(workingDirectory)  # delete the specified directory tree for re-indexing purposes
         os.mkdir(workingDirectory)
 
+    # indexing is a pipeline of generators: read rows -> tokenize + stem -> term weights -> SPIMI blocks.
+    # Rows are read ahead in a separate thread into a bounded queue, and tokenization keeps a bounded number of batches in flight,
+    # so memory does not grow with the size of the input file. Document metadata is spilled to disk as it is produced.
+    docTable = DocTableWriter(workingDirectory)
+    readTimer.countFileSizes('bytesRead', [in_file], 'read')
+    documents = readTimer.timeIterator('read', readDocuments(in_file))
+    if shard is not None:
+        documents = (document for document in documents if ShardedIndex.getShard(document[0], shard[1]) == shard[0])
+    documents = bufferedStage(documents, queueSize)
+    weightedDocuments = timer.timeIterator('weigh', weighDocuments(timer.timeIterator('wait', countTermsOfDocuments(documents, workers, positional))))
+    with timer.phase('invert'):
+        fileID = invertDocuments(weightedDocuments, workingDirectory, blockMemory, docTable, positional)
+        docTable.finish()
+    timer.addTimings(readTimer.getTimings())
+
+    # inverting done. Tons of dict files and postings files to merge
+    with timer.phase('merge'):
+        timer.countFileSizes('bytesRead', [workingDirectory + name + str(ID) + '_stage0.txt' for ID in range(fileID)
+                                           for name in ('tempPostingFile', 'tempDictionaryFile', 'tempPositionsFile')])
+        kWayMerge(workingDirectory, fileID, tempFile, mergedDictionary, newPositions)
+        timer.countFileSizes('bytesWritten', [tempFile, mergedDictionary] + ([newPositions] if positional else []))
+        result = TermDictionary(mergedDictionary)
+        result.load()
+        if docTable.getRepeatedDocIndices():  # their term frequencies add up across copies, so must their vector lengths
+            docTable.setVectorLengths(computeMergedVectorLengths(tempFile, result, docTable.getRepeatedDocIndices()))
+
+    with timer.phase('writePostings'):
+        if postingsFormat == 'pickle':
+            documents = list(docTable.readDocuments())  # [(docID, docLength, vectorLength), ...] in docIndex order
+            convertToPostingNodes(newPostings, tempFile, result, [document[0] for document in documents], [document[2] for document in documents])
+
+            # add docLengths into output postings file, and store a pointer in the resultant dictionary.
+            docLengths = {docID: docLength for docID, docLength, vectorLength in documents}  # {docID : length, docID2 : length, ...}
+            with open(newPostings, 'ab') as f:  # append to postings file
+                pointer = f.tell()
+                result.addPointerToDocLengths(pointer)
+                pickle.dump(docLengths, f)
+
+        else:
+            convertToBinaryPostings(newPostings, tempFile, result, docTable.getVectorLengths(), championListSize)
+
+            # add the document table into output postings file, and store a pointer in the resultant dictionary.
+            with open(newPostings, 'ab') as f:  # append to postings file
+                pointer = f.tell()
+                result.addPointerToDocLengths(pointer)
+                docTable.copyTo(f)
+        timer.countFileSizes('bytesRead', [tempFile])
+        timer.countFileSizes('bytesWritten', [newPostings])
+
+    with timer.phase('writeDictionary'):
+        result.setTokenizer(tokenizer)
+        if dictFormat == 'compact':
+            CompactTermDictionary.write(result, newDictionary)
+        else:
+            result.save(newDictionary)
+        timer.countFileSizes('bytesWritten', [newDictionary])
+
+        # every file of the new index is whole before any file of the old one is replaced, and the dictionary, which points into
+        # the others, is replaced last: a search opening the index sees the old or the new files, except in the moment between 2 replaces.
+        SearchBundle.remove(out_dict)  # the bundle of the index being replaced
+        os.replace(newPostings, out_postings)
+        if positional:
+            os.replace(newPositions, PostingsCodec.getPositionsFile(out_postings))
+        elif os.path.exists(PostingsCodec.getPositionsFile(out_postings)):  # positions of a previous index in these files
+            os.remove(PostingsCodec.getPositionsFile(out_postings))
+        os.replace(newDictionary, out_dict)
+        Segments.removeSegments(out_dict, keep=(out_dict, out_postings))  # segments of a previous index in these files
+        if shard is None:
+            ShardedIndex.removeShards(out_dict, keep=(out_dict, out_postings))  # shards of a previous index in these files
+
+    if saveStems:
+        normaliser.save(Normaliser.getStemsFile(out_dict))
+    if postingsFormat == 'binary':
+        writeBundle(out_dict, out_postings, normaliser.getEntries())
+    stats = normaliser.getStats()
+    print('stemming cache: ' + str(stats["hits"]) + ' hits, ' + str(stats["misses"]) + ' misses, '
+          + str(stats["entries"]) + ' entries, hit rate ' + str(round(stats["hitRate"], 4)))
+
+    os.remove(tempFile)
+    shutil.rmtree(workingDirectory, ignore_errors=True)
+
+
+def buildShards(in_file, out_dict, out_postings, numberOfShards, postingsFormat='binary', workers=1, saveStems=False, blockMemory=64 * 1024 * 1024,
+                championListSize=0, dictFormat='pickle', tokenizer=Tokenizers.DEFAULT_BACKEND, timer=None):
+    """
+    Builds an index split into the given number of shards (see ShardedIndex): each shard is indexed as build_index does,
+    from the documents whose docIDs hash to it, into <dictionary file>.shard<k> and <postings file>.shard<k>.
+    Shards are built by the given number of worker processes (each tokenizing in a single process).
+    The document frequencies of the whole collection are saved in out_dict, and the number of documents in the manifest.
+    The input file is read once, and split into an input file per shard (see splitShards), which its worker reads.
+    If a PhaseTimer is given, the phases of building each shard (see build_index) are added up, splitting the input file
+    is charged to the phase splitShards, and merging the shard dictionaries to the phase mergeShards.
+    """
+    timer = timer or PhaseTimer(enabled=False)
+    shardFiles = [ShardedIndex.getShardFiles(out_dict, out_postings, shardNumber) for shardNumber in range(numberOfShards)]
+    splitDirectory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(out_dict)))
+    with timer.phase('splitShards'):
+        shardInputFiles, shardPositions = splitShards(in_file, numberOfShards, splitDirectory)
+    allArguments = [(shardInputFile, shardDictFile, shardPostingsFile, (shardNumber, numberOfShards), postingsFormat, saveStems, blockMemory,
+                     championListSize, dictFormat, tokenizer, timer.isEnabled())
+                    for shardNumber, (shardInputFile, (shardDictFile, shardPostingsFile)) in enumerate(zip(shardInputFiles, shardFiles))]
+    if workers <= 1:
+        shardResults = [buildShard(arguments) for arguments in allArguments]
+
+    else:
+        with multiprocessing.Pool(min(workers, numberOfShards)) as pool:
+            shardResults = pool.map(buildShard, allArguments, chunksize=1)
+    shutil.rmtree(splitDirectory, ignore_errors=True)
+    for (shardDictFile, shardPostingsFile), positions in zip(shardFiles, shardPositions):
+        ShardedIndex.writePositions(shardDictFile, positions)
+
+    numbersOfDocs = [len(positions) for positions in shardPositions]
+    for timings in shardResults:
+        timer.addTimings(timings)
+
+    timer.start('mergeShards')
+    globalDictionary = TermDictionary(out_dict)
+    globalDictionary.setTokenizer(tokenizer)
+    stems = Normaliser()
+    for shardDictFile, shardPostingsFile in shardFiles:
+        dictionary = IndexHandle.loadDictionary(shardDictFile)
+        for term in dictionary.expandPrefix(''):
+            globalDictionary.addTerm(term, dictionary.getTermDocFrequency(term), -1)  # document frequencies add up across shards
+        stems.load(Normaliser.getStemsFile(shardDictFile))
+
+    Segments.removeSegments(out_dict)  # segments of a previous index in these files
+    if os.path.exists(PostingsCodec.getPositionsFile(out_postings)):  # positions of a previous index in these files
+        os.remove(PostingsCodec.getPositionsFile(out_postings))
+    ShardedIndex.removeShards(out_dict, keep=[file for shardDictFile, shardPostingsFile in shardFiles  # shards of a previous index, if more
+                                              for file in (shardDictFile, shardPostingsFile, ShardedIndex.getPositionsFile(shardDictFile),
+                                                           Normaliser.getStemsFile(shardDictFile))])
+    if dictFormat == 'compact':
+        CompactTermDictionary.write(globalDictionary, out_dict + '.new')
+    else:
+        globalDictionary.save(out_dict + '.new')
+    os.replace(out_dict + '.new', out_dict)  # a search opening the index meanwhile reads the old or the new dictionary, never part of one
+    if saveStems:
+        stems.save(Normaliser.getStemsFile(out_dict))
+    ShardedIndex.writeManifest(out_dict, shardFiles, sum(numbersOfDocs))
+    timer.stop()
+
+    print('indexed ' + str(sum(numbersOfDocs)) + ' documents into ' + str(numberOfShards) + ' shards')
+
+
+def splitShards(in_file, numberOfShards, directory):
+    """
+    Reads the input csv file once, and writes the rows of each shard (see ShardedIndex.getShard) into an input file of its own
+    in the given directory. Returns a tuple: ([input file of each shard, ...], [positions of the documents of each shard, ...]),
+    where the positions (an array of int64 per shard) are those of its documents among the documents of the input file,
+    in the order they first appear, as in the document table of the unsharded index.
+    """
+    shardInputFiles = [os.path.join(directory, 'shard' + str(shardNumber) + '.csv') for shardNumber in range(numberOfShards)]
+    shardPositions = [array('q') for _ in range(numberOfShards)]
+    seen = set()  # docIDs read so far; a repeated docID is in the same shard as its first copy
+    files = [open(shardInputFile, 'w', encoding="utf8", newline='') for shardInputFile in shardInputFiles]
+    try:
+        writers = [csv.writer(file) for file in files]
+        for writer in writers:
+            writer.writerow(['document_id', 'title', 'content'])  # the header, skipped by readDocuments
+
+        for docID, content in readDocuments(in_file):
+            shardNumber = ShardedIndex.getShard(docID, numberOfShards)
+            if docID not in seen:
+                shardPositions[shardNumber].append(len(seen))
+                seen.add(docID)
+            writers[shardNumber].writerow([docID, '', content])
+
+    finally:
+        for file in files:
+            file.close()
+
+    return shardInputFiles, shardPositions
+
+
+def buildShard(arguments):
+    """
+    Builds a shard of a sharded index from its input file (see splitShards).
+    Returns the timings of its phases (empty unless profiling).
+    """
+    in_file, shardDictFile, shardPostingsFile, shard, postingsFormat, saveStems, blockMemory, championListSize, dictFormat, tokenizer, profile = arguments
+    timer = PhaseTimer(profile)
+    build_index(in_file, shardDictFile, shardPostingsFile, postingsFormat, 1, saveStems, blockMemory, championListSize, dictFormat, shard,
+                timer, tokenizer)
+
+    return timer.getTimings()
+
+
+def appendDocuments(in_file, out_dict, out_postings, workers=1, saveStems=False, blockMemory=64 * 1024 * 1024, championListSize=0,
+                    dictFormat='pickle', tokenizer=None, timer=None, positional=None):
+    """
+    Indexes the documents in the input file into a new segment of the existing (binary format) index in out_dict and out_postings,
+    without reindexing the documents already in it (see Segments). Documents already in the index with the same docID are replaced:
+    their earlier copies are marked as deleted.
+    Documents are tokenized with the tokenizer backend of the existing index; a different one, if given, is an error.
+    The new segment is positional if the existing index is (see build_index); positional, if given, must agree.
+    """
+    if not Segments.hasSegments(out_dict) and not PostingsCodec.isBinaryPostingsFile(out_postings):  # segments are always binary
+        raise ValueError("documents can only be appended to indexes in the binary format")
+
+    manifest = Segments.loadManifest(out_dict)
+    firstDictFile, firstPostingsFile = Segments.getSegmentFiles(out_dict, manifest["segments"][0]) if manifest is not None else (out_dict, out_postings)
+    indexTokenizer = IndexHandle.loadDictionary(firstDictFile).getTokenizer()
+    if tokenizer is not None and tokenizer != indexTokenizer:
+        raise ValueError("the index was built with the " + indexTokenizer + " tokenizer, not " + tokenizer)
+    indexPositional = os.path.exists(PostingsCodec.getPositionsFile(firstPostingsFile))
+    if positional is not None and positional != indexPositional:
+        raise ValueError("the index is " + ("" if indexPositional else "not ") + "positional")
+
+    segmentDictFile, segmentPostingsFile = Segments.reserveSegmentFiles(out_dict, out_postings)
+    build_index(in_file, segmentDictFile, segmentPostingsFile, 'binary', workers, saveStems, blockMemory, championListSize, dictFormat,
+                timer=timer, tokenizer=indexTokenizer, positional=indexPositional)
+
+    segment = IndexHandle(segmentDictFile, segmentPostingsFile, cacheEntries=0)
+    docIDs = [segment.getDocID(docIndex) for docIndex in range(segment.getTotalNumberOfDocs())]
+    segment.close()
+
+    with Segments.lockManifest(out_dict):
+        manifest = Segments.loadOrCreateManifest(out_dict, out_postings)
+        replaced = deleteFromSegments(out_dict, manifest, set(docIDs))
+        Segments.addSegment(out_dict, manifest, segmentDictFile, segmentPostingsFile, len(docIDs))
+        Segments.saveManifest(out_dict, manifest)
+
+    print('appended ' + str(len(docIDs)) + ' documents (' + str(replaced) + ' replaced) as segment ' + segmentPostingsFile)
+
+
+def deleteDocuments(docIDsFile, out_dict, out_postings):
+    """
+    Marks the documents whose docIDs are listed in docIDsFile (one per line) as deleted from the index in out_dict and out_postings.
+    """
+    with open(docIDsFile, 'r') as f:
+        docIDs = {line.strip() for line in f if line.strip()}
+
+    with Segments.lockManifest(out_dict):
+        manifest = Segments.loadOrCreateManifest(out_dict, out_postings)
+        deleted = deleteFromSegments(out_dict, manifest, docIDs)
+        Segments.saveManifest(out_dict, manifest)
+
+    print('deleted ' + str(deleted) + ' documents')
+
+
+def deleteFromSegments(out_dict, manifest, docIDs):
+    """
+    Marks the live documents with the given docIDs as deleted in every segment of the manifest, and returns how many were.
+    """
+    numberDeleted = 0
+    for segment in manifest["segments"]:
+        indexHandle = IndexHandle(*Segments.getSegmentFiles(out_dict, segment), cacheEntries=0)
+        for docIndex in range(segment["numberOfDocs"]):
+            if indexHandle.getDocID(docIndex) in docIDs and not Segments.isDeleted(segment["deleted"], docIndex):
+                Segments.markDeleted(segment["deleted"], docIndex)
+                numberDeleted += 1
+        indexHandle.close()
+
+    return numberDeleted
+
+
+def compactSegments(out_dict, out_postings, mergeFactor=4, championListSize=0, dictFormat='pickle', timer=None):
+    """
+    Merges segments of the index in out_dict and out_postings by a size-tiered policy, until no segments are left to merge:
+    segments are put in tiers by their number of live documents (a tier per power of mergeFactor), and every run of at least
+    mergeFactor adjacent segments in the same tier is merged into one. A segment with more deleted than live documents is rewritten on its own.
+    Only adjacent segments are merged, so documents keep the order they were added in.
+    The manifest is locked while compacting; searches keep reading the old segments until they reopen the index.
+    If a PhaseTimer is given, merging is charged to the phase mergeSegments.
+    """
+    timer = timer or PhaseTimer(enabled=False)
+    with Segments.lockManifest(out_dict):
+        manifest = Segments.loadManifest(out_dict)
+        if manifest is None:
+            return
+
+        run = chooseSegmentsToMerge(manifest["segments"], mergeFactor)
+        while run is not None:
+            start, end = run
+            segments = manifest["segments"][start:end]
+            mergedDictFile, mergedPostingsFile = Segments.reserveSegmentFiles(out_dict, out_postings, manifest)
+            with timer.phase('mergeSegments'):
+                timer.countFileSizes('bytesRead', [file for segment in segments for file in Segments.getSegmentFiles(out_dict, segment)])
+                numberOfDocs = mergeSegments(out_dict, segments, mergedDictFile, mergedPostingsFile, championListSize, dictFormat)
+                timer.countFileSizes('bytesWritten', [mergedDictFile, mergedPostingsFile, PostingsCodec.getPositionsFile(mergedPostingsFile)])
+
+            manifest["segments"][start:end] = [Segments.makeSegment(out_dict, mergedDictFile, mergedPostingsFile, numberOfDocs)]
+            Segments.saveManifest(out_dict, manifest)
+            for segment in segments:
+                Segments.removeSegmentFiles(out_dict, segment)
+            print('merged ' + str(len(segments)) + ' segments into ' + mergedPostingsFile + ' (' + str(numberOfDocs) + ' documents)')
+
+            run = chooseSegmentsToMerge(manifest["segments"], mergeFactor)
+
+
+def chooseSegmentsToMerge(segments, mergeFactor):
+    """
+    Returns (start, end) of the first run of segments to merge together, or None if there is none.
+    """
+    tiers = [math.floor(math.log(max(Segments.getNumberOfLiveDocs(segment), 1), mergeFactor)) for segment in segments]
+    start = 0
+    for end in range(1, len(segments) + 1):
+        if end == len(segments) or tiers[end] != tiers[start]:
+            if end - start >= mergeFactor:
+                return start, end
+            start = end
+
+    for position, segment in enumerate(segments):
+        if Segments.getNumberOfLiveDocs(segment) * 2 < segment["numberOfDocs"]:  # mostly deleted
+            return position, position + 1
+
+    return None
+
+
+def mergeSegments(out_dict, segments, mergedDictFile, mergedPostingsFile, championListSize=0, dictFormat='pickle'):
+    """
+    This function merges the given segments of the index in out_dict into a single segment stored in the given files,
+    leaving out deleted documents, and returns its number of documents.
+    Like SPIMI.kWayMerge, it goes through the union of the terms of the segments in term order and concatenates their postings;
+    documents are renumbered in segment order. The merged segment is positional if all the given segments are.
+    """
+    workingDirectory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(mergedPostingsFile)))
+    indexHandles = [IndexHandle(*Segments.getSegmentFiles(out_dict, segment), cacheEntries=0) for segment in segments]
+
+    # new docIndex of every document of every segment, -1 for deleted documents
+    docTable = DocTableWriter(workingDirectory)
+    newDocIndices = []
+    for indexHandle, segment in zip(indexHandles, segments):
+        vectorLengths = indexHandle.getVectorLengths()
+        newDocIndices.append([-1 if Segments.isDeleted(segment["deleted"], docIndex) else
+                              docTable.addDocument(indexHandle.getDocID(docIndex), indexHandle.getDocLength(docIndex), vectorLengths[docIndex])
+                              for docIndex in range(segment["numberOfDocs"])])
+    docTable.finish()
+    vectorLengths = docTable.getVectorLengths()
+
+    termDictionary = TermDictionary(mergedDictFile)
+    termDictionary.setTokenizer(indexHandles[0].getDictionary().getTokenizer())
+    terms = set()
+    for indexHandle in indexHandles:
+        terms.update(indexHandle.getDictionary().expandPrefix(''))  # all terms
+    positional = all(indexHandle.hasPositions() for indexHandle in indexHandles)
+    newPositions = PostingsCodec.getPositionsFile(mergedPostingsFile + '.new')
+    positionsPointers = {}  # {term : pointer in the merged positions file, ...}
+
+    with open(mergedPostingsFile + '.new', 'wb') as output, (open(newPositions, 'wb') if positional else nullcontext()) as positionsOutput:
+        output.write(PostingsCodec.HEADER)
+        if positional:
+            positionsOutput.write(PostingsCodec.POSITIONS_HEADER)
+        for term in sorted(terms):
+            postings = []  # (docIndex, termFrequency) pairs, in docIndex order
+            positions = array('i')  # positions of the term in each of those documents, concatenated
+            for indexHandle, docIndices in zip(indexHandles, newDocIndices):
+                segmentPositions = indexHandle.getRawPositions(term) if positional else None
+                start = 0
+                for docIndex, termFrequency in zip(*indexHandle.getRawPostings(term)):
+                    if docIndices[docIndex] != -1:
+                        postings.append((docIndices[docIndex], termFrequency))
+                        if positional:
+                            positions.extend(segmentPositions[start:start + termFrequency])
+                    start += termFrequency
+
+            if postings:  # terms only found in deleted documents are dropped
+                termDictionary.addTerm(term, len(postings), -1)
+                writeBinaryPostings(output, term, postings, termDictionary, vectorLengths, championListSize)
+                if positional:
+                    positionsPointers[term] = positionsOutput.tell()
+                    PostingsCodec.writeRecord(positionsOutput, PostingsCodec.encodePositions([termFrequency for _, termFrequency in postings], positions))
+
+        termDictionary.addPointerToDocLengths(output.tell())
+        docTable.copyTo(output)
+        if positional:
+            PostingsCodec.writePositionsTable(positionsOutput, positionsPointers)
+
+    os.replace(mergedPostingsFile + '.new', mergedPostingsFile)
+    if positional:
+        os.replace(newPositions, PostingsCodec.getPositionsFile(mergedPostingsFile))
+    if dictFormat == 'compact':
+        CompactTermDictionary.write(termDictionary, mergedDictFile)
+    else:
+        termDictionary.save()
+
+    stemsFile = Normaliser.getStemsFile(Segments.getSegmentFiles(out_dict, segments[0])[0])
+    if os.path.exists(stemsFile):
+        shutil.copyfile(stemsFile, Normaliser.getStemsFile(mergedDictFile))
+    writeBundle(mergedDictFile, mergedPostingsFile)
+
+    for indexHandle in indexHandles:
+        indexHandle.close()
+    shutil.rmtree(workingDirectory, ignore_errors=True)
+
+    return docTable.getNumberOfDocs()
+
+
+def startBackgroundCompaction(out_dict, out_postings, mergeFactor=4, championListSize=0, dictFormat='pickle'):
+    """
+    Starts compactSegments in a separate process, which keeps running after this one exits.
+    """
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), '--compact', '-d', out_dict, '-p', out_postings,
+                      '--merge-factor', str(mergeFactor), '--champions', str(championListSize), '--dict-format', dictFormat],
+                     stdout=subprocess.DEVNULL, start_new_session=True)
+
+
+def writeBundle(out_dict, out_postings, stems=None):
+    """
+    Writes the search bundle (see SearchBundle) of the given index, with the given stemming cache entries, charged to the phase writeBundle.
+    """
+    with phaseTimer.phase('writeBundle'):
+        indexHandle = IndexHandle(out_dict, out_postings, cacheEntries=0)
+        SearchBundle.write(indexHandle, stems)
+        indexHandle.close()
+        phaseTimer.countFileSizes('bytesWritten', [SearchBundle.getBundleFile(out_dict)])
+
+
+def raiseFieldSizeLimit():
+    """
+    Raises the maximum size of a csv field as far as the platform allows, as some documents are very long.
+    """
+    maxs = sys.maxsize
+    while True:
+        try:
+            csv.field_size_limit(maxs)
+            break
+        except OverflowError:
+            maxs = int(maxs/10)
+
+
+def readDocuments(in_file):
+    """
+    First stage of indexing: yields (docID, content) for every row of the input csv file, one row at a time.
+    """
+    raiseFieldSizeLimit()
+
+    with open(in_file, 'r', encoding="utf8") as file:
+        csvreader = csv.reader(file)
+        fields = next(csvreader, None)  # skip the header
+
+        for row in csvreader:
+            yield row[0], row[2]
+
+
+def weighDocuments(termCounts):
+    """
+    Third stage of indexing: given (docID, countOfTerms, length, positionsOfTerms) for each document (from countTermsOfDocuments),
+    yields (docID, countOfTerms, length, vectorLength, positionsOfTerms), where vectorLength is the length of the document vector of term weights.
+    """
+    for docID, countOfTerms, length, positionsOfTerms in termCounts:
+        yield docID, countOfTerms, length, computeVectorLength(countOfTerms), positionsOfTerms
+
+
+def invertDocuments(weightedDocuments, workingDirectory, blockMemory, docTable, positional=False):
+    """
+    Last stage of indexing: adds each document from weighDocuments to the DocTableWriter docTable, which assigns it a dense internal ID
+    (its docIndex, 0 to N - 1), and inverts it under that ID into SPIMI blocks, writing each block into workingDirectory
+    once its estimated size reaches blockMemory bytes. Returns the number of blocks written.
+    If positional is True, the blocks also hold the positions of terms. The positions of a repeated docID are counted on
+    from the end of its earlier copies, as if they were one document.
+    """
     fileID = 0
     stageOfMerge = 0
-    count = 0
-    tokenStream = []
-    sortedDocIDs = []
-    docLengths = {}  # {docID : length, docID2 : length, ...}, to be added dumped into the postings file with its pointer stored in the final termDictionary file
-
-    for row in csvreader:
-        sortedDocIDs.append(row[0])
-        result = generateTokenStreamWithVectorLength(row[0], row[2])  # returns an array of terms present in that particular doc
-        tokenStream.extend(result[0])
-        docLengths[row[0]] = result[1]
-        count += 1
-
-        if count == limit:  # no. of docs == limit
-            outputPostingsFile = workingDirectory + 'tempPostingFile' + str(fileID) + '_stage' + str(stageOfMerge) + '.txt'
-            outputDictionaryFile = workingDirectory + 'tempDictionaryFile' + str(fileID) + '_stage' + str(stageOfMerge) + '.txt'
-            SPIMIInvert(tokenStream, outputPostingsFile, outputDictionaryFile)
+    block = SPIMIBlock(positional)
+    tokensSeen = array('i')  # number of tokens of each docIndex so far, when positional
+
+    for docID, countOfTerms, length, vectorLength, positionsOfTerms in weightedDocuments:
+        docIndex = docTable.addDocument(docID, length, vectorLength)  # a repeated docID keeps its first docIndex
+        if positional and docIndex < len(tokensSeen):  # a repeated docID
+            shift = tokensSeen[docIndex]
+            positionsOfTerms = {term: [position + shift for position in positions] for term, positions in positionsOfTerms.items()}
+            tokensSeen[docIndex] += length
+
+        elif positional:
+            tokensSeen.append(length)
+        block.addDocument(docIndex, countOfTerms, positionsOfTerms)  # invert the document into the current block
+
+        if block.getEstimatedSize() >= blockMemory:  # block has reached its memory budget
+            writeBlock(block, workingDirectory, fileID, stageOfMerge)
             fileID += 1
-            count = 0  # reset counter
-            tokenStream = []  # clear tokenStream
-    
-    if count > 0:  # in case the number of files isnt a multiple of the limit set
+            block = SPIMIBlock(positional)  # start a new block
+
+    if not block.isEmpty():  # in case the last block is under the budget
+        writeBlock(block, workingDirectory, fileID, stageOfMerge)
+        fileID += 1  # passed into k-way merge, which merges blocks 0 to fileID - 1
+
+    return fileID
+
+
+def writeBlock(block, workingDirectory, fileID, stageOfMerge):
+    """
+    Writes a SPIMI block into workingDirectory, under the names the merge expects.
+    """
+    with phaseTimer.phase('writeBlocks'):
         outputPostingsFile = workingDirectory + 'tempPostingFile' + str(fileID) + '_stage' + str(stageOfMerge) + '.txt'
         outputDictionaryFile = workingDirectory + 'tempDictionaryFile' + str(fileID) + '_stage' + str(stageOfMerge) + '.txt'
-        SPIMIInvert(tokenStream, outputPostingsFile, outputDictionaryFile)
-        fileID += 1  # passed into binary merge, and it will be for i in range(0, fileID, 2) --> will cover everything
+        outputPositionsFile = workingDirectory + 'tempPositionsFile' + str(fileID) + '_stage' + str(stageOfMerge) + '.txt'
+        block.write(outputPostingsFile, outputDictionaryFile, outputPositionsFile)
+        phaseTimer.countFileSizes('bytesWritten', [outputPostingsFile, outputDictionaryFile, outputPositionsFile])
 
-    file.close()
 
-    # inverting done. Tons of dict files and postings files to merge
-    binaryMerge(workingDirectory, fileID, tempFile, out_dict)
-    result = TermDictionary(out_dict)
-    result.load()
+def bufferedStage(iterable, maxSize):
+    """
+    Runs the given iterable (an upstream stage) in a separate thread, which stays at most maxSize items ahead of the consumer.
+    Yields the items of the iterable in order; an exception raised upstream is raised again in the consumer.
+    """
+    items = queue.Queue(maxSize)
+    end = object()  # marks the end of the stream
 
-    convertToPostingNodes(out_postings, tempFile, result)
-    
-    # add docLengths into output postings file, and store a pointer in the resultant dictionary.
-    with open(out_postings, 'ab') as f:  # append to postings file
-        pointer = f.tell()
-        result.addPointerToDocLengths(pointer)
-        pickle.dump(docLengths, f)
+    def produce():
+        try:
+            for item in iterable:
+                items.put(item)
+            items.put(end)
+        except BaseException as exception:
+            items.put((end, exception))
 
-    result.save()
+    threading.Thread(target=produce, daemon=True).start()
 
-    os.remove(tempFile)
-    shutil.rmtree(workingDirectory, ignore_errors=True)
+    while True:
+        item = items.get()
+        if item is end:
+            return
+        if isinstance(item, tuple) and len(item) == 2 and item[0] is end:
+            raise item[1]
+        yield item
 
 
-def generateTokenStreamWithVectorLength(docID, content):
+def normaliseWeight(weight, vectorLength):
     """
-    Given a document and the directory, return a tuple of 2 items: first is a list of (term, docID, weight, lengthofDocVector).
-    Second is the length of the document. 
+    Given a weight, divide it by the given vectorLength to normalise (as search.normaliseWeight does).
+    """
+    if vectorLength == 0: # avoids division by 0
+        return 0
+
+    else:
+        return weight / vectorLength
+
+
+def parseSize(size):
+    """
+    Parses a size in bytes with an optional K, M or G suffix (e.g. "512M") into a number of bytes.
+    """
+    multipliers = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    size = size.strip().upper()
+    if size and size[-1] in multipliers:
+        return int(float(size[:-1]) * multipliers[size[-1]])
+
+    return int(size)
+
+
+def generateTokenStreamWithVectorLength(docID, content, positional=False):
+    """
+    Given a document and the directory, return a tuple of 3 items: first is a list of (term, docID, termFrequency, weight, lengthofDocVector).
+    Second is the length of the document, and third is the length of the document vector.
     We apply case-folding + stemming to all tokens encountered.
     Weight of a term simply 1 + log10(termFrequency), with no idf component.
+    If positional is True, each item of the list also has the positions of the term in the document (see SPIMI.SPIMIInvert).
     """
-    stemmer = nltk.stem.porter.PorterStemmer()
+    countOfTerms, length, positionsOfTerms = countTerms(content, positional)
 
+    return generateTokenStreamFromTermCounts(docID, countOfTerms, length, positionsOfTerms)
+
+
+def countTerms(content, positional=False):
+    """
+    Given the content of a document, return a tuple of 3 items: first is a dictionary of {term : count, ...},
+    second is the length of the document, and third is None, or if positional is True, a dictionary of {term : [position, ...], ...}
+    where positions count the tokens of the document from 0. We apply case-folding + stemming to all tokens encountered.
+    This is the expensive part of indexing, and is what worker processes run.
+    """
     length = 0
     countOfTerms = {}  # will be in the form of {term1 : count, term2 : count, ...}
 
-    sentences = nltk.tokenize.sent_tokenize(content)
-    for sentence in sentences:
-        words = nltk.tokenize.word_tokenize(sentence)
-        for word in words:
-            length += 1
-            stemmedWord = stemmer.stem(word.lower())  # stemming + case-folding
+    phaseTimer.start('tokenize')
+    words = normaliser.tokenize(content)  # with the tokenizer backend of the index (see Tokenizers)
+    phaseTimer.stop()
+
+    if positional:
+        return countTermPositions(words)
+
+    phaseTimer.start('stem')
+    for word in words:
+        length += 1
+        stemmedWord = normaliser.normalise(word)  # stemming + case-folding, memoised
+
+        if stemmedWord in countOfTerms:
+            countOfTerms[stemmedWord] += 1
+
+        else:
+            countOfTerms[stemmedWord] = 1
+    phaseTimer.stop()
 
-            if stemmedWord in countOfTerms:
-                countOfTerms[stemmedWord] += 1
+    return countOfTerms, length, None
 
-            else:
-                countOfTerms[stemmedWord] = 1
 
+def countTermPositions(words):
+    """
+    Given the tokens of a document, returns the same tuple of 3 items as countTerms does with positional set.
+    """
+    positionsOfTerms = {}  # will be in the form of {term1 : [position, ...], term2 : [position, ...], ...}
+
+    phaseTimer.start('stem')
+    for position, word in enumerate(words):
+        stemmedWord = normaliser.normalise(word)  # stemming + case-folding, memoised
+
+        if stemmedWord in positionsOfTerms:
+            positionsOfTerms[stemmedWord].append(position)
+
+        else:
+            positionsOfTerms[stemmedWord] = [position]
+    phaseTimer.stop()
+
+    return {term: len(positions) for term, positions in positionsOfTerms.items()}, len(words), positionsOfTerms
+
+
+def generateTokenStreamFromTermCounts(docID, countOfTerms, length, positionsOfTerms=None):
+    """
+    Given the term counts of a document (and the positions of its terms, if any), return the same tuple of 3 items as generateTokenStreamWithVectorLength.
+    """
     weightOfTerms = {term: 1 + math.log10(value) for term, value in countOfTerms.items()}  # no idf
-    lengthOfDocVector = math.sqrt(sum([count**2 for count in weightOfTerms.values()]))
+    lengthOfDocVector = computeVectorLength(countOfTerms)
+
+    output = [(term, docID, countOfTerms[term], weight, lengthOfDocVector) for term, weight in weightOfTerms.items()]  # all terms in a particular document, and its associated term frequency, term weight, and length of vector
+    if positionsOfTerms is not None:
+        output = [token + (positionsOfTerms[token[0]],) for token in output]
 
-    output = [(term, docID, weight, lengthOfDocVector) for term, weight in weightOfTerms.items()]  # all terms in a particular document, and its associated term weight, and length of vector
+    return output, length, lengthOfDocVector  # returns a tuple: (a list of processed terms in the form of  [(term1, docID, termFreq, weight, docVectorLength), (term2, docID, termFreq, weight, docVectorLength), ...], length of document, length of document vector)
 
-    return output, length  # returns a tuple: (a list of processed terms in the form of  [(term1, docID, weight, docVectorLength), (term2, docID, docVectorLength), ...], length of document)
+
+def computeVectorLength(countOfTerms):
+    """
+    Given the term counts of a document, return the length of its vector of term weights (1 + log10(termFrequency), no idf).
+    """
+    return math.sqrt(sum([(1 + math.log10(count))**2 for count in countOfTerms.values()]))
+
+
+def computeMergedVectorLengths(file, termDictionary, docIndices):
+    """
+    Given the merged postings file and its dictionary, returns {docIndex : vector length, ...} of the given documents,
+    computed from their term frequencies in the merged postings as computeVectorLength does.
+    """
+    sumsOfSquares = dict.fromkeys(docIndices, 0)
+    with PostingsReader(file, maxEntries=0, decode=PostingsCodec.readPostings) as ref:
+        for term, termInfo in termDictionary.getTermDict().items():
+            if isinstance(termInfo, list):
+                termDocIndices, termFrequencies = ref.retrieve(termInfo[termDictionary.POINTERS_INDEX])
+                for docIndex, termFrequency in zip(termDocIndices, termFrequencies):
+                    if docIndex in sumsOfSquares:
+                        sumsOfSquares[docIndex] += (1 + math.log10(termFrequency))**2
+
+    return {docIndex: math.sqrt(sumOfSquares) for docIndex, sumOfSquares in sumsOfSquares.items()}
+
+
+def initialiseWorker(tokenizer, profile):
+    """
+    Run once in each worker process; sets the tokenizer backend of the main process,
+    and makes the worker's stemming cache remember its updates for the main process.
+    If profile is True, the worker times its phases, for the main process to add up.
+    """
+    global phaseTimer
+    normaliser.setTokenizer(tokenizer)
+    normaliser.setRecordUpdates(True)
+    phaseTimer = PhaseTimer(profile)
 
 
-def convertToPostingNodes(out_postings, file, termDictionary):
+def countTermsOfBatch(batch, positional=False):
+    """
+    Given a list of (docID, content), return a tuple of 3 items: first is a list of (docID, countOfTerms, length, positionsOfTerms) (see countTerms),
+    second is the updates of the worker's stemming cache while processing the batch (see Normaliser.takeUpdates),
+    and third is the timings of the worker's phases while processing it (see PhaseTimer.takeTimings).
+    Run by worker processes.
+    """
+    return [(docID,) + countTerms(content, positional) for docID, content in batch], normaliser.takeUpdates(), phaseTimer.takeTimings()
+
+
+def collectBatch(pendingBatch):
+    """
+    Waits for the result of a batch submitted to the pool, merges the worker's stemming cache updates into
+    the cache of this process (and its timings into those of this process), and returns the list of (docID, countOfTerms, length, positionsOfTerms).
+    """
+    results, updates, timings = pendingBatch.get()
+    normaliser.addUpdates(updates)
+    phaseTimer.addTimings(timings)
+    return results
+
+
+def countTermsOfDocuments(documents, workers, positional=False, batchSize=64):
+    """
+    Given an iterable of (docID, content), yields (docID, countOfTerms, length, positionsOfTerms) (see countTerms) for each document in the same order.
+    With more than 1 worker, batches of documents are sent to a process pool. At most 2 batches per worker are
+    in flight at any time, so that documents are not read much further ahead than they are consumed.
+    """
+    if workers <= 1:
+        for docID, content in documents:
+            yield (docID,) + countTerms(content, positional)
+        return
+
+    with multiprocessing.Pool(workers, initializer=initialiseWorker, initargs=(normaliser.getTokenizer(), phaseTimer.isEnabled())) as pool:
+        pending = deque()  # results of submitted batches, in submission order
+        batch = []
+        for document in documents:
+            batch.append(document)
+            if len(batch) == batchSize:
+                pending.append(pool.apply_async(countTermsOfBatch, (batch, positional)))
+                batch = []
+
+            if len(pending) >= 2 * workers:
+                yield from collectBatch(pending.popleft())
+
+        if batch:
+            pending.append(pool.apply_async(countTermsOfBatch, (batch, positional)))
+
+        while pending:
+            yield from collectBatch(pending.popleft())
+
+
+def convertToPostingNodes(out_postings, file, termDictionary, docIDs, vectorLengths):
     """
     We convert all postings in the postings file into Node objects,
     where each Node object stores a docID, the term frequency in document <docID>, 
     the term weight, and the vector length of document <docID>.
+    Postings refer to documents by docIndex; docIDs and vectorLengths are the columns of the document table, in docIndex order.
     These Node objects are saved into out_postings.
     """
-    with open(file, 'rb') as ref:
+    with PostingsReader(file, maxEntries=0, decode=PostingsCodec.readPostings) as ref:
         with open(out_postings, 'wb') as output:
 
             termDict = termDictionary.getTermDict()
             for term in termDict:
                 pointer = termDict[term][1]  # retrieves pointer associated to the term
-                ref.seek(pointer)
-                docIDsDict = pickle.load(ref)  # loads a dictionary of docIDs
+                docIndices, termFrequencies = ref.retrieve(pointer)  # loads the postings of the term
 
-                postingsNodes = [Node(docID, docIDsDict[docID][0], docIDsDict[docID][1], docIDsDict[docID][2]) for docID in docIDsDict] # create Nodes
+                postingsNodes = [Node(docIDs[docIndex], termFrequency, 1 + math.log10(termFrequency), vectorLengths[docIndex])
+                                 for docIndex, termFrequency in zip(docIndices, termFrequencies)] # create Nodes
                 newPointer = output.tell()  # new pointer location
                 pickle.dump(postingsNodes, output)
                 termDictionary.updatePointerToPostings(term, newPointer)  # term entry is now --> term : [docFreq, pointer]
 
 
-input_file = output_file_dictionary = output_file_postings = None
+def convertToBinaryPostings(out_postings, file, termDictionary, vectorLengths, championListSize=0):
+    """
+    We convert all postings in the postings file into the binary format of PostingsCodec,
+    where each posting stores the position of its document in the document table (as a gap) and the term frequency.
+    Term weights are recomputed from the term frequencies, and vector lengths are stored once in the document table.
+    The max score of each term (largest termWeight / vectorDocLength, computed exactly as search does) is stored in termDictionary.
+    If championListSize is positive, the championListSize postings of each term with the highest normalised term weights
+    are also written after its postings list, as its champion list.
+    """
+    with PostingsReader(file, maxEntries=0, decode=PostingsCodec.readPostings) as ref:
+        with open(out_postings, 'wb') as output:
+            output.write(PostingsCodec.HEADER)
+
+            termDict = termDictionary.getTermDict()
+            for term in termDict:
+                pointer = termDict[term][1]  # retrieves pointer associated to the term
+                docIndices, termFrequencies = ref.retrieve(pointer)  # loads the postings of the term
+
+                postings = list(zip(docIndices, termFrequencies))  # (docIndex, termFrequency) pairs
+                writeBinaryPostings(output, term, postings, termDictionary, vectorLengths, championListSize)
+
 
-try:
-    opts, args = getopt.getopt(sys.argv[1:], 'i:d:p:')
-except getopt.GetoptError:
-    usage()
-    sys.exit(2)
+def writeBinaryPostings(output, term, postings, termDictionary, vectorLengths, championListSize=0):
+    """
+    Writes the (docIndex, termFrequency) postings of a term in the binary format, with its champion list if championListSize is positive,
+    and stores its pointer and max score in termDictionary.
+    """
+    newPointer = output.tell()  # new pointer location
+    PostingsCodec.writeRecord(output, PostingsCodec.encodePostings(postings))
+    termDictionary.updatePointerToPostings(term, newPointer)
+    maxScore = max(normaliseWeight(1 + math.log10(termFrequency), vectorLengths[docIndex]) for docIndex, termFrequency in postings)
+    termDictionary.setTermMaxScore(term, maxScore)  # term entry is now --> term : [docFreq, pointer, maxScore]
 
-for o, a in opts:
-    if o == '-i': # input file
-        input_file = a
-    elif o == '-d': # dictionary file
-        output_file_dictionary = a
-    elif o == '-p': # postings file
-        output_file_postings = a
-    else:
-        assert False, "unhandled option"
+    if championListSize > 0:
+        writeChampionList(output, term, postings, termDictionary, vectorLengths, championListSize)
 
-if input_file == None or output_file_postings == None or output_file_dictionary == None:
-    usage()
-    sys.exit(2)
 
-build_index(input_file, output_file_dictionary, output_file_postings)
+def writeChampionList(output, term, postings, termDictionary, vectorLengths, championListSize):
+    """
+    Writes the champion list of a term: its championListSize (docIndex, termFrequency) postings with the highest normalised term weights,
+    and stores a pointer to it, with the highest normalised term weight among the other postings, in termDictionary.
+    A term with no more postings than championListSize uses its full postings list as its champion list.
+    """
+    if len(postings) <= championListSize:
+        termDictionary.setTermChampions(term, termDictionary.getTermPointer(term), 0)
+        return
+
+    # highest normalised term weight first, ties broken by docIndex
+    byImpact = sorted(postings, key=lambda posting: (-normaliseWeight(1 + math.log10(posting[1]), vectorLengths[posting[0]]), posting[0]))
+    tailDocIndex, tailTermFrequency = byImpact[championListSize]
+
+    championsPointer = output.tell()
+    PostingsCodec.writeRecord(output, PostingsCodec.encodePostings(byImpact[:championListSize]))  # stored by docIndex, like any postings list
+    termDictionary.setTermChampions(term, championsPointer, normaliseWeight(1 + math.log10(tailTermFrequency), vectorLengths[tailDocIndex]))
+
+
+if __name__ == "__main__":
+    input_file = output_file_dictionary = output_file_postings = None
+    postings_format = 'binary'
+    workers = 1
+    save_stems = False
+    block_memory = 64 * 1024 * 1024  # estimated memory of a SPIMI block before it is written to disk
+    champion_list_size = 0  # number of postings in the champion list of each term, none by default
+    dict_format = 'pickle'
+    append = False  # index the input file into a new segment of the existing index
+    compact = False  # only merge the segments of the existing index
+    background_compaction = True  # merge segments in the background after appending
+    merge_factor = 4  # number of segments of a size tier merged together
+    delete_file = None  # file of docIDs to delete from the existing index
+    shards = 1  # number of shards the index is split into
+    tokenizer = None  # tokenizer backend, Tokenizers.DEFAULT_BACKEND for new indexes and that of the existing index when appending
+    profile = False  # print the time, memory and I/O of each phase of indexing
+    stats_json = None  # file to write the measurements of each phase to, as JSON
+    trace_memory = False  # also measure the peak memory of each phase with tracemalloc, which slows indexing down several times
+    positional = False  # also store the positions of terms in documents, for phrase queries and proximity boosts
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'i:d:p:j:', ['format=', 'workers=', 'save-stems', 'block-memory=', 'champions=', 'dict-format=',
+                                                                  'append', 'no-compact', 'compact', 'merge-factor=', 'delete=', 'shards=',
+                                                                  'tokenizer=', 'profile', 'stats-json=',
+                                                                  'trace-memory', 'positional'])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-i': # input file
+            input_file = a
+        elif o == '-d': # dictionary file
+            output_file_dictionary = a
+        elif o == '-p': # postings file
+            output_file_postings = a
+        elif o == '--format': # postings format
+            postings_format = a
+        elif o in ('-j', '--workers'): # number of tokenization worker processes
+            workers = int(a)
+        elif o == '--save-stems': # save the stemming cache next to the dictionary file
+            save_stems = True
+        elif o == '--block-memory': # memory budget of a SPIMI block
+            block_memory = parseSize(a)
+        elif o == '--champions': # size of champion lists
+            champion_list_size = int(a)
+        elif o == '--dict-format': # dictionary format
+            dict_format = a
+        elif o == '--append': # add documents to the existing index
+            append = True
+        elif o == '--no-compact': # do not merge segments after appending
+            background_compaction = False
+        elif o == '--compact': # merge segments of the existing index
+            compact = True
+        elif o == '--merge-factor': # segments merged together by compaction
+            merge_factor = int(a)
+        elif o == '--delete': # delete documents from the existing index
+            delete_file = a
+        elif o == '--shards': # split the index into shards
+            shards = int(a)
+        elif o == '--tokenizer': # tokenizer backend
+            tokenizer = a
+        elif o == '--profile': # print the measurements of each phase
+            profile = True
+        elif o == '--stats-json': # write the measurements of each phase to a file
+            stats_json = a
+        elif o == '--trace-memory': # measure the peak memory of each phase
+            trace_memory = True
+        elif o == '--positional': # store the positions of terms
+            positional = True
+        else:
+            assert False, "unhandled option"
+
+    if (input_file == None and not compact and delete_file == None) or output_file_postings == None or output_file_dictionary == None \
+            or postings_format not in ('binary', 'pickle') or dict_format not in ('pickle', 'compact') or merge_factor < 2 or shards < 1 \
+            or tokenizer not in (None,) + Tokenizers.BACKENDS:
+        usage()
+        sys.exit(2)
+
+    if (append or compact or delete_file != None) and (shards > 1 or ShardedIndex.isShardedIndex(output_file_dictionary)):
+        print('sharded indexes can only be rebuilt from scratch')
+        sys.exit(2)
+
+    if positional and (postings_format != 'binary' or shards > 1):
+        print('positional indexes must be in the binary format, and cannot be sharded')
+        sys.exit(2)
+
+    timer = PhaseTimer(profile or stats_json != None or trace_memory, trace_memory)
+    startTime = time.perf_counter()
+    if delete_file != None:
+        deleteDocuments(delete_file, output_file_dictionary, output_file_postings)
+    elif compact:
+        compactSegments(output_file_dictionary, output_file_postings, merge_factor, champion_list_size, dict_format, timer)
+    elif append:
+        appendDocuments(input_file, output_file_dictionary, output_file_postings, workers, save_stems, block_memory, champion_list_size, dict_format,
+                        tokenizer, timer, positional or None)
+        if background_compaction:
+            startBackgroundCompaction(output_file_dictionary, output_file_postings, merge_factor, champion_list_size, dict_format)
+    elif shards > 1:
+        buildShards(input_file, output_file_dictionary, output_file_postings, shards, postings_format, workers, save_stems, block_memory,
+                    champion_list_size, dict_format, tokenizer or Tokenizers.DEFAULT_BACKEND, timer)
+    else:
+        build_index(input_file, output_file_dictionary, output_file_postings, postings_format, workers, save_stems, block_memory, champion_list_size,
+                    dict_format, timer=timer, tokenizer=tokenizer or Tokenizers.DEFAULT_BACKEND, positional=positional)
+    elapsed = time.perf_counter() - startTime
+
+    if profile:
+        print(timer.formatReport())
+    if stats_json != None:
+        timer.writeStats(stats_json, {"program": "index", "arguments": sys.argv[1:], "seconds": elapsed})
+    timer.close()
@@ -1,159 +1,540 @@
 #!/usr/bin/python3
-import nltk
+import os
 import sys
 import getopt
-import pickle
 import math
 import heapq
+import time
 
 from collections import Counter
-from Document import Document
-from TermDictionary import TermDictionary
+
+import SearchBundle
+import PhraseQueries
+
+from SegmentedIndexHandle import openIndexHandle
+from ShardedIndex import ShardedIndex
+from MaxScore import maxScoreTopK
+from ChampionLists import championsTopK
+from NumpyScoring import numpyTopK
+from SearchClient import SearchClient
+from ResultCache import ResultCache
+from Normaliser import Normaliser
+from PhaseTimer import PhaseTimer
 
 
 def usage():
-    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries -o output-file-of-results")
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -q file-of-queries -o output-file-of-results"
+          " [--cache-entries N] [--cache-bytes N] [--no-mmap] [--engine exhaustive|maxscore|champions|champions-approximate|numpy]"
+          " [--batch] [-j workers] [--server address] [--result-cache N] [--result-ttl seconds] [--proximity weight] [--profile] [--stats-json file] [--trace-memory]\n"
+          "queries can hold \"quoted phrases\", which only match on positional indexes (see index.py --positional), as do proximity boosts\n"
+          "with --server, a running search server answers from its own index and settings (see server.py); the index files are loaded only if none is running")
 
 
-def run_search(dict_file, postings_file, queries_file, results_file):
+def run_search(dict_file, postings_file, queries_file, results_file, cacheEntries=1024, cacheBytes=None, useMmap=True, engine='exhaustive',
+               batch=False, workers=1, resultCache=None, timer=None, proximity=0):
     """
     using the given dictionary file and postings file,
-    perform searching on the given queries file and output the results to a file
+    perform searching on the given queries file and output the results to a file.
+    engine is either 'exhaustive' (term-at-a-time over the full postings, the fastest on short queries),
+    'maxscore' (document-at-a-time with dynamic pruning, when the index has max scores),
+    'champions' (champion lists first, when the index has them), all of which return the same results,
+    or 'champions-approximate' (champion lists only), which may not.
+    'numpy' scores with vectorised NumPy operations over columnar postings, and may break near ties differently;
+    it falls back to 'exhaustive' if NumPy is not installed or the index is in the legacy format.
+    In batch mode, all queries are read first, the postings of their distinct terms are read once and held for the whole run,
+    and queries are scored by the given number of worker processes, which share the loaded index.
+    If a ResultCache is given, queries already answered with the same terms are not scored again.
+    On positional indexes, "quoted phrases" of queries must be found in the documents returned, and if proximity is positive,
+    scores are boosted by the proximity of query terms in documents (see PhraseQueries); both are ignored on other indexes.
+    Returns {"queries": number of queries, "seconds": time taken, "latencies": [seconds taken by each non-blank query, ...]},
+    with no latencies in batch mode, where queries are not answered one at a time.
+    If a PhaseTimer is given, the time taken is charged to the phases loadIndex, query, parseQuery (tokenizing, stemming and weighing queries),
+    scoring, postingsFetch (reading and decoding postings that are not cached), topK (for the exhaustive engine; the other engines
+    keep their top 10 while scoring), positions (reading positions and matching phrases) and writeResults, with the bytes read and written; in batch mode, pinning the postings of all
+    query terms is charged to pinPostings. The result then also has "queryRecords": a record of the latency and the counters
+    (e.g. postings decoded) of each non-blank query, unless in batch mode.
     """
     print('running search on the queries...')
 
-    dictFile = TermDictionary(dict_file)
-    dictFile.load()  # load term information into dictFile from dict_file
-
+    timer = timer or PhaseTimer(enabled=False)
+    with timer.phase('loadIndex'):
+        indexHandle = openIndexHandle(dict_file, postings_file, cacheEntries, cacheBytes, useMmap)  # loads the dictionary, N and the document length table once
+        bundleFile = SearchBundle.getBundleFile(dict_file)
+        timer.countFileSizes('bytesRead', [bundleFile] if os.path.exists(bundleFile) else [dict_file, Normaliser.getStemsFile(dict_file)])
+    indexHandle.setTimer(timer)
+    engine = chooseEngine(engine, indexHandle)
+    if proximity > 0 and not hasPositions(indexHandle):
+        print('proximity boosts need a positional index (index.py --positional), ignored')
+
+    startTime = time.time()
     with open(queries_file, 'r') as queryFile:
         with open(results_file, 'w') as resultFile:
-            allResults = []
+            if batch:
+                allResults = searchBatch(list(queryFile), indexHandle, engine, workers, resultCache, proximity)
+                latencies = []
+
+            else:
+                allResults = []
+                latencies = []
+                queryRecords = []
+
+                for query in queryFile:
+                    if query.strip():
+                        counters = timer.getCounters() if timer.isEnabled() else None
+                        queryStartTime = time.perf_counter()
+                        with timer.phase('query'):
+                            result = cosineScores(query, indexHandle, engine, resultCache, proximity)
+                        latencies.append(time.perf_counter() - queryStartTime)
+                        allResults.append(result)
+                        if counters is not None:
+                            queryRecords.append(getQueryRecord(len(allResults) - 1, latencies[-1], counters, timer.getCounters()))
+
+                    else:
+                        allResults.append("")
+
+            with timer.phase('writeResults'):
+                outputResult = "\n".join(allResults) # to output all result onto a new line.
+                resultFile.write(outputResult)
+    timer.countFileSizes('bytesWritten', [results_file], 'writeResults')
+
+    elapsed = time.time() - startTime
+    print(str(len(allResults)) + ' queries in ' + str(round(elapsed, 3)) + 's (' + str(round(len(allResults) / max(elapsed, 1e-9), 1)) + ' queries/sec)')
+
+    stats = indexHandle.getCacheStats()
+    print('postings cache: ' + str(stats["hits"]) + ' hits, ' + str(stats["misses"]) + ' misses, '
+          + str(stats["entries"]) + ' entries (' + str(stats["bytes"]) + ' bytes)')
+    stats = indexHandle.getNormaliser().getStats()
+    print('stemming cache: ' + str(stats["hits"]) + ' hits, ' + str(stats["misses"]) + ' misses, '
+          + str(stats["entries"]) + ' entries, hit rate ' + str(round(stats["hitRate"], 4)))
+    if resultCache is not None:
+        stats = resultCache.getStats()
+        print('result cache: ' + str(stats["hits"]) + ' hits, ' + str(stats["misses"]) + ' misses, '
+              + str(stats["entries"]) + ' entries, hit rate ' + str(round(stats["hitRate"], 4)))
+    indexHandle.close()
+
+    stats = {"queries": len(allResults), "seconds": elapsed, "latencies": latencies}
+    if timer.isEnabled() and not batch:
+        stats["queryRecords"] = queryRecords
+
+    return stats
+
+
+def getQueryRecord(position, latency, countersBefore, countersAfter):
+    """
+    Returns the record of a query: its position in the queries file, its latency in milliseconds,
+    and how much each counter of the PhaseTimer (e.g. postingsDecoded, bytesRead) grew while it was answered.
+    """
+    record = {"query": position, "ms": latency * 1000}
+    for counter, value in countersAfter.items():
+        record[counter] = value - countersBefore.get(counter, 0)
+
+    return record
+
+
+def run_search_on_server(address, queries_file, results_file, dict_file=None, postings_file=None, engine=None, proximity=None, localOptions=()):
+    """
+    Sends the queries in the given queries file to the search server at the given address (see SearchServer),
+    and outputs the results to a file as run_search does. Returns False, without writing results, if no server can be reached.
+    The server answers from its own index and settings: a warning is printed for each of the given index files, engine and
+    proximity weight (None if not given) that the server does not use, and for the given options (e.g. '--result-cache') that only apply to local search.
+    """
+    try:
+        client = SearchClient(address)
+    except OSError:
+        return False
+
+    stats = client.getStats()
+    expected = {"dictionary": os.path.abspath(dict_file) if dict_file != None else None,
+                "postings": os.path.abspath(postings_file) if postings_file != None else None,
+                "engine": engine, "proximity": proximity}
+    for setting, value in expected.items():
+        if value != None and stats.get(setting) != value:
+            print('warning: the server at ' + address + ' uses ' + setting + ' ' + str(stats.get(setting)) + ', not ' + str(value)
+                  + ' (set by server.py)')
+    if localOptions:
+        print('warning: ' + ', '.join(localOptions) + ' only apply to local search, and are ignored by the server at ' + address)
 
-            for query in queryFile:
-                if query.strip():
-                    result = cosineScores(query, dictFile, postings_file)
-                    allResults.append(result)
+    print('running search on the queries with the server at ' + address + '...')
 
-                else:
-                    allResults.append("")
+    startTime = time.time()
+    with client, open(queries_file, 'r') as queryFile:
+        allResults = [client.search(query) if query.strip() else "" for query in queryFile]
 
-            outputResult = "\n".join(allResults) # to output all result onto a new line.
-            resultFile.write(outputResult)
+    with open(results_file, 'w') as resultFile:
+        resultFile.write("\n".join(allResults)) # to output all result onto a new line.
 
+    elapsed = time.time() - startTime
+    print(str(len(allResults)) + ' queries in ' + str(round(elapsed, 3)) + 's (' + str(round(len(allResults) / max(elapsed, 1e-9), 1)) + ' queries/sec)')
+    return True
 
-def retrievePostingsList(file, pointer):
+
+def chooseEngine(engine, indexHandle):
     """
-    Given a pointer to determine the location in disk, 
-    retrieves the postings list from that location.
+    Returns the engine to use for the given index: the requested one, or 'exhaustive' if the 'numpy' engine cannot be used.
     """
-    if pointer == -1:  # for non-existent terms
-        return []
+    if engine == 'numpy' and not indexHandle.supportsNumpy():
+        print('numpy engine unavailable (NumPy not installed, or legacy index), using exhaustive')
+        return 'exhaustive'
+
+    return engine
 
-    with open(file, 'rb') as f:
-        f.seek(pointer)
-        postingsList = pickle.load(f)
 
-    return postingsList
+def hasPositions(indexHandle):
+    """
+    Returns True if the given index can match phrases and boost proximity: it stores positions, and is not sharded.
+    """
+    return not isinstance(indexHandle, ShardedIndex) and indexHandle.hasPositions()
 
 
-def cosineScores(query, dictionary, postingsFile):
+def cosineScores(query, indexHandle, engine='exhaustive', resultCache=None, proximity=0):
     """
     Implementation of CosineScore(q) from the textbook.
+    Scores are accumulated sparsely, so only documents that contain at least one query term are held.
+    With engine 'maxscore', the top 10 are found document-at-a-time with MaxScore pruning instead, if the index supports it.
+    With engine 'champions', champion lists are scored first, and the full postings only if the top 10 is not provably settled by them;
+    with 'champions-approximate', only champion lists are scored. With engine 'numpy', scores are accumulated into a dense NumPy array.
+    If a ResultCache is given, the result is looked up there first, and added to it once computed.
+    Quoted phrases and proximity boosts are applied to the top documents on positional indexes (see PhraseQueries).
+    """
+    timer = indexHandle.getTimer()
+    timer.start('parseQuery')
+    query, phraseTexts = PhraseQueries.splitPhrases(query)
+    termFrequencies = computeQueryTermFrequencies(query, indexHandle)
+    qTokenNormalisedWeights = computeQueryWeightsFromFrequencies(termFrequencies, indexHandle)
+    phrases = computeQueryPhrases(phraseTexts, indexHandle)
+    timer.stop()
+    if resultCache is None:
+        return rankDocuments(qTokenNormalisedWeights, indexHandle, engine, phrases, proximity)
+
+    key = ResultCache.getQueryKey(termFrequencies, qTokenNormalisedWeights, engine, phrases, proximity)
+    result = resultCache.get(indexHandle.getVersion(), key)
+    if result is None:
+        result = rankDocuments(qTokenNormalisedWeights, indexHandle, engine, phrases, proximity)
+        resultCache.put(indexHandle.getVersion(), key, result)
+
+    return result
+
+
+def rankDocuments(qTokenNormalisedWeights, indexHandle, engine='exhaustive', phrases=(), proximity=0):
+    """
+    Given the normalised query weights {term : weight, ...} of a query, returns its top 10 docIDs as a space-separated string.
+    On positional indexes, only documents holding all the given phrases (tuples of terms) are returned,
+    with scores boosted by the proximity of query terms if proximity is positive.
     """
-    stemmer = nltk.stem.porter.PorterStemmer()
-    totalNumberOfDocs = len(retrievePostingsList(postingsFile, dictionary.getPointerToDocLengths()))
-    result = dict.fromkeys(retrievePostingsList(postingsFile, dictionary.getPointerToDocLengths()).keys(), 0) # in the form of {docID : 1, docID2 : 0.2, ...}
+    with indexHandle.getTimer().phase('scoring'):
+        if isinstance(indexHandle, ShardedIndex):
+            topDocuments = indexHandle.rankQueries([qTokenNormalisedWeights], engine)[0]
 
-    queryTokens = [stemmer.stem(token.lower()) for token in query.split()]
-    qTokenFrequency = Counter(queryTokens) # qTokenFrequency will be in the form of {"the": 2, "and" : 1} if the query is "the and the".
-    qToken_tfidfWeights = {term : computeTFIDF(term, frequency, dictionary, totalNumberOfDocs) for term, frequency in qTokenFrequency.items()}
-    queryLength = math.sqrt(sum([math.pow(weight, 2) for weight in qToken_tfidfWeights.values()]))
-    qTokenNormalisedWeights = {term : normaliseWeight(weight,queryLength) for term, weight in qToken_tfidfWeights.items()}
+        elif (phrases or proximity > 0) and hasPositions(indexHandle):
+            topDocuments = PhraseQueries.positionalTopK(qTokenNormalisedWeights, phrases, proximity, indexHandle,
+                                                        lambda k: rankTopDocuments(qTokenNormalisedWeights, indexHandle, engine, k))
+
+        else:
+            topDocuments = rankTopDocuments(qTokenNormalisedWeights, indexHandle, engine)
+
+    if isinstance(indexHandle, ShardedIndex):
+        return " ".join([docID for score, docID in topDocuments])
+
+    return " ".join([indexHandle.getDocID(docIndex) for score, docIndex in topDocuments])
+
+
+def rankTopDocuments(qTokenNormalisedWeights, indexHandle, engine='exhaustive', k=10):
+    """
+    Given the normalised query weights {term : weight, ...} of a query, returns its top k documents as a list of (score, docIndex) pairs, best first.
+    """
+    if engine == 'numpy' and indexHandle.supportsNumpy():
+        return numpyTopK(qTokenNormalisedWeights, indexHandle, k)
+
+    if engine in ('champions', 'champions-approximate') and indexHandle.hasChampions():
+        output = championsTopK(qTokenNormalisedWeights, indexHandle, k, engine == 'champions-approximate')
+        if output is not None:
+            return output
+
+        engine = 'maxscore'  # not provably settled, score the full postings
+
+    if engine == 'maxscore' and indexHandle.hasMaxScores():
+        return maxScoreTopK(qTokenNormalisedWeights, indexHandle, k)
+
+    vectorLengths = indexHandle.getVectorLengths()
+    result = {} # in the form of {docIndex : 1, docIndex2 : 0.2, ...}, for documents touched by the query only
  
     for term in qTokenNormalisedWeights.keys():
-        pointer = dictionary.getTermPointer(term)
-        postings = retrievePostingsList(postingsFile, pointer) # in the form of (docID, TermFreq, skipPointer (to be discarded))
-
-        for node in postings:
-            docID = node.getDocID()
-            termWeight = node.getTermWeight()
-            docVectorLength = node.getVectorDocLength()
-            result[docID] += normaliseWeight(qTokenNormalisedWeights[term] * termWeight,  docVectorLength) # update with normalised score
+        docIndices, termWeights = indexHandle.getPostings(term) # parallel lists of docIndices and their term weights
+
+        for docIndex, termWeight in zip(docIndices, termWeights):
+            result[docIndex] = result.get(docIndex, 0) + normaliseWeight(qTokenNormalisedWeights[term] * termWeight, vectorLengths[docIndex]) # update with normalised score
     
     # documents and their weights are now settled.
 
-    documentObjects = generateDocumentObjects(result)
-    output = extractTop10(documentObjects)
+    with indexHandle.getTimer().phase('topK'):
+        return extractTop10(result, k)
 
-    return " ".join([str(document) for document in output])
 
-def normaliseWeight(weight, vectorLength):
+searchHandle = None  # IndexHandle of a batch worker process, inherited from the parent when processes are forked
+searchEngine = None
+searchProximity = 0
+
+
+def searchBatch(queries, indexHandle, engine, workers, resultCache=None, proximity=0):
     """
-    Given a weight, divide it by the given vectorLength to normalise.
+    Scores all the given queries, and returns their results in the same order (an empty string for blank queries).
+    The postings of all distinct query terms are pinned in memory first. With more than 1 worker, queries are scored
+    in a process pool: forked workers inherit the loaded index and pinned postings (the postings file being memory-mapped),
+    while workers on platforms without fork load their own copy.
+    If a ResultCache is given, only queries missing from it are scored (once per key), and their results are added to it.
     """
-    if vectorLength == 0: # avoids division by 0
-        return 0
+    allQueries = []  # (normalised query weights, phrases) of the queries to score
+    positions = []  # positions of each of those queries in the input
+    results = [""] * len(queries)
+    keys = {}  # {key : index in allQueries, ...}
+    timer = indexHandle.getTimer()
+    timer.start('parseQuery')
+    for position, query in enumerate(queries):
+        if not query.strip():  # blank query
+            continue
+
+        query, phraseTexts = PhraseQueries.splitPhrases(query)
+        termFrequencies = computeQueryTermFrequencies(query, indexHandle)
+        weights = computeQueryWeightsFromFrequencies(termFrequencies, indexHandle)
+        phrases = computeQueryPhrases(phraseTexts, indexHandle)
+        if resultCache is None:
+            allQueries.append((weights, phrases))
+            positions.append([position])
+            continue
+
+        key = ResultCache.getQueryKey(termFrequencies, weights, engine, phrases, proximity)
+        if key in keys:  # already missed in this batch, answered by the same scoring
+            resultCache.recordHit()
+            positions[keys[key]].append(position)
+            continue
+
+        results[position] = resultCache.get(indexHandle.getVersion(), key)
+        if results[position] is None:
+            keys[key] = len(allQueries)
+            allQueries.append((weights, phrases))
+            positions.append([position])
+    timer.stop()
+
+    with timer.phase('scoring'):
+        batchResults = scoreBatch(allQueries, indexHandle, engine, workers, proximity)
+    for positionsOfQuery, result in zip(positions, batchResults):
+        for position in positionsOfQuery:
+            results[position] = result
+
+    if resultCache is not None:
+        for key, index in keys.items():
+            resultCache.put(indexHandle.getVersion(), key, results[positions[index][0]])
+
+    return results
+
+
+def scoreBatch(allQueries, indexHandle, engine, workers, proximity=0):
+    """
+    Given the normalised query weights and phrases of a list of queries, returns their results in the same order.
+    """
+    global searchHandle, searchEngine, searchProximity
+    if isinstance(indexHandle, ShardedIndex):  # shards are scored by processes of their own, without positions
+        return [" ".join([docID for score, docID in result]) for result in indexHandle.rankQueries([weights for weights, _ in allQueries], engine)]
+
+    with indexHandle.getTimer().phase('pinPostings'):
+        indexHandle.pinPostings({term for weights, _ in allQueries for term in weights}, engine == 'numpy')
+
+    if workers <= 1 or not allQueries:
+        return [rankDocuments(weights, indexHandle, engine, phrases, proximity) for weights, phrases in allQueries]
+
+    import multiprocessing  # imported here, as it slows down starting searches that do not need it
+    from concurrent.futures import ProcessPoolExecutor
+
+    searchHandle, searchEngine, searchProximity = indexHandle, engine, proximity
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context, initArgs = multiprocessing.get_context('fork'), None
 
     else:
-        return weight / vectorLength
+        context = multiprocessing.get_context()
+        initArgs = indexHandle.getOpenArguments() + (engine, proximity)
 
+    chunkSize = max(1, len(allQueries) // (workers * 4))
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=initialiseSearchWorker, initargs=(initArgs,)) as executor:
+        return list(executor.map(rankBatchQuery, allQueries, chunksize=chunkSize))  # map returns results in input order
 
-def computeTFIDF(term, frequency, dictionary, totalNumberOfDocs):
+
+def initialiseSearchWorker(initArgs):
     """
-    Takes in a term and computes the tf-idf of a term.
+    Loads the index in a batch worker process, unless it was inherited from the parent (initArgs is None).
     """
-    df = dictionary.getTermDocFrequency(term)
-    if (frequency == 0 or df == 0):
-        return 0
-    else:
-        return (1 + math.log10(frequency)) * math.log10(totalNumberOfDocs/dictionary.getTermDocFrequency(term))
+    global searchHandle, searchEngine, searchProximity
+    if initArgs is not None:
+        dictFile, postingsFile, cacheEntries, cacheBytes, useMmap, searchEngine, searchProximity = initArgs
+        searchHandle = openIndexHandle(dictFile, postingsFile, cacheEntries, cacheBytes, useMmap)
+
 
+def rankBatchQuery(query):
+    weights, phrases = query
+    return rankDocuments(weights, searchHandle, searchEngine, phrases, searchProximity)
 
-def generateDocumentObjects(result):
+
+def computeQueryWeights(query, indexHandle):
     """
-    Takes in a dictionary of docID-score pairs and create
-    a list of Document objects.
+    Given a query, returns the normalised tf-idf weight of each of its terms, in the form of {term : weight, ...} in query order.
     """
-    output = []
-    for docID, weight in result.items():
-        output.append(Document(docID, weight))
+    return computeQueryWeightsFromFrequencies(computeQueryTermFrequencies(query, indexHandle), indexHandle)
 
-    return output
 
-def extractTop10(documentObjects):
+def computeQueryTermFrequencies(query, indexHandle):
     """
-    Takes in a list of Document objects and extracts 10 highest scoring documents.
-    Less than 10 Document objects will be outputted if there are documents with score = 0
-    amongst the supposed 10 highest.
+    Given a query, returns the frequency of each of its (stemmed, case-folded) terms, in the form of {term : frequency, ...} in query order.
+    The query is tokenized with the tokenizer backend the index was built with.
     """
+    normaliser = indexHandle.getNormaliser()
+    queryTokens = [normaliser.normalise(token) for token in normaliser.tokenize(query)] # stemming + case-folding, memoised
 
-    temp = heapq.nlargest(10, documentObjects) # a list of 10 highest scoring document
+    return Counter(queryTokens) # will be in the form of {"the": 2, "and" : 1} if the query is "the and the".
 
-    return filter(lambda document : (document.getWeight() > 0), temp)
 
+def computeQueryPhrases(phraseTexts, indexHandle):
+    """
+    Given the texts of the quoted phrases of a query, returns their (stemmed, case-folded) terms as a tuple of distinct tuples, in query order.
+    Phrases of less than 2 terms are left out, as their terms are already query terms.
+    """
+    normaliser = indexHandle.getNormaliser()
+    phrases = []
+    for text in phraseTexts:
+        phrase = tuple(normaliser.normalise(token) for token in normaliser.tokenize(text))
+        if len(phrase) > 1 and phrase not in phrases:
+            phrases.append(phrase)
+
+    return tuple(phrases)
 
-dictionary_file = postings_file = file_of_queries = output_file_of_results = None
 
-try:
-    opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:')
-except getopt.GetoptError:
-    usage()
-    sys.exit(2)
+def computeQueryWeightsFromFrequencies(qTokenFrequency, indexHandle):
+    """
+    Given the term frequencies of a query, returns the normalised tf-idf weight of each of its terms, in the form of {term : weight, ...}.
+    """
+    dictionary = indexHandle.getDictionary()
+    totalNumberOfDocs = indexHandle.getTotalNumberOfDocs()
+
+    qToken_tfidfWeights = {term : computeTFIDF(term, frequency, dictionary, totalNumberOfDocs) for term, frequency in qTokenFrequency.items()}
+    queryLength = math.sqrt(sum([math.pow(weight, 2) for weight in qToken_tfidfWeights.values()]))
+
+    return {term : normaliseWeight(weight,queryLength) for term, weight in qToken_tfidfWeights.items()}
+
+
+def normaliseWeight(weight, vectorLength):
+    """
+    Given a weight, divide it by the given vectorLength to normalise.
+    """
+    if vectorLength == 0: # avoids division by 0
+        return 0
 
-for o, a in opts:
-    if o == '-d':
-        dictionary_file  = a
-    elif o == '-p':
-        postings_file = a
-    elif o == '-q':
-        file_of_queries = a
-    elif o == '-o':
-        file_of_output = a
     else:
-        assert False, "unhandled option"
+        return weight / vectorLength
 
-if dictionary_file == None or postings_file == None or file_of_queries == None or file_of_output == None :
-    usage()
-    sys.exit(2)
 
-run_search(dictionary_file, postings_file, file_of_queries, file_of_output)
+def computeTFIDF(term, frequency, dictionary, totalNumberOfDocs):
+    """
+    Takes in a term and computes the tf-idf of a term.
+    """
+    df = dictionary.getTermDocFrequency(term)
+    if (frequency == 0 or df == 0):
+        return 0
+    else:
+        return (1 + math.log10(frequency)) * math.log10(totalNumberOfDocs/dictionary.getTermDocFrequency(term))
+
+
+def extractTop10(result, k=10):
+    """
+    Takes in a dictionary of docIndex-score pairs and extracts the 10 (or k) highest scoring documents, as (score, docIndex) pairs, best first.
+    The heap holds (score, -docIndex) pairs, so that between equal scores the document indexed first wins, regardless of accumulation order.
+    Less than 10 documents will be outputted if there are documents with score = 0
+    amongst the supposed 10 highest.
+    """
+    temp = heapq.nlargest(k, zip(result.values(), [-docIndex for docIndex in result])) # a list of 10 highest scoring (score, -docIndex) pairs
+
+    return [(score, -negatedDocIndex) for score, negatedDocIndex in temp if score > 0]
+
+
+if __name__ == "__main__":
+    dictionary_file = postings_file = file_of_queries = output_file_of_results = None
+    cache_entries = 1024  # max number of postings lists held in the cache
+    cache_bytes = None  # max (on-disk) size of postings lists held in the cache, unbounded by default
+    use_mmap = True  # memory-map the postings file, so that search processes share the OS page cache for it
+    engine = 'exhaustive'  # top-k retrieval engine
+    batch = False  # read all queries first, and share the postings of their terms
+    workers = 1  # number of processes scoring queries in batch mode
+    server = None  # address of a search server to send the queries to, if one is running
+    result_cache = 0  # max number of query results held in the result cache, off by default
+    result_ttl = None  # seconds a cached result stays valid, no expiry by default
+    profile = False  # print the time, memory and I/O of each phase of searching
+    stats_json = None  # file to write the measurements of each phase and query to, as JSON
+    trace_memory = False  # also measure the peak memory of each phase with tracemalloc, which slows searching down
+    proximity = 0  # weight of the proximity boost of query terms in documents, off by default
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'd:p:q:o:j:', ['cache-entries=', 'cache-bytes=', 'no-mmap', 'engine=', 'batch', 'workers=', 'server=', 'result-cache=', 'result-ttl=',
+                                                                'profile', 'stats-json=', 'trace-memory', 'proximity='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-d':
+            dictionary_file  = a
+        elif o == '-p':
+            postings_file = a
+        elif o == '-q':
+            file_of_queries = a
+        elif o == '-o':
+            file_of_output = a
+        elif o == '--cache-entries':
+            cache_entries = int(a)
+        elif o == '--cache-bytes':
+            cache_bytes = int(a)
+        elif o == '--no-mmap':
+            use_mmap = False
+        elif o == '--engine':
+            engine = a
+        elif o == '--batch':
+            batch = True
+        elif o in ('-j', '--workers'):
+            workers = int(a)
+        elif o == '--server':
+            server = a
+        elif o == '--result-cache':
+            result_cache = int(a)
+        elif o == '--result-ttl':
+            result_ttl = float(a)
+        elif o == '--profile':
+            profile = True
+        elif o == '--stats-json':
+            stats_json = a
+        elif o == '--trace-memory':
+            trace_memory = True
+        elif o == '--proximity':
+            proximity = float(a)
+        else:
+            assert False, "unhandled option"
+
+    if dictionary_file == None or postings_file == None or file_of_queries == None or file_of_output == None or engine not in ('maxscore', 'exhaustive', 'champions', 'champions-approximate', 'numpy') or proximity < 0:
+        usage()
+        sys.exit(2)
+
+    givenOptions = [o for o, a in opts]
+    localOptions = [o for o in givenOptions if o in ('--cache-entries', '--cache-bytes', '--no-mmap', '--batch', '-j', '--workers', '--result-cache',
+                                                     '--result-ttl', '--profile', '--stats-json', '--trace-memory')]
+    if server == None or not run_search_on_server(server, file_of_queries, file_of_output, dictionary_file, postings_file,
+                                                  engine if '--engine' in givenOptions else None,
+                                                  proximity if '--proximity' in givenOptions else None, localOptions):
+        if server != None:
+            print('no search server at ' + server + ', loading the index')
+
+        result_cache = ResultCache(result_cache, result_ttl) if result_cache > 0 else None
+        timer = PhaseTimer(profile or stats_json != None or trace_memory, trace_memory)
+        stats = run_search(dictionary_file, postings_file, file_of_queries, file_of_output, cache_entries, cache_bytes, use_mmap, engine, batch, workers,
+                           result_cache, timer, proximity)
+
+        if profile:
+            print(timer.formatReport())
+        if stats_json != None:
+            timer.writeStats(stats_json, {"program": "search", "arguments": sys.argv[1:], "engine": engine, "seconds": stats["seconds"],
+                                          "queries": stats["queries"], "queryRecords": stats.get("queryRecords", [])})
+        timer.close()
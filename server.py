@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+import sys
+import getopt
+import asyncio
+
+from SearchServer import SearchServer
+from SearchClient import SearchClient
+from ResultCache import ResultCache
+
+
+def usage():
+    print("usage: " + sys.argv[0] + " -d dictionary-file -p postings-file -a address [--cache-entries N] [--cache-bytes N] [--no-mmap]"
+          " [--engine exhaustive|maxscore|champions|champions-approximate|numpy] [--result-cache N] [--result-ttl seconds] [--proximity weight]\n"
+          "       " + sys.argv[0] + " -a address --reload [-d dictionary-file -p postings-file]\n"
+          "address is host:port, or the path of a Unix socket")
+
+
+if __name__ == "__main__":
+    dictionary_file = postings_file = address = None
+    cache_entries = 1024  # max number of postings lists held in the cache
+    cache_bytes = None  # max (on-disk) size of postings lists held in the cache, unbounded by default
+    use_mmap = True
+    engine = 'exhaustive'
+    result_cache = 4096  # max number of query results held in the result cache (0 to disable)
+    result_ttl = None  # seconds a cached result stays valid, no expiry by default
+    reload = False  # ask a running server to hot-swap its index instead of starting one
+    proximity = 0  # weight of the proximity boost of query terms in documents (positional indexes only), off by default
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'd:p:a:', ['cache-entries=', 'cache-bytes=', 'no-mmap', 'engine=', 'result-cache=', 'result-ttl=', 'reload', 'proximity='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(2)
+
+    for o, a in opts:
+        if o == '-d':
+            dictionary_file = a
+        elif o == '-p':
+            postings_file = a
+        elif o == '-a':
+            address = a
+        elif o == '--cache-entries':
+            cache_entries = int(a)
+        elif o == '--cache-bytes':
+            cache_bytes = int(a)
+        elif o == '--no-mmap':
+            use_mmap = False
+        elif o == '--engine':
+            engine = a
+        elif o == '--result-cache':
+            result_cache = int(a)
+        elif o == '--result-ttl':
+            result_ttl = float(a)
+        elif o == '--reload':
+            reload = True
+        elif o == '--proximity':
+            proximity = float(a)
+        else:
+            assert False, "unhandled option"
+
+    if address == None or (not reload and (dictionary_file == None or postings_file == None)) or \
+            engine not in ('maxscore', 'exhaustive', 'champions', 'champions-approximate', 'numpy') or proximity < 0:
+        usage()
+        sys.exit(2)
+
+    if reload:
+        with SearchClient(address) as client:
+            print('index generation ' + str(client.reload(dictionary_file, postings_file)))
+
+    else:
+        result_cache = ResultCache(result_cache, result_ttl) if result_cache > 0 else None
+        server = SearchServer(dictionary_file, postings_file, engine, cache_entries, cache_bytes, use_mmap, result_cache, proximity)
+        try:
+            asyncio.run(server.serve(address))
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
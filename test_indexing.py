@@ -0,0 +1,73 @@
+import os
+import csv
+import shutil
+import tempfile
+import unittest
+
+import index
+
+from IndexHandle import IndexHandle
+
+DOCUMENTS = [
+    ('1', 'the court dismissed the appeal against the sentence'),
+    ('2', 'an appeal to the high court on costs'),
+    ('3', 'the claimant sought damages for breach of contract'),
+    ('4', 'damages were assessed by the court'),
+]
+
+
+def writeCorpus(file, documents):
+    """
+    Writes the given (docID, content) documents into a csv file in the input format of index.py.
+    """
+    with open(file, 'w', encoding='utf8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['document_id', 'title', 'content', 'date_posted', 'court'])
+        for docID, content in documents:
+            writer.writerow([docID, 't', content, '2020', 'SG'])
+
+
+class IndexingTest(unittest.TestCase):
+    """
+    Checks that a docID repeated in the input is indexed as one document holding the content of all its copies.
+    """
+
+    def setUp(self):
+        self.previousDirectory = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)  # indexing writes its working files in the current directory
+
+
+    def tearDown(self):
+        os.chdir(self.previousDirectory)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+    def buildIndex(self, name, documents, postingsFormat):
+        writeCorpus(name + '.csv', documents)
+        index.build_index(name + '.csv', name + '.dict', name + '.post', postingsFormat, blockMemory=1, tokenizer='regex')
+        return IndexHandle(name + '.dict', name + '.post', cacheEntries=0)
+
+
+    def testRepeatedDocIDIsOneDocument(self):
+        repeated = DOCUMENTS + [('1', 'the appeal was allowed in part'), ('3', 'damages damages')]
+        joined = [(docID, ' '.join(content for repeatedDocID, content in repeated if repeatedDocID == docID)) for docID, content in DOCUMENTS]
+        for postingsFormat in ('binary', 'pickle'):
+            with self.subTest(postingsFormat=postingsFormat):
+                repeatedHandle = self.buildIndex('repeated', repeated, postingsFormat)
+                joinedHandle = self.buildIndex('joined', joined, postingsFormat)
+
+                self.assertEqual(repeatedHandle.docIDs, joinedHandle.docIDs)
+                self.assertEqual(list(repeatedHandle.docLengths), list(joinedHandle.docLengths))
+                for repeatedLength, joinedLength in zip(repeatedHandle.getVectorLengths(), joinedHandle.getVectorLengths()):
+                    self.assertAlmostEqual(repeatedLength, joinedLength)
+                for term in ('appeal', 'damag', 'court', 'allow'):
+                    self.assertEqual([list(column) for column in repeatedHandle.getPostings(term)],
+                                     [list(column) for column in joinedHandle.getPostings(term)])
+
+                repeatedHandle.close()
+                joinedHandle.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from unittest import mock
+
+import index
+import search
+import PhraseQueries
+
+from SegmentedIndexHandle import openIndexHandle
+from test_indexing import writeCorpus
+
+WORDS = ['appeal', 'court', 'damages', 'contract', 'breach', 'costs', 'judge', 'order']
+
+QUERIES = ['"court appeal"', 'damages "breach contract"', '"appeal court" costs', '"judge order costs"', 'court "the appeal"']
+
+PROXIMITY_QUERIES = ['court appeal', 'damages breach contract', 'judge', 'costs order appeal court']
+
+
+def getSmallestWindow(positionLists):
+    """
+    Returns the length of the smallest window of positions holding a position of every list, trying every start.
+    """
+    starts = {position for positions in positionLists for position in positions}
+    windows = [max(min(position for position in positions if position >= start) for positions in positionLists) - start + 1
+               for start in starts if all(positions[-1] >= start for positions in positionLists)]
+    return min(windows)
+
+
+class PhrasesTest(unittest.TestCase):
+    """
+    Checks phrase queries and proximity boosts on a positional index against a brute force search of the documents.
+    """
+
+    def setUp(self):
+        self.previousDirectory = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)  # indexing writes its working files in the current directory
+
+        generator = random.Random(25)
+        self.documents = [(str(docID), ' '.join(generator.choice(WORDS) for _ in range(generator.randint(3, 25)))) for docID in range(1, 201)]
+        writeCorpus('corpus.csv', self.documents)
+        index.build_index('corpus.csv', 'positional.dict', 'positional.post', blockMemory=1, tokenizer='regex', positional=True)
+        self.indexHandle = openIndexHandle('positional.dict', 'positional.post')
+        normaliser = self.indexHandle.getNormaliser()
+        self.terms = [[normaliser.normalise(word) for word in content.split()] for docID, content in self.documents]
+
+
+    def tearDown(self):
+        self.indexHandle.close()
+        os.chdir(self.previousDirectory)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+    def getPositions(self, term, docIndex):
+        return [position for position, documentTerm in enumerate(self.terms[docIndex]) if documentTerm == term]
+
+
+    def containsPhrase(self, phrase, docIndex):
+        terms = self.terms[docIndex]
+        return any(tuple(terms[start:start + len(phrase)]) == phrase for start in range(len(terms)))
+
+
+    def rankAll(self, query):
+        """
+        Returns the (score, docIndex) pairs of all the documents holding a query term, ranked as for a plain query.
+        """
+        queryWeights = search.computeQueryWeights(query, self.indexHandle)
+        return search.rankTopDocuments(queryWeights, self.indexHandle, 'exhaustive', k=len(self.documents))
+
+
+    def testPositions(self):
+        self.assertTrue(search.hasPositions(self.indexHandle))
+        for term in sorted(set(self.terms[0])):
+            docIndices = list(self.indexHandle.getPostings(term)[0])
+            positions = self.indexHandle.getPositions(term, docIndices)
+            self.assertEqual(sorted(positions), docIndices)
+            for docIndex in docIndices:
+                self.assertEqual(list(positions[docIndex]), self.getPositions(term, docIndex))
+
+
+    def testPhrases(self):
+        for candidates in (PhraseQueries.CANDIDATES, 1):  # 1: ranking more candidates until enough of them match
+            for query in QUERIES:
+                queryWithoutPhrases, phraseTexts = PhraseQueries.splitPhrases(query)
+                phrases = search.computeQueryPhrases(phraseTexts, self.indexHandle)
+                expected = [self.indexHandle.getDocID(docIndex) for score, docIndex in self.rankAll(queryWithoutPhrases)
+                            if all(self.containsPhrase(phrase, docIndex) for phrase in phrases)][:10]
+                for engine in ('exhaustive', 'maxscore'):
+                    with self.subTest(candidates=candidates, query=query, engine=engine), mock.patch.object(PhraseQueries, 'CANDIDATES', candidates):
+                        self.assertEqual(search.cosineScores(query, self.indexHandle, engine).split(), expected)
+
+
+    def testProximity(self):
+        proximity = 0.5
+        for query in PROXIMITY_QUERIES:
+            queryTerms = list(search.computeQueryWeights(query, self.indexHandle))
+            results = []
+            for score, docIndex in self.rankAll(query)[:PhraseQueries.CANDIDATES]:  # boosts only reorder the candidates
+                positionLists = [self.getPositions(term, docIndex) for term in queryTerms if term in self.terms[docIndex]]
+                if len(positionLists) > 1:
+                    score *= 1 + proximity * (len(positionLists) - 1) / (getSmallestWindow(positionLists) - 1)
+                results.append((score, docIndex))
+            results.sort(key=lambda result: (-result[0], result[1]))
+            expected = [self.indexHandle.getDocID(docIndex) for score, docIndex in results[:10]]
+
+            with self.subTest(query=query):
+                self.assertEqual(search.cosineScores(query, self.indexHandle, 'exhaustive', proximity=proximity).split(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import io
+import random
+import unittest
+
+import PostingsCodec
+
+
+class PostingsCodecTest(unittest.TestCase):
+    """
+    Checks that postings, document tables and positions decode to what was encoded.
+    """
+
+    def testVarints(self):
+        for value in [0, 1, 127, 128, 255, 16383, 16384, 2 ** 31 - 1, 2 ** 40]:
+            with self.subTest(value=value):
+                output = bytearray(b'x')
+                PostingsCodec.encodeVarint(value, output)
+                self.assertEqual(PostingsCodec.decodeVarint(output, 1), (value, len(output)))
+                self.assertEqual(PostingsCodec.readVarint(io.BytesIO(bytes(output[1:]))), value)
+
+
+    def testPostings(self):
+        random.seed(4)
+        docIndices = sorted(random.sample(range(100000), 500))
+        termFrequencies = [random.randint(1, 300) for _ in docIndices]
+        postings = list(zip(docIndices, termFrequencies))
+        random.shuffle(postings)  # encodePostings sorts its pairs
+
+        encoded = PostingsCodec.encodePostings(postings)
+        self.assertEqual(PostingsCodec.encodePostingsArrays(docIndices, termFrequencies), encoded)
+        decodedDocIndices, decodedTermFrequencies = PostingsCodec.decodePostings(encoded)
+        self.assertEqual(list(decodedDocIndices), docIndices)
+        self.assertEqual(list(decodedTermFrequencies), termFrequencies)
+
+        self.assertEqual([list(column) for column in PostingsCodec.decodePostings(PostingsCodec.encodePostings([]))], [[], []])
+
+
+    def testPostingsRecords(self):
+        allPostings = [[(0, 1)], [(3, 2), (7, 1), (1000, 5)], []]
+        file = io.BytesIO()
+        file.write(PostingsCodec.HEADER)
+        pointers = []
+        for postings in allPostings:
+            pointers.append(file.tell())
+            PostingsCodec.writeRecord(file, PostingsCodec.encodePostings(postings))
+        buffer = file.getvalue()
+
+        for pointer, postings in zip(pointers, allPostings):
+            with self.subTest(postings=postings):
+                expected = [[docIndex for docIndex, _ in postings], [termFrequency for _, termFrequency in postings]]
+                file.seek(pointer)
+                self.assertEqual([list(column) for column in PostingsCodec.readPostings(file)], expected)
+                decoded, end = PostingsCodec.decodePostingsAt(buffer, pointer)
+                self.assertEqual([list(column) for column in decoded], expected)
+                self.assertEqual(end, file.tell())
+
+
+    def testDocTable(self):
+        docIDs = ['1', '246391', 'café', '']
+        docLengths = [0, 12, 130000, 7]
+        vectorLengths = [0.0, 3.5, 1e-300, 12.25]
+        file = io.BytesIO()
+        PostingsCodec.writeRecord(file, PostingsCodec.encodeDocTable(docIDs, docLengths, vectorLengths))
+
+        file.seek(0)
+        self.assertEqual(PostingsCodec.readDocTable(file), (docIDs, docLengths, vectorLengths))
+        self.assertEqual(PostingsCodec.decodeDocTableAt(file.getvalue(), 0), ((docIDs, docLengths, vectorLengths), len(file.getvalue())))
+
+
+    def testPositions(self):
+        random.seed(25)
+        termFrequencies = [random.randint(1, 5) for _ in range(3 * PostingsCodec.SKIP_INTERVAL + 10)]  # several skip intervals
+        allPositions = [sorted(random.sample(range(5000), termFrequency)) for termFrequency in termFrequencies]
+        positions = [position for documentPositions in allPositions for position in documentPositions]
+        file = io.BytesIO()
+        PostingsCodec.writeRecord(file, PostingsCodec.encodePositions(termFrequencies, positions))
+
+        file.seek(0)
+        record = PostingsCodec.readPositions(file)
+        self.assertEqual(len(record[0]), 3)
+        self.assertEqual(list(PostingsCodec.decodeAllPositions(record)), positions)
+
+        for ordinals in [[0], [len(termFrequencies) - 1], [1, 63, 64, 65, 128, 200], list(range(len(termFrequencies)))]:
+            with self.subTest(ordinals=ordinals):
+                self.assertEqual(PostingsCodec.findPositions(record, ordinals), [allPositions[ordinal] for ordinal in ordinals])
+
+        mappedRecord, end = PostingsCodec.decodePositionsAt(file.getvalue(), 0)
+        self.assertEqual(end, len(file.getvalue()))
+        self.assertEqual(PostingsCodec.findPositions(mappedRecord, [5, 150]), [allPositions[5], allPositions[150]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import index
+import search
+import Segments
+
+from SegmentedIndexHandle import openIndexHandle, SegmentedIndexHandle
+from test_indexing import writeCorpus
+
+WORDS = ['appeal', 'court', 'damages', 'contract', 'breach', 'sentence', 'costs', 'claimant', 'judge', 'evidence',
+         'witness', 'trial', 'order', 'injunction', 'negligence', 'duty', 'care', 'estate']
+
+QUERIES = ['appeal', 'court damages', 'breach of contract', 'sentence appeal costs', 'claimant evidence witness trial',
+           'injunction order', 'negligence duty of care', 'estate', 'judge judge court']
+
+
+def generateDocuments(firstDocID, numberOfDocs, seed):
+    """
+    Returns numberOfDocs (docID, content) documents of random words, with consecutive docIDs from firstDocID.
+    """
+    generator = random.Random(seed)
+    return [(str(docID), ' '.join(generator.choice(WORDS) for _ in range(generator.randint(3, 25))))
+            for docID in range(firstDocID, firstDocID + numberOfDocs)]
+
+
+class SegmentsTest(unittest.TestCase):
+    """
+    Checks that an index updated by appending segments, deleting documents and compacting segments
+    answers queries as an index rebuilt from its live documents does.
+    """
+
+    def setUp(self):
+        self.previousDirectory = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)  # indexing writes its working files in the current directory
+
+
+    def tearDown(self):
+        os.chdir(self.previousDirectory)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+    def assertSameAsRebuild(self, liveDocuments, name):
+        """
+        Rebuilds an index from the given live documents, in the order they were added, and compares it with the updated index.
+        """
+        writeCorpus(name + '.csv', liveDocuments)
+        index.build_index(name + '.csv', name + '.dict', name + '.post', blockMemory=1, tokenizer='regex')
+        rebuilt = openIndexHandle(name + '.dict', name + '.post', cacheEntries=0)
+        updated = openIndexHandle('updated.dict', 'updated.post')
+
+        self.assertEqual(updated.getTotalNumberOfDocs(), len(liveDocuments))
+        for term in sorted({rebuilt.getNormaliser().normalise(word) for word in WORDS}):
+            self.assertGreater(updated.getTermDocFrequency(term), 0)
+            self.assertEqual(updated.getTermDocFrequency(term), rebuilt.getTermDocFrequency(term))
+            for repeat in range(2):  # the second time from the merged postings cache
+                docIndices, termWeights = updated.getPostings(term)
+                self.assertEqual([updated.getDocID(docIndex) for docIndex in docIndices],
+                                 [rebuilt.getDocID(docIndex) for docIndex in rebuilt.getPostings(term)[0]])
+                self.assertEqual(list(termWeights), list(rebuilt.getPostings(term)[1]))
+
+        for engine in ('exhaustive', 'maxscore'):
+            for query in QUERIES:
+                with self.subTest(name=name, engine=engine, query=query):
+                    self.assertEqual(search.cosineScores(query, updated, engine), search.cosineScores(query, rebuilt, engine))
+
+        updated.close()
+        rebuilt.close()
+
+
+    def testAppendDeleteAndCompact(self):
+        first = generateDocuments(1, 30, 17)
+        second = generateDocuments(31, 20, 18)
+        replacements = [(docID, 'appeal ' + content) for docID, content in generateDocuments(5, 3, 19)]  # replace docIDs 5 to 7
+        third = generateDocuments(51, 10, 20) + replacements
+
+        writeCorpus('first.csv', first)
+        index.build_index('first.csv', 'updated.dict', 'updated.post', blockMemory=1, tokenizer='regex')
+        for name, documents in [('second', second), ('third', third)]:
+            writeCorpus(name + '.csv', documents)
+            index.appendDocuments(name + '.csv', 'updated.dict', 'updated.post', blockMemory=1)
+
+        deletedDocIDs = {'2', '3', '10', '33', '52'}
+        with open('deleted.txt', 'w') as f:
+            f.write('\n'.join(sorted(deletedDocIDs)) + '\n')
+        index.deleteDocuments('deleted.txt', 'updated.dict', 'updated.post')
+
+        replacedDocIDs = {docID for docID, content in replacements}
+        liveDocuments = [(docID, content) for docID, content in first + second + third
+                         if docID not in deletedDocIDs and (docID not in replacedDocIDs or (docID, content) in replacements)]
+        self.assertEqual(len(Segments.loadManifest('updated.dict')["segments"]), 3)
+        handle = openIndexHandle('updated.dict', 'updated.post')
+        self.assertIsInstance(handle, SegmentedIndexHandle)
+        handle.close()
+        self.assertSameAsRebuild(liveDocuments, 'beforeCompaction')
+
+        index.compactSegments('updated.dict', 'updated.post', mergeFactor=2)
+        self.assertLess(len(Segments.loadManifest('updated.dict')["segments"]), 3)
+        self.assertSameAsRebuild(liveDocuments, 'afterCompaction')
+
+
+if __name__ == "__main__":
+    unittest.main()
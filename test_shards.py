@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import index
+import search
+
+from SegmentedIndexHandle import openIndexHandle
+from ShardedIndex import ShardedIndex
+from test_indexing import writeCorpus
+from test_segments import generateDocuments, QUERIES
+
+
+class ShardsTest(unittest.TestCase):
+    """
+    Checks that an index split into shards ranks documents as the same index in one piece does.
+    """
+
+    def setUp(self):
+        self.previousDirectory = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)  # indexing writes its working files in the current directory
+
+
+    def tearDown(self):
+        os.chdir(self.previousDirectory)
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+    def testShardedRankingsAreUnsharded(self):
+        documents = generateDocuments(1, 60, 7)
+        documents.append(('12', 'appeal court appeal'))  # a repeated docID, whose copies must end up in the same shard
+        writeCorpus('corpus.csv', documents)
+        index.build_index('corpus.csv', 'whole.dict', 'whole.post', blockMemory=1, tokenizer='regex')
+        whole = openIndexHandle('whole.dict', 'whole.post')
+
+        for numberOfShards, workers in [(1, 1), (3, 1), (4, 2)]:
+            index.buildShards('corpus.csv', 'sharded.dict', 'sharded.post', numberOfShards, workers=workers, blockMemory=1, tokenizer='regex')
+            sharded = openIndexHandle('sharded.dict', 'sharded.post')
+            try:
+                self.assertIsInstance(sharded, ShardedIndex)
+                self.assertEqual(sharded.getTotalNumberOfDocs(), whole.getTotalNumberOfDocs())
+                for engine in ('exhaustive', 'maxscore'):
+                    for query in QUERIES:
+                        with self.subTest(numberOfShards=numberOfShards, engine=engine, query=query):
+                            self.assertEqual(search.cosineScores(query, sharded, engine), search.cosineScores(query, whole, engine))
+
+            finally:
+                sharded.close()
+
+        whole.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+import Tokenizers
+
+try:
+    import nltk
+    nltk.tokenize.sent_tokenize("Punkt is installed.")
+    hasNltk = True
+
+except (ImportError, LookupError):
+    hasNltk = False
+
+# texts the regex backend must tokenize as the NLTK one does
+AGREEMENT_TEXTS = [
+    # common words that are also abbreviations, ending a sentence
+    "The answer was no. Then he left.",
+    "The answer was no.",
+    "This is art. The end.",
+    "It was est. Then it grew.",
+    "In mar. It rained.",
+    "See the fig. Then read on.",
+    "He wore a cap. Then he left.",
+    "It was gen. Then more.",
+    "Wait a sec. Then go.",
+    "Install the app. Then run it.",
+    "He is a rep. Then a senator.",
+    "He was ed. The rest followed.",
+    # punctuation, quotes, brackets, numbers and contractions
+    "The court's decision, however, wasn't final: it (the appeal) was dismissed.",
+    'He said "I cannot go" and left.',
+    "Costs of $1,000.50 were awarded; the rest [if any] went to Smith's estate!",
+    "Is it true? Yes -- it is.",
+    "They're here and we'll see... maybe.",
+    "The claimants' lawyers gonna win",
+    # initials
+    "Smith v. Jones was heard by J. K. Rowling.",
+]
+
+
+class TokenizersTest(unittest.TestCase):
+    """
+    Checks that the regex tokenizer agrees with the NLTK one on fixed texts.
+    """
+
+    @unittest.skipUnless(hasNltk, "NLTK or its Punkt model is not installed")
+    def testAgreesWithNltk(self):
+        for text in AGREEMENT_TEXTS:
+            with self.subTest(text=text):
+                self.assertEqual(Tokenizers.regexTokenize(text), Tokenizers.nltkTokenize(text))
+
+
+    def testCommonWordsDropTheirPeriod(self):
+        for word in ['no', 'art', 'est', 'mar', 'fig', 'cap', 'gen', 'sec', 'app', 'rep', 'ed']:
+            with self.subTest(word=word):
+                self.assertEqual(Tokenizers.regexTokenize("It was " + word + ". Then it ended."),
+                                 ['It', 'was', word, '.', 'Then', 'it', 'ended', '.'])
+
+
+    def testAbbreviationsKeepTheirPeriod(self):
+        # the Punkt model for English keeps these periods too, unlike the model without abbreviations that may be installed
+        self.assertEqual(Tokenizers.regexTokenize("Mr. Smith saw No. 5 of Art. 3."), ['Mr.', 'Smith', 'saw', 'No.', '5', 'of', 'Art.', '3', '.'])
+
+
+if __name__ == "__main__":
+    unittest.main()